@@ -13,6 +13,7 @@ import re
 import json
 import base64
 import sys
+import time
 import requests
 
 from typing import Optional, List, Tuple, Dict, Any
@@ -424,7 +425,20 @@ def _build_task_description(messages: List[dict]) -> str:
     """
     user_text = _extract_user_text_prompt(messages) or ""
 
-    # Check if this is a short continuation response
+    if not _is_short_continuation(user_text):
+        return user_text
+
+    original = _find_original_task(messages)
+    if original:
+        print(f"[aj] Continuation detected - using original task: {original[:100]}...")
+        return f"User originally asked: {original}\n\nUser now confirms: {user_text}"
+
+    # Fallback to current text if no original task found
+    return user_text
+
+
+def _is_short_continuation(user_text: str) -> bool:
+    """True for short confirmations like "yes" or "go ahead"."""
     short_continuations = [
         "please do",
         "yes",
@@ -445,16 +459,14 @@ def _build_task_description(messages: List[dict]) -> str:
     ]
 
     user_lower = user_text.lower().strip()
-    is_continuation = len(user_text) < 100 and any(
+    return len(user_text) < 100 and any(
         user_lower.startswith(cont) or user_lower == cont
         for cont in short_continuations
     )
 
-    if not is_continuation:
-        return user_text
 
-    # This is a continuation - find the original task from conversation history
-    # Look for the most recent substantial user message
+def _find_original_task(messages: List[dict]) -> Optional[str]:
+    """Most recent substantial earlier user message (what a continuation refers to)."""
     for msg in reversed(messages[:-1]):  # Skip current message
         if msg.get("role") != "user":
             continue
@@ -481,11 +493,9 @@ def _build_task_description(messages: List[dict]) -> str:
             continue
 
         # Found the original task
-        print(f"[aj] Continuation detected - using original task: {content[:100]}...")
-        return f"User originally asked: {content}\n\nUser now confirms: {user_text}"
+        return content
 
-    # Fallback to current text if no original task found
-    return user_text
+    return None
 
 
 def _is_json_plan_content(content: str) -> bool:
@@ -1207,72 +1217,141 @@ def _call_extractor(
 # ============================================================================
 
 
-async def _save_chunk_to_memory(
+# While the memory API reports Qdrant's circuit breaker open (or is
+# unreachable) memory calls are skipped until this monotonic deadline,
+# instead of every turn waiting out its own timeout.
+_memory_retry_at = 0.0
+MEMORY_UNREACHABLE_BACKOFF = 5.0  # seconds
+MEMORY_BATCH_SIZE = int(os.getenv("MEMORY_BATCH_SIZE", "64"))  # chunks per /save-batch call
+MEMORY_MAX_QUERIES = 4  # lookups per turn sent to /search-batch
+
+
+def _memory_available() -> bool:
+    return time.monotonic() >= _memory_retry_at
+
+
+def _memory_unavailable(resp: Optional[requests.Response] = None) -> None:
+    """Back off memory calls after a failure, using Retry-After or /health."""
+    global _memory_retry_at
+    retry_after = None
+    if resp is not None and resp.status_code == 503:
+        try:
+            retry_after = float(resp.headers.get("Retry-After", ""))
+        except ValueError:
+            pass
+    if retry_after is None:
+        try:
+            health = requests.get(f"{MEMORY_API_URL}/health", timeout=2).json()
+            qdrant = health.get("qdrant") or {}
+            if qdrant.get("state") != "open":
+                return  # One-off failure, not an outage
+            retry_after = float(qdrant.get("retry_after_s") or 0)
+        except Exception:
+            retry_after = MEMORY_UNREACHABLE_BACKOFF
+    retry_after = max(1.0, retry_after)
+    _memory_retry_at = time.monotonic() + retry_after
+    print(f"[aj] Memory unavailable, skipping memory calls for {retry_after:.0f}s")
+
+
+async def _save_chunks_to_memory(
     user_id: str,
-    chunk: dict,
-    model: str,
-    metadata: dict,
+    chunks: List[dict],
     source_name: str,
-) -> bool:
-    """Save a single chunk to memory service."""
-    try:
+) -> int:
+    """
+    Save document chunks via /save-batch in bounded batches.
+    Returns how many chunks were stored.
+    """
+    items = []
+    for chunk in chunks:
         chunk_content = chunk.get("content", "")
+        if not chunk_content.strip():
+            continue
         chunk_idx = chunk.get("chunk_index", 0)
         section = chunk.get("section_title", "")
-        chunk_type = chunk.get("source_type", "document_chunk")
-
-        if not chunk_content.strip():
-            return False
-
-        payload = {
-            "user_id": user_id,
-            "messages": [{"role": "user", "content": chunk_content}],
-            "model": model,
-            "metadata": {
-                **metadata,
-                "chunk_index": chunk_idx,
-                "section_title": section,
-            },
-            "source_type": chunk_type,
-            "source_name": f"{source_name}#{chunk_idx}"
-            + (f" ({section})" if section else ""),
-            "skip_classifier": True,
-        }
-
-        resp = requests.post(
-            f"{MEMORY_API_URL}/api/memory/save", json=payload, timeout=30
+        items.append(
+            {
+                "text": chunk_content,
+                "source_type": chunk.get("source_type", "document_chunk"),
+                "source_name": f"{source_name}#{chunk_idx}"
+                + (f" ({section})" if section else ""),
+                "metadata": {"chunk_index": chunk_idx, "section_title": section},
+            }
         )
-        return resp.status_code == 200
 
-    except Exception as e:
-        print(f"[aj] Failed to save chunk: {e}")
-        return False
+    saved = 0
+    for start in range(0, len(items), MEMORY_BATCH_SIZE):
+        if not _memory_available():
+            break
+        try:
+            resp = requests.post(
+                f"{MEMORY_API_URL}/api/memory/save-batch",
+                json={"user_id": user_id, "items": items[start : start + MEMORY_BATCH_SIZE]},
+                timeout=60,
+            )
+            if resp.status_code == 503:
+                _memory_unavailable(resp)
+                break
+            resp.raise_for_status()
+            saved += resp.json().get("saved", 0)
+        except requests.RequestException as e:
+            print(f"[aj] Failed to save chunks: {e}")
+            _memory_unavailable()
+            break
+        except Exception as e:
+            print(f"[aj] Failed to save chunks: {e}")
+            break
+    return saved
 
 
 async def _search_memory(
     user_id: str,
-    query_text: str,
+    queries: List[str],
     top_k: int = 5,
 ) -> List[dict]:
-    """Search memory for relevant context."""
+    """
+    Search memory for relevant context. All queries go out in one
+    /search-batch call; hits are merged (best score per memory) and the
+    top_k overall are returned.
+    """
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries or not _memory_available():
+        return []
     try:
         payload = {
             "user_id": user_id,
-            "query_text": query_text,
+            "queries": queries[:MEMORY_MAX_QUERIES],
             "top_k": top_k,
         }
 
         resp = requests.post(
-            f"{MEMORY_API_URL}/api/memory/search", json=payload, timeout=10
+            f"{MEMORY_API_URL}/api/memory/search-batch", json=payload, timeout=10
         )
-
-        if resp.status_code == 404:
-            # No memories found - not an error
+        if resp.status_code == 503:
+            _memory_unavailable(resp)
             return []
 
         resp.raise_for_status()
-        return resp.json()
 
+        merged: Dict[tuple, dict] = {}
+        for entry in resp.json():
+            for r in entry.get("results", []):
+                # facts may be a list or dict, so key on its JSON form
+                key = (
+                    r.get("user_text"),
+                    json.dumps(r.get("facts"), sort_keys=True, default=str),
+                    r.get("source_name"),
+                )
+                if key not in merged or r.get("score", 0) > merged[key].get("score", 0):
+                    merged[key] = r
+        return sorted(merged.values(), key=lambda r: r.get("score", 0), reverse=True)[
+            :top_k
+        ]
+
+    except requests.RequestException as e:
+        print(f"[aj] Search error: {e}")
+        _memory_unavailable()
+        return []
     except Exception as e:
         print(f"[aj] Search error: {e}")
         return []
@@ -1286,6 +1365,8 @@ async def _save_to_memory(
     workspace_context: Optional[str] = None,
 ) -> bool:
     """Save conversation to memory with fact extraction. Returns True if saved successfully."""
+    if not _memory_available():
+        return False
     try:
         # Extract user text for fact extraction
         user_text = None
@@ -1350,11 +1431,19 @@ async def _save_to_memory(
         resp = requests.post(
             f"{MEMORY_API_URL}/api/memory/save", json=payload, timeout=30
         )
+        if resp.status_code == 503:
+            _memory_unavailable(resp)
+            return False
         resp.raise_for_status()
 
         result = resp.json()
-        return result.get("status") == "saved"
+        # "accepted" = journaled by the memory API, written in the background
+        return result.get("status") in ("saved", "accepted")
 
+    except requests.RequestException as e:
+        print(f"[aj] Save error: {e}")
+        _memory_unavailable()
+        return False
     except Exception as e:
         print(f"[aj] Save error: {e}")
         return False
@@ -1705,11 +1794,9 @@ class Filter:
                 )
 
                 source_name = filenames[0] if filenames else "attachment"
-                for chunk in chunks:
-                    if await _save_chunk_to_memory(
-                        user_id, chunk, model, metadata, source_name
-                    ):
-                        chunks_saved += 1
+                chunks_saved = await _save_chunks_to_memory(
+                    user_id, chunks, source_name
+                )
 
             # Classify intent FIRST - this determines if we save
             orchestrator_context = None
@@ -1740,7 +1827,13 @@ class Filter:
             # Search memory for context (needed for tasks and recall)
             context = []
             if user_text:
-                search_results = await _search_memory(user_id, user_text)
+                # One batch lookup: the message itself, what a continuation
+                # ("yes, do it") refers to, and any attached file names
+                queries = [user_text]
+                if _is_short_continuation(user_text):
+                    queries.append(_find_original_task(messages) or "")
+                queries += filenames
+                search_results = await _search_memory(user_id, queries)
                 # Convert search results to context format
                 context = [
                     {
@@ -4,5 +4,5 @@ Memory API Package
 FastAPI router for memory service endpoints.
 
 Modules:
-    memory: REST endpoints for save, search, and summaries operations.
+    memory: REST endpoints for save, search, summaries, and stats operations.
 """
\ No newline at end of file
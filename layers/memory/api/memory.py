@@ -3,8 +3,14 @@ Memory API Router
 
 Core endpoints for my memory service:
 - /save: Store conversations with embeddings and optional pre-extracted facts
+- /save-batch: Bulk-store document chunks or facts for one user
 - /search: Find relevant memories via semantic similarity
-- /summaries: Get memory summaries for a user
+- /search-batch: Several queries in one embed pass and one Qdrant request
+- /summaries: Get the user's precomputed memory digest
+- /export, /import: Stream points out / in as NDJSON (float16 vectors)
+- /shards: Shard topology; POST adds a shard and rebalances users onto it
+- /blobs/{digest}: Image / file bytes saved with a message (by SHA-256)
+- /stats: Runtime stats (embedding batch sizes, queue waits)
 
 The save endpoint does a "search-first" pattern:
 1. Generate embedding from the conversation
@@ -19,17 +25,63 @@ layer, not a processing layer.
 
 import os
 import time
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Tuple, Union
 import uuid
 import json
 import hashlib
-import requests
-import base64
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from fastapi import APIRouter, HTTPException
-from services.qdrant_client import _client, _ensure_collection
-from services.embedder import embed_messages, embed
+import sqlite3
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from services.qdrant_client import (
+    _collection_name,
+    get_router,
+    group_by_shard,
+    load_user_points,
+    read_shards,
+    search_user_points,
+    search_user_points_batch,
+    breaker_stats,
+    set_active_collection,
+    set_router,
+    shards,
+    use_shard,
+    user_filter,
+    with_collection,
+)
+from services import sharding
+from services.sharding import Rebalancer
+from services.hot_set import UserHotSet
+from services.result_cache import SearchResultCache
+from services.shared_versions import SharedVersions
+from services.blob_store import (
+    REF_PREFIX,
+    BlobStore,
+    base64_size,
+    decode_base64,
+    parse_data_url,
+)
+from services.save_journal import JournalWorker, SaveJournal
+from services.circuit_breaker import CircuitOpenError
+from services.digest import DigestInbox, DigestWorker, load_digest
+from services.summarizer import summarize_batch
+from services.fact_dedup import collapse_batch, merge_payload
+from services.compaction import CompactionScheduler, CompactionSettings, Compactor
+from services import metrics, snapshot
+from services.embedder import (
+    current_backend,
+    current_model,
+    embed_messages,
+    embed,
+    embed_batch,
+    cache_sizes,
+    embedder_stats,
+    load_model,
+    model_loaded,
+    use_backend,
+)
+from services import embedding_migration, service_state
+from services.embedding_migration import EmbeddingMigration
 
 # Fact extractor utilities - actual extraction is no-op (should be done upstream)
 from services.fact_extractor import (
@@ -37,26 +89,156 @@ from services.fact_extractor import (
     format_facts_for_storage,
     facts_to_embedding_text,
 )
-from utils.schemas import SaveRequest, SearchRequest, MemoryResult
+from utils.schemas import (
+    AddShardRequest,
+    MemoryResult,
+    QueryResults,
+    SaveBatchRequest,
+    SaveRequest,
+    SearchBatchRequest,
+    SearchRequest,
+)
 from qdrant_client.http import models
 
 router = APIRouter(tags=["memory"])
-collection_name = os.getenv("INDEX_NAME", "user_memory_collection")
 
-# HTTP session with retry for Qdrant REST calls
-_http_session = None
+# Pre-fork multi-worker mode (serve.py): this module is imported in the
+# master, so these tables are mapped into every worker. Saves handled by one
+# worker then invalidate cached results / hot users in all of them. Separate
+# tables because the hot set patches itself on a save instead of dropping.
+_workers = int(os.getenv("MEMORY_WORKERS", "1"))
+_shared_hot_versions = SharedVersions() if _workers > 1 else None
+_shared_cache_versions = SharedVersions() if _workers > 1 else None
+
+
+def _is_leader() -> bool:
+    """Worker 0 runs the singleton background jobs (journal drain, digests, compaction, backfill)."""
+    return os.getenv("MEMORY_WORKER_INDEX", "0") == "0"
+
+
+# Optional in-process vector tier for small, recently active users
+_hot_set: Optional[UserHotSet] = None
+if os.getenv("HOT_SET_ENABLED", "false").lower() in ("1", "true", "yes"):
+    _hot_set = UserHotSet(
+        max_bytes=int(float(os.getenv("HOT_SET_MAX_MB", "256")) * 2**20),
+        max_user_points=int(os.getenv("HOT_SET_MAX_USER_POINTS", "5000")),
+        dtype=os.getenv("HOT_SET_DTYPE", "float32"),
+        shared=_shared_hot_versions,
+    )
+
+# Cosine similarity at which a new fact is merged into an existing one (0 disables)
+_dedup_threshold = float(os.getenv("SAVE_DEDUP_THRESHOLD", "0"))
+
+# Image / file parts of saved messages are stored once by SHA-256; payloads keep the hash
+_blob_store = BlobStore(os.getenv("BLOB_STORE_DIR", "memory_blobs"))
+_max_content_mb = float(os.getenv("SAVE_MAX_CONTENT_MB", "100"))
+
+# Versioned search-result cache - /save bumps the user's version
+_result_cache = SearchResultCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "300")),
+    shared=_shared_cache_versions,
+)
+
+
+def _search(user_id: str, vector: List[float], limit: int) -> List[models.ScoredPoint]:
+    """
+    Top-k points for a user. Served from the in-process hot set when enabled
+    and the user is small enough, otherwise from Qdrant.
+    """
+    if _hot_set is not None:
+        hits = _hot_set.search(user_id, vector, limit, loader=load_user_points)
+        if hits is not None:
+            return [
+                models.ScoredPoint(id=pid, version=0, score=score, payload=payload)
+                for pid, score, payload in hits
+            ]
+    return search_user_points(user_id, vector, limit)
+
+
+def _search_text(user_id: str, query_text: str, limit: int) -> List[models.ScoredPoint]:
+    """Embed + search, served from the result cache when the same query repeats."""
+    return _result_cache.get_or_compute(
+        user_id, query_text, limit, lambda: _search(user_id, embed(query_text), limit)
+    )
+
+
+def _nearest(
+    searches: List[Tuple[str, List[float]]], limit: int
+) -> List[List[models.ScoredPoint]]:
+    """
+    Top-k for several (user_id, vector) pairs: hot-set users in process,
+    everyone else in one Qdrant batch request. Results line up with searches.
+    """
+    results: List[List[models.ScoredPoint]] = [[] for _ in searches]
+    remote = []
+    for i, (user_id, vector) in enumerate(searches):
+        hits = (
+            _hot_set.search(user_id, vector, limit, loader=load_user_points)
+            if _hot_set is not None
+            else None
+        )
+        if hits is None:
+            remote.append(i)
+        else:
+            results[i] = [
+                models.ScoredPoint(id=pid, version=0, score=score, payload=payload)
+                for pid, score, payload in hits
+            ]
+
+    if remote:
+        batch = search_user_points_batch(
+            [(searches[i][0], searches[i][1], limit) for i in remote]
+        )
+        for i, points in zip(remote, batch):
+            results[i] = points
+    return results
 
 
-def _get_http_session() -> requests.Session:
-    """Get a requests session with automatic retry on connection errors."""
-    global _http_session
-    if _http_session is None:
-        _http_session = requests.Session()
-        retry = Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry)
-        _http_session.mount("http://", adapter)
-        _http_session.mount("https://", adapter)
-    return _http_session
+def _search_texts(
+    user_id: str, queries: List[str], limit: int
+) -> List[List[models.ScoredPoint]]:
+    """
+    Batch version of _search_text: cache hits are served directly, misses
+    are embedded in one encode() and searched in one Qdrant request (small
+    users via the hot set). Results line up with queries.
+    """
+    results: List[Optional[List[models.ScoredPoint]]] = [None] * len(queries)
+    misses: Dict[str, List[int]] = {}  # query text -> positions (repeats share a search)
+    version = 0
+    for i, query in enumerate(queries):
+        cached, version = _result_cache.get(user_id, query, limit)
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.setdefault(query, []).append(i)
+
+    if misses:
+        started = time.perf_counter()
+        texts = list(misses)
+        vectors = embed_batch(texts)
+        found = _nearest([(user_id, vector) for vector in vectors], limit)
+        computed = dict(zip(texts, found))
+
+        cost_ms = (time.perf_counter() - started) * 1000 / len(texts)
+        for text, positions in misses.items():
+            _result_cache.put(user_id, version, text, limit, computed[text], cost_ms)
+            for i in positions:
+                results[i] = computed[text]
+
+    return results
+
+
+def _to_result(pt: models.ScoredPoint) -> MemoryResult:
+    payload = pt.payload or {}
+    return MemoryResult(
+        user_text=payload.get("user_text", ""),
+        facts=payload.get("facts"),
+        messages=None,
+        score=pt.score,
+        source_type=payload.get("source_type"),
+        source_name=payload.get("source_name"),
+    )
 
 
 def _get_text_content(content) -> str:
@@ -73,79 +255,95 @@ def _get_text_content(content) -> str:
     return ""
 
 
+def _binary_part(item: Dict[str, Any]) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    (media_type, base64 data, fields to keep) for an inline image / file /
+    audio part, or None if the part isn't inline binary data.
+    """
+    item_type = item.get("type")
+    if item_type == "image_url":
+        image_url = item.get("image_url", {})
+        url = image_url.get("url", "") if isinstance(image_url, dict) else str(image_url)
+        parsed = parse_data_url(url)
+        return (*parsed, {}) if parsed else None
+    if item_type == "file":
+        file = item.get("file") or {}
+        parsed = parse_data_url(str(file.get("file_data", "")))
+        keep = {"filename": file["filename"]} if file.get("filename") else {}
+        return (*parsed, keep) if parsed else None
+    if item_type == "input_audio":
+        audio = item.get("input_audio") or {}
+        if not audio.get("data"):
+            return None
+        return f"audio/{audio.get('format', 'wav')}", str(audio["data"]), {}
+    return None
+
+
 def _serialize_full_content(
-    content: Union[str, List[Dict[str, Any]]], max_size_mb: int = 100
-) -> Optional[str]:
+    content: Union[str, List[Dict[str, Any]]], max_size_mb: Optional[float] = None
+) -> Optional[Tuple[str, List[Dict[str, Any]], Dict[str, bytes]]]:
     """
     Serialize full message content for storage, including multi-modal data.
-    Converts images to base64, checks total size limit.
 
-    Returns JSON string of the content, or None if too large.
+    Inline images / files / audio are replaced by a small reference:
+    {"type", "<type>": {"blob": "sha256:<hex>", "media_type", "bytes"}}.
+    Nothing is written here - the decoded bytes are returned keyed by
+    digest and only go to the blob store once the save is actually
+    upserted (see _write_points). The size limit is checked on the base64
+    lengths before anything is decoded.
+
+    Returns (JSON string of the content, attachment refs, {digest: bytes}),
+    or None if too large.
     """
+    limit = (max_size_mb if max_size_mb is not None else _max_content_mb) * 1024 * 1024
+
     if isinstance(content, str):
-        # Plain text - check size
-        size_bytes = len(content.encode("utf-8"))
-        if size_bytes > max_size_mb * 1024 * 1024:
+        if len(content.encode("utf-8")) > limit:
             return None
-        return content
-
-    elif isinstance(content, list):
-        serialized_items = []
-        total_size = 0
-
-        for item in content:
-            if not isinstance(item, dict):
-                continue
-
-            item_type = item.get("type")
-            if item_type == "text":
-                text = item.get("text", "")
-                text_bytes = text.encode("utf-8")
-                total_size += len(text_bytes)
-                if total_size > max_size_mb * 1024 * 1024:
-                    return None
-                serialized_items.append({"type": "text", "text": text})
-
-            elif item_type == "image_url":
-                # Convert image to base64
-                image_url = item.get("image_url", {})
-                if isinstance(image_url, dict):
-                    url = image_url.get("url", "")
-                else:
-                    url = str(image_url)
-
-                try:
-                    # For now, assume data URLs or fetch if needed
-                    # In practice, Open-WebUI sends base64 data URLs
-                    if url.startswith("data:image/"):
-                        # Already base64, extract
-                        header, data = url.split(",", 1)
-                        image_bytes = base64.b64decode(data)
-                        total_size += len(image_bytes)
-                        if total_size > max_size_mb * 1024 * 1024:
-                            return None
-                        serialized_items.append(
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": url},  # Keep original
-                            }
-                        )
-                    else:
-                        # External URL - could fetch, but for now skip or placeholder
-                        # To keep simple, just store the URL
-                        serialized_items.append(
-                            {"type": "image_url", "image_url": {"url": url}}
-                        )
-                except Exception:
-                    # If conversion fails, skip this item
-                    continue
-
-        if total_size > max_size_mb * 1024 * 1024:
+        return content, [], {}
+
+    if not isinstance(content, list):
+        return None
+
+    items = [item for item in content if isinstance(item, dict)]
+    parts = [_binary_part(item) for item in items]
+
+    # Size check first: text bytes plus decoded sizes derived from base64 length
+    total_size = 0
+    for item, part in zip(items, parts):
+        if part is not None:
+            total_size += base64_size(part[1])
+        elif item.get("type") == "text":
+            total_size += len(item.get("text", "").encode("utf-8"))
+        if total_size > limit:
             return None
 
-        return json.dumps(serialized_items)
+    serialized_items = []
+    attachments = []
+    blobs: Dict[str, bytes] = {}
+    for item, part in zip(items, parts):
+        item_type = item.get("type")
+        if item_type == "text":
+            serialized_items.append({"type": "text", "text": item.get("text", "")})
+        elif part is not None:
+            media_type, data, keep = part
+            try:
+                raw = decode_base64(data)
+            except ValueError as e:
+                print(f"[save] ✗ Could not decode {item_type} part: {e}")
+                continue
+            digest = hashlib.sha256(raw).hexdigest()
+            blobs[digest] = raw
+            ref = {"blob": f"{REF_PREFIX}{digest}", "media_type": media_type, "bytes": len(raw), **keep}
+            serialized_items.append({"type": item_type, item_type: ref})
+            attachments.append(ref)
+        elif item_type == "image_url":
+            # External URL - just keep the URL
+            image_url = item.get("image_url", {})
+            url = image_url.get("url", "") if isinstance(image_url, dict) else str(image_url)
+            serialized_items.append({"type": "image_url", "image_url": {"url": url}})
 
-    return None
+    return json.dumps(serialized_items), attachments, blobs
 
 
 def _make_uuid(user_id: str, content_hash: str) -> int:
@@ -184,21 +382,79 @@ def _make_fact_uuid(user_id: str, fact_type: str, fact_value: str) -> int:
     return _make_uuid(user_id, fact_key)
 
 
-@router.post("/save", status_code=200)
-def save_memory(req: SaveRequest) -> Dict[str, Any]:
-    """
-    Save a conversation to memory.
+def _skipped(reason: str) -> Dict[str, Any]:
+    return {
+        "status": "skipped",
+        "point_id": None,
+        "content_hash": None,
+        "reason": reason,
+    }
 
-    ATOMIC: By the time this is called, the decision to save has already
-    been made by the upstream filter/orchestrator. This endpoint just:
-    1. Extracts text and facts
-    2. Embeds the content
-    3. Stores in Qdrant (one point per fact for deduplication)
 
-    No classification, no searching - those happen elsewhere.
-    """
-    _ensure_collection()
+def _fact_point(
+    user_id: str,
+    fact: Dict[str, Any],
+    source_type: Optional[str],
+    source_name: Optional[str],
+) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """(point_id, {text, payload}) for one fact, or None if it has no value."""
+    fact_type = fact.get("type", "unknown")
+    fact_value = fact.get("value", "")
+
+    if not fact_value:
+        return None
+
+    fact_text = f"{fact_type}: {fact_value}"
 
+    # Build payload for this fact
+    payload: Dict[str, Any] = {
+        "user_id": user_id,
+        "facts": fact_text,  # Single fact string for compatibility
+    }
+
+    # Add source information
+    if source_type:
+        payload["source_type"] = source_type
+    if source_name:
+        payload["source_name"] = source_name
+
+    # Generate deterministic ID based on type + normalized value
+    # This ensures "The Big Bang Theory" and "Big Bang Theory" get the same ID
+    point_id = _make_fact_uuid(user_id, fact_type, fact_value)
+    return point_id, {"text": fact_text, "payload": payload}
+
+
+def _chunk_point(
+    user_id: str,
+    text: str,
+    source_type: Optional[str],
+    source_name: Optional[str],
+    metadata: Optional[Dict[str, Any]],
+) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """(point_id, {text, payload}) for a document chunk, or None if it is blank."""
+    text = text.strip()
+    if not text:
+        return None
+
+    payload: Dict[str, Any] = {
+        **(metadata or {}),
+        "user_id": user_id,
+        "user_text": text,
+        "source_type": source_type or "document_chunk",
+    }
+    if source_name:
+        payload["source_name"] = source_name
+
+    # Same chunk of the same source re-uploaded -> same point (idempotent)
+    content_hash = hashlib.sha256(f"{source_name or ''}\n{text}".encode("utf-8")).hexdigest()
+    return _make_uuid(user_id, content_hash), {"text": text, "payload": payload}
+
+
+def _prepare_facts(req: SaveRequest) -> Tuple[Dict[int, Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Turn a save request into pending points {point_id: {text, payload}}.
+    Returns (pending, None), or ({}, skip_response) if there is nothing to store.
+    """
     # Extract the last user message for storage (full content + text)
     user_content = None
     user_text = None
@@ -213,14 +469,10 @@ def save_memory(req: SaveRequest) -> Dict[str, Any]:
         user_text = "[empty message]"
 
     # Serialize full content for storage (with size limit)
-    serialized_content = _serialize_full_content(user_content)
-    if serialized_content is None:
-        return {
-            "status": "skipped",
-            "point_id": None,
-            "content_hash": None,
-            "reason": "Content too large (>100MB)",
-        }
+    serialized = _serialize_full_content(user_content)
+    if serialized is None:
+        return {}, _skipped(f"Content too large (>{_max_content_mb:g}MB)")
+    _, attachments, blobs = serialized
 
     # Use pre-extracted facts from pragmatics layer (preferred) or fallback to local extraction
     facts = req.facts if req.facts else []
@@ -230,57 +482,678 @@ def save_memory(req: SaveRequest) -> Dict[str, Any]:
 
     # If no facts, skip storage (we only store facts now, not raw text)
     if not facts:
-        return {
-            "status": "skipped",
-            "point_id": None,
-            "content_hash": None,
-            "reason": "No facts to store",
-        }
-
-    client = _client()
-    saved_points = []
+        return {}, _skipped("No facts to store")
 
-    # Store each fact as its own point for proper deduplication
+    # Build one point per fact (deduplicated by deterministic ID)
+    pending: Dict[int, Dict[str, Any]] = {}
     for fact in facts:
-        fact_type = fact.get("type", "unknown")
-        fact_value = fact.get("value", "")
+        point = _fact_point(req.user_id, fact, req.source_type, req.source_name)
+        if point is not None:
+            if attachments:
+                # Hash references only - the bytes go to the blob store on upsert
+                point[1]["payload"]["attachments"] = attachments
+                point[1]["blobs"] = blobs
+            pending[point[0]] = point[1]
+
+    if not pending:
+        return {}, _skipped("No facts to store")
+
+    return pending, None
+
 
-        if not fact_value:
+def _dedupe(
+    items: List[Tuple[str, int, Dict[str, Any]]], vectors: List[List[float]]
+) -> Tuple[List[Tuple[str, int, Dict[str, Any]]], List[List[float]], Dict[int, int]]:
+    """
+    Fold near-duplicate facts into existing points (see services/fact_dedup).
+    Returns the items/vectors to upsert and {new point_id: point_id it was
+    merged into}.
+    """
+    if _dedup_threshold <= 0:
+        return items, vectors, {}
+
+    is_fact = [bool(entry["payload"].get("facts")) for _, _, entry in items]
+    into = collapse_batch([u for u, _, _ in items], vectors, is_fact, _dedup_threshold)
+
+    # Paraphrases inside this write: the later one updates the earlier item
+    merged: Dict[int, int] = {}
+    items = list(items)
+    vectors = list(vectors)
+    for i, j in into.items():
+        user_id, pid, entry = items[j]
+        items[j] = (user_id, pid, {**entry, "payload": merge_payload(entry["payload"], items[i][2]["payload"])})
+        vectors[j] = vectors[i]
+        merged[items[i][1]] = pid
+    keep = [i for i in range(len(items)) if i not in into]
+    items = [items[i] for i in keep]
+    vectors = [vectors[i] for i in keep]
+
+    # Against the user's stored facts: one kNN lookup for the whole write
+    candidates = [i for i, (_, _, entry) in enumerate(items) if entry["payload"].get("facts")]
+    nearest = _nearest([(items[i][0], vectors[i]) for i in candidates], 1)
+    for i, hits in zip(candidates, nearest):
+        if not hits:
+            continue
+        top = hits[0]
+        user_id, pid, entry = items[i]
+        existing = top.payload or {}
+        if top.id == pid or top.score < _dedup_threshold or not existing.get("facts"):
             continue
+        items[i] = (user_id, top.id, {**entry, "payload": merge_payload(existing, entry["payload"])})
+        merged[pid] = top.id
+
+    # Resolve chains (in-batch duplicate of a fact that itself matched a stored one)
+    for pid in list(merged):
+        target = merged[pid]
+        while target in merged:
+            target = merged[target]
+        merged[pid] = target
+    return items, vectors, merged
+
+
+def _write_points(
+    writes: List[Tuple[str, Dict[int, Dict[str, Any]]]],
+    wait: bool = True,
+    route: str = "journal",
+) -> Tuple[Dict[str, float], Dict[int, int]]:
+    """
+    Embed and upsert pending points for one or more users: one encode()
+    over every text and one bulk upsert, then keep the hot set and result
+    cache in step. Near-duplicate facts are merged into existing points.
+    route labels the write in the metrics.
+    Returns (embed/dedup/upsert timings in ms, {point_id: merged into}).
+    """
+    migration = _migration
+    if migration is None:
+        return _embed_and_upsert(writes, wait, route)
+    # Embed, upsert and dual-write on one side of a model switch
+    with migration.writes.writing():
+        return _embed_and_upsert(writes, wait, route)
+
+
+def _embed_and_upsert(
+    writes: List[Tuple[str, Dict[int, Dict[str, Any]]]], wait: bool, route: str
+) -> Tuple[Dict[str, float], Dict[int, int]]:
+    items = [
+        (user_id, pid, entry)
+        for user_id, pending in writes
+        for pid, entry in pending.items()
+    ]
+
+    # Embed every fact in one forward pass
+    embed_start = time.perf_counter()
+    vectors = embed_batch([entry["text"] for _, _, entry in items])
+    embed_ms = (time.perf_counter() - embed_start) * 1000
+
+    dedup_start = time.perf_counter()
+    items, vectors, merged = _dedupe(items, vectors)
+    dedup_ms = (time.perf_counter() - dedup_start) * 1000
+
+    # saved_at drives compaction's age retention and per-user cap
+    saved_at = time.time()
+    for _, _, entry in items:
+        entry["payload"]["saved_at"] = saved_at
+
+    points = [
+        models.PointStruct(id=pid, vector=vec, payload=entry["payload"])
+        for (_, pid, entry), vec in zip(items, vectors)
+    ]
+
+    # Attachment bytes are written only now that the save is being stored,
+    # so skipped saves never leave unreferenced blobs behind
+    blobs = {d: raw for _, _, entry in items for d, raw in entry.get("blobs", {}).items()}
+    for raw in blobs.values():
+        _blob_store.put(raw)
+
+    # One bulk upsert (per shard) instead of one round-trip per fact
+    upsert_start = time.perf_counter()
+    for shard, idx in group_by_shard([user_id for user_id, _, _ in items]).items():
+        batch = [points[i] for i in idx]
+        with use_shard(shard):
+            with_collection(
+                lambda client: client.upsert(
+                    collection_name=_collection_name(), points=batch, wait=wait
+                )
+            )
+    upsert_ms = (time.perf_counter() - upsert_start) * 1000
+    metrics.QDRANT_SECONDS.observe(upsert_ms / 1000, "upsert")
+    metrics.WRITE_BATCH_SIZE.observe(len(points), route)
+
+    if _migration is not None:
+        _migration.dual_write(points)
+
+    by_user: Dict[str, List[int]] = {}
+    for i, (user_id, _, _) in enumerate(items):
+        by_user.setdefault(user_id, []).append(i)
+    _mark_digests_dirty(list(by_user))
+    for user_id, idx in by_user.items():
+        if _hot_set is not None:
+            _hot_set.apply_upsert(
+                user_id,
+                [items[i][1] for i in idx],
+                [vectors[i] for i in idx],
+                [items[i][2]["payload"] for i in idx],
+            )
+        _result_cache.bump(user_id)
 
-        # Generate embedding for this specific fact
-        fact_text = f"{fact_type}: {fact_value}"
-        fact_vector = embed(fact_text)
+    timing = {
+        "embed": round(embed_ms, 2),
+        "dedup": round(dedup_ms, 2),
+        "upsert": round(upsert_ms, 2),
+    }
+    return timing, merged
 
-        # Build payload for this fact
-        payload: Dict[str, Any] = {
-            "user_id": req.user_id,
-            "facts": fact_text,  # Single fact string for compatibility
-        }
 
-        # Add source information
-        if req.source_type:
-            payload["source_type"] = req.source_type
-        if req.source_name:
-            payload["source_name"] = req.source_name
+# ============================================================================
+# Write-behind journal (async saves)
+# ============================================================================
 
-        # Generate deterministic ID based on type + normalized value
-        # This ensures "The Big Bang Theory" and "Big Bang Theory" get the same ID
-        point_id = _make_fact_uuid(req.user_id, fact_type, fact_value)
+_default_async = os.getenv("SAVE_MODE", "sync").lower() == "async"
+_journal_worker: Optional[JournalWorker] = None
 
-        point = models.PointStruct(id=point_id, vector=fact_vector, payload=payload)
-        client.upsert(collection_name=collection_name, points=[point])
 
-        saved_points.append(point_id)
-        print(f"[/save] Stored fact: {fact_type}={fact_value} (id={point_id})")
+def _drain_journal(entries: List[Tuple[int, Dict[str, Any]]]) -> Dict[int, str]:
+    """
+    Write a batch of journaled saves. Tries the whole batch in one embed +
+    upsert; if that fails, retries entries one at a time so a single bad
+    entry can't block the rest. Returns {entry_id: error} for failures.
+    """
+    prepared: List[Tuple[int, str, Dict[int, Dict[str, Any]]]] = []
+    failures: Dict[int, str] = {}
+    for entry_id, body in entries:
+        try:
+            req = SaveRequest(**body)
+            pending, skipped = _prepare_facts(req)
+        except Exception as e:
+            failures[entry_id] = f"{type(e).__name__}: {e}"
+            continue
+        if pending:
+            prepared.append((entry_id, req.user_id, pending))
+
+    if not prepared:
+        return failures
 
-    print(f"[/save] user={req.user_id} saved {len(saved_points)} facts")
+    try:
+        _, merged = _write_points([(user_id, pending) for _, user_id, pending in prepared])
+        print(f"[journal] Wrote {len(prepared)} queued saves ({len(merged)} facts deduped)")
+        return failures
+    except CircuitOpenError:
+        # Qdrant is down - leave the batch queued without using up attempts
+        raise
+    except Exception as e:
+        print(f"[journal] Batch write failed ({e}), retrying entries individually")
 
+    for entry_id, user_id, pending in prepared:
+        try:
+            _write_points([(user_id, pending)])
+        except CircuitOpenError:
+            # Stop the pass like the batch path: the entries stay queued
+            # (replaying the ones written here is an idempotent upsert)
+            raise
+        except Exception as e:
+            failures[entry_id] = f"{type(e).__name__}: {e}"
+    return failures
+
+
+def start_journal() -> None:
+    """
+    Open the journal and start draining it (called at app startup). Every
+    worker appends to the shared SQLite file; only the leader drains it.
+    """
+    global _journal_worker
+    if _journal_worker is not None:
+        return
+    journal = SaveJournal(
+        os.getenv("SAVE_JOURNAL_PATH", "save_journal.sqlite3"),
+        max_attempts=int(os.getenv("SAVE_JOURNAL_MAX_ATTEMPTS", "10")),
+    )
+    _journal_worker = JournalWorker(
+        journal, _drain_journal, batch_size=int(os.getenv("SAVE_JOURNAL_BATCH", "64"))
+    )
+    if not _is_leader():
+        return
+    _journal_worker.start()
+    backlog = journal.stats()["pending"]
+    if backlog:
+        print(f"[journal] Resuming {backlog} queued saves from {journal.path}")
+
+
+def stop_journal() -> None:
+    """Stop the drain thread (queued entries stay in the journal)."""
+    global _journal_worker
+    if _journal_worker is not None:
+        _journal_worker.stop()
+        _journal_worker.journal.close()
+        _journal_worker = None
+
+
+# ============================================================================
+# Digests (background summaries)
+# ============================================================================
+
+_digest_worker: Optional[DigestWorker] = None
+_digest_inbox: Optional[DigestInbox] = None
+
+
+def _mark_digests_dirty(user_ids: List[str]) -> None:
+    """Queue users for a new digest - directly in the leader, via the inbox elsewhere."""
+    if _digest_worker is not None:
+        for user_id in user_ids:
+            _digest_worker.mark_dirty(user_id)
+    elif _digest_inbox is not None:
+        try:
+            _digest_inbox.add(user_ids)
+        except sqlite3.Error as e:
+            # The leader's reconcile scan catches up with missed users
+            print(f"[digest] ✗ Failed to queue {len(user_ids)} users: {e}")
+
+
+def start_digests() -> None:
+    """
+    Start the digest worker if DIGEST_ENABLED (called at app startup).
+    Only the leader summarizes; with several workers the others queue
+    their dirty users in an inbox next to the save journal.
+    """
+    global _digest_worker, _digest_inbox
+    if _digest_worker is not None or _digest_inbox is not None:
+        return
+    if os.getenv("DIGEST_ENABLED", "false").lower() != "true":
+        return
+    if _workers > 1:
+        _digest_inbox = DigestInbox(os.getenv("SAVE_JOURNAL_PATH", "save_journal.sqlite3"))
+    if not _is_leader():
+        return
+    _digest_worker = DigestWorker(
+        summarize_batch,
+        embed_batch,
+        batch_size=int(os.getenv("DIGEST_BATCH", "8")),
+        interval=float(os.getenv("DIGEST_INTERVAL", "30")),
+        reconcile_interval=float(os.getenv("DIGEST_RECONCILE_INTERVAL", "3600")),
+        max_words=int(os.getenv("DIGEST_MAX_WORDS", "80")),
+        inbox=_digest_inbox,
+    )
+    _digest_worker.start()
+    print("[digest] Worker started")
+
+
+def _digest_stats() -> Dict[str, Any]:
+    if _digest_worker is not None:
+        return _digest_worker.stats()
+    if _digest_inbox is not None:
+        return {"enabled": True, "leader": False, "queued_users": _digest_inbox.count()}
+    return {"enabled": False}
+
+
+def stop_digests() -> None:
+    global _digest_worker, _digest_inbox
+    if _digest_worker is not None:
+        _digest_worker.stop()
+        _digest_worker = None
+    if _digest_inbox is not None:
+        _digest_inbox.close()
+        _digest_inbox = None
+
+
+# ============================================================================
+# Compaction (scheduled merge / retention)
+# ============================================================================
+
+_compaction: Optional[CompactionScheduler] = None
+
+
+def _forget_user_caches(user_id: str) -> None:
+    """Compaction rewrote this user's points - drop anything derived from them."""
+    if _hot_set is not None:
+        _hot_set.invalidate(user_id)
+    _result_cache.bump(user_id)
+    _mark_digests_dirty([user_id])
+
+
+def start_compaction() -> None:
+    """Schedule compaction if COMPACTION_INTERVAL > 0 (called at app startup)."""
+    global _compaction
+    interval = float(os.getenv("COMPACTION_INTERVAL", "0"))
+    if _compaction is not None or interval <= 0 or not _is_leader():
+        return
+    compactor = Compactor(CompactionSettings.from_env(), on_user_changed=_forget_user_caches)
+    _compaction = CompactionScheduler(compactor, interval)
+    _compaction.start()
+    print(f"[compaction] Scheduled every {interval:.0f}s")
+
+
+def stop_compaction() -> None:
+    global _compaction
+    if _compaction is not None:
+        _compaction.stop()
+        _compaction = None
+
+
+# ============================================================================
+# Sharding (consistent-hash user routing)
+# ============================================================================
+
+_rebalancer: Optional[Rebalancer] = None
+
+
+def start_sharding() -> None:
+    """
+    Route users over shards if MEMORY_SHARDS is set (or a shard state file
+    exists) and start the rebalancer. Shards listed in MEMORY_SHARDS but
+    missing from the state file are added online. Called first at startup.
+    """
+    global _rebalancer
+    if _rebalancer is not None:
+        return
+    state_path = service_state.shard_state_path()
+    spec = os.getenv("MEMORY_SHARDS", "").strip()
+    router = service_state.load_router()
+    if router is None:
+        return
+    if _is_leader() and not os.path.exists(state_path):
+        sharding.save_state(state_path, router)
+    set_router(router)
+
+    _rebalancer = Rebalancer(
+        state_path,
+        on_user_moved=_forget_user_caches,
+        rate=float(os.getenv("SHARD_REBALANCE_RATE", "500")),
+        leader=_is_leader(),
+    )
+    new = [s for s in sharding.parse_shards(spec) if s.name not in router.shards] if spec else []
+    if new and _is_leader():
+        _rebalancer.add_shards(new)
+    print(f"[shards] Routing users over {len(get_router().shards)} shards: {', '.join(get_router().shards)}")
+    _rebalancer.start()
+
+
+def stop_sharding() -> None:
+    global _rebalancer
+    if _rebalancer is not None:
+        _rebalancer.stop()
+        _rebalancer = None
+
+
+# ============================================================================
+# Embedding model migration
+# ============================================================================
+
+_migration: Optional[EmbeddingMigration] = None
+_preloaded: Dict[str, Any] = {}  # model name -> backend loaded before fork
+
+
+def preload_models() -> None:
+    """
+    Load the models a migration needs up front (called by the serve.py
+    master before it forks, so workers share them copy-on-write instead of
+    each loading a private copy): a switched migration's model replaces the
+    startup one, and an unfinished migration's target is loaded alongside.
+    start_migration() in each worker then only resolves the collection.
+    """
+    if service_state.load_router() is not None:
+        return
+    state = embedding_migration.load_state(service_state.migration_state_path())
+    target_model = os.getenv("EMBEDDING_MIGRATION_TARGET", "").strip()
+    if state and state["phase"] == embedding_migration.SWITCHED:
+        if current_model() != state["target"]["model"]:
+            use_backend(load_model(state["target"]["model"]))
+            print(f"[migration] Preloaded {current_model()} (switched migration)")
+    elif state:
+        target_model = state["target"]["model"]
+    if target_model and target_model != current_model() and target_model not in _preloaded:
+        _preloaded[target_model] = load_model(target_model)
+        print(f"[migration] Preloaded {target_model} (migration target)")
+
+
+def _load_model(model_name: str):
+    """The backend preloaded before fork, or a private one if there is none."""
+    return _preloaded.get(model_name) or load_model(model_name)
+
+
+def _activate_model(target: Dict[str, Any], backend=None) -> None:
+    """Serve reads and writes from a migrated collection and its model."""
+    if current_model() != target["model"]:
+        use_backend(backend or _load_model(target["model"]))
+    set_active_collection(target["collection"], target["dim"])
+    # Everything cached was computed with the old model's vectors
+    if _hot_set is not None:
+        _hot_set.clear()
+    _result_cache.clear()
+    if _digest_worker is not None:
+        _digest_worker.request_reconcile()
+
+
+def start_migration() -> None:
+    """
+    Apply a finished migration, resume an unfinished one, or start one if
+    EMBEDDING_MIGRATION_TARGET names a new model (called at app startup).
+    """
+    global _migration
+    if _migration is not None:
+        return
+    if get_router() is not None:
+        if os.getenv("EMBEDDING_MIGRATION_TARGET", "").strip():
+            print("[migration] ✗ Embedding migrations aren't supported on a sharded service, ignoring")
+        return
+    state_path = service_state.migration_state_path()
+    state = embedding_migration.load_state(state_path)
+    if state and state["phase"] == embedding_migration.SWITCHED:
+        _activate_model(state["target"])
+        print(f"[migration] Serving '{state['target']['collection']}' ({state['target']['model']})")
+        if _is_leader() and not state.get("settled", True):
+            # Restarted before the post-switch catch-up ran: finish that first
+            _migration = _new_migration(state, state_path, current_backend())
+            _migration.start()
+            return
+
+    target_model = os.getenv("EMBEDDING_MIGRATION_TARGET", "").strip()
+    if state and state["phase"] != embedding_migration.SWITCHED:
+        target_model = state["target"]["model"]
+        print(f"[migration] Resuming migration to {target_model} ({state['phase']})")
+    elif not target_model or target_model == current_model():
+        return
+
+    backend = _load_model(target_model)
+    if not state or state["phase"] == embedding_migration.SWITCHED:
+        state = embedding_migration.new_state(
+            _collection_name(), current_model(), target_model, backend.dim
+        )
+        print(f"[migration] Migrating {current_model()} -> {target_model} into '{state['target']['collection']}'")
+
+    _migration = _new_migration(state, state_path, backend)
+    _migration.start()
+
+
+def _new_migration(state: Dict[str, Any], state_path: str, backend) -> EmbeddingMigration:
+    return EmbeddingMigration(
+        state,
+        state_path,
+        encode=lambda texts: backend.encode(texts).tolist(),
+        on_switch=lambda target: _activate_model(target, backend),
+        batch_size=int(os.getenv("EMBEDDING_MIGRATION_BATCH", "256")),
+        rate=float(os.getenv("EMBEDDING_MIGRATION_RATE", "200")),
+        auto_switch=os.getenv("EMBEDDING_MIGRATION_AUTO_SWITCH", "true").lower() == "true",
+        settle=float(os.getenv("EMBEDDING_MIGRATION_SETTLE", "30")),
+        leader=_is_leader(),
+    )
+
+
+def stop_migration() -> None:
+    global _migration
+    if _migration is not None:
+        _migration.stop()
+        _migration = None
+
+
+def _enqueue(req: SaveRequest, pending: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """Journal a save for the background writer and return 'accepted'."""
+    journal_id = _journal_worker.journal.append(req.model_dump(mode="json"))
+    _journal_worker.notify()
+    print(f"[/save] user={req.user_id} queued {len(pending)} facts (journal={journal_id})")
+    return {
+        "status": "accepted",
+        "point_id": next(iter(pending)),
+        "content_hash": None,
+        "facts_saved": 0,
+        "facts_queued": len(pending),
+        "journal_id": journal_id,
+    }
+
+
+def _unavailable(error: CircuitOpenError) -> HTTPException:
+    """503 with Retry-After so callers back off instead of queueing up."""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, int(error.retry_after + 0.5)))},
+    )
+
+
+@router.post("/save", status_code=200)
+def save_memory(req: SaveRequest) -> Dict[str, Any]:
+    """
+    Save a conversation to memory.
+
+    ATOMIC: By the time this is called, the decision to save has already
+    been made by the upstream filter/orchestrator. This endpoint just:
+    1. Extracts text and facts
+    2. Embeds all facts in a single batch
+    3. Stores in Qdrant with one bulk upsert (one point per fact for deduplication)
+
+    In async mode (SAVE_MODE=async or async_write=true) steps 2-3 happen in
+    the background: the request is journaled and "accepted" is returned.
+
+    No classification, no searching - those happen elsewhere.
+    """
+    pending, skipped = _prepare_facts(req)
+    if skipped is not None:
+        return skipped
+
+    use_async = _default_async if req.async_write is None else req.async_write
+    if use_async and _journal_worker is not None:
+        return _enqueue(req, pending)
+
+    try:
+        timing, merged = _write_points(
+            [(req.user_id, pending)], wait=req.wait, route="/save"
+        )
+    except CircuitOpenError as e:
+        # Qdrant is down: keep the save in the journal rather than losing it
+        if _journal_worker is None:
+            raise _unavailable(e)
+        return _enqueue(req, pending)
+
+    print(
+        f"[/save] user={req.user_id} saved {len(pending) - len(merged)} facts, "
+        f"deduped {len(merged)} (embed={timing['embed']:.1f}ms "
+        f"upsert={timing['upsert']:.1f}ms wait={req.wait})"
+    )
+
+    first = next(iter(pending))
     return {
         "status": "saved",
-        "point_id": saved_points[0] if saved_points else None,
+        "point_id": merged.get(first, first),
         "content_hash": None,
-        "facts_saved": len(saved_points),
+        "facts_saved": len(pending) - len(merged),
+        "facts_deduped": len(merged),
+        "timing_ms": timing,
+    }
+
+
+@router.post("/save-batch", status_code=200)
+def save_batch(req: SaveBatchRequest) -> Dict[str, Any]:
+    """
+    Store many chunks and/or facts for one user in a single request.
+
+    Items are embedded and upserted in groups of SAVE_BATCH_GROUP (one
+    encode() and one upsert per group), so a 200-chunk document costs a
+    handful of round-trips instead of 200. Returns a status per item, in
+    request order: saved, merged (a near-duplicate fact folded into an
+    existing point, whose ID is returned), skipped (blank or invalid) or
+    failed (its group's write failed - other groups are unaffected).
+    """
+    results: List[Dict[str, Any]] = []
+    pending: Dict[int, Dict[str, Any]] = {}
+    owners: Dict[int, List[int]] = {}  # point_id -> item indexes (duplicates share a point)
+
+    for i, item in enumerate(req.items):
+        source_type = item.source_type or req.source_type
+        source_name = item.source_name or req.source_name
+        if item.fact is not None:
+            point = _fact_point(req.user_id, item.fact, source_type, source_name)
+        elif item.text is not None:
+            point = _chunk_point(req.user_id, item.text, source_type, source_name, item.metadata)
+        else:
+            point = None
+
+        if point is None:
+            results.append({"index": i, "status": "skipped", "point_id": None, "reason": "Empty item"})
+            continue
+        point_id, entry = point
+        pending[point_id] = entry
+        owners.setdefault(point_id, []).append(i)
+        results.append({"index": i, "status": "pending", "point_id": point_id})
+
+    group_size = max(1, int(os.getenv("SAVE_BATCH_GROUP", "256")))
+    point_ids = list(pending)
+    saved = failed = 0
+    timing = {"embed": 0.0, "dedup": 0.0, "upsert": 0.0}
+    merged: Dict[int, int] = {}
+    unavailable: Optional[CircuitOpenError] = None
+
+    for start in range(0, len(point_ids), group_size):
+        group = point_ids[start : start + group_size]
+        error = None
+        if unavailable is not None:
+            error = str(unavailable)
+        else:
+            try:
+                group_timing, group_merged = _write_points(
+                    [(req.user_id, {pid: pending[pid] for pid in group})],
+                    wait=req.wait,
+                    route="/save-batch",
+                )
+                for key in timing:
+                    timing[key] += group_timing[key]
+                merged.update(group_merged)
+            except CircuitOpenError as e:
+                # Don't hammer an open breaker with the remaining groups
+                unavailable = e
+                error = str(e)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"[/save-batch] user={req.user_id} group at {start} failed: {error}")
+
+        for pid in group:
+            for i in owners[pid]:
+                if error is None and pid in merged:
+                    results[i].update(status="merged", point_id=merged[pid])
+                    saved += 1
+                elif error is None:
+                    results[i]["status"] = "saved"
+                    saved += 1
+                else:
+                    results[i].update(status="failed", reason=error)
+                    failed += 1
+
+    if unavailable is not None and saved == 0:
+        raise _unavailable(unavailable)
+
+    skipped = len(req.items) - saved - failed
+    print(
+        f"[/save-batch] user={req.user_id} items={len(req.items)} saved={saved} "
+        f"failed={failed} skipped={skipped} deduped={len(merged)} points={len(point_ids)} "
+        f"(embed={timing['embed']:.1f}ms upsert={timing['upsert']:.1f}ms)"
+    )
+
+    return {
+        "status": "saved" if failed == 0 else ("partial" if saved else "failed"),
+        "saved": saved,
+        "failed": failed,
+        "skipped": skipped,
+        "points": len(point_ids),
+        "deduped": len(merged),
+        "timing_ms": {k: round(v, 2) for k, v in timing.items()},
+        "items": results,
     }
 
 
@@ -290,104 +1163,257 @@ def search_memory(req: SearchRequest) -> List[MemoryResult]:
     Search for relevant memories by semantic similarity.
     Embeds the query, searches Qdrant, returns matches filtered by user_id.
     """
-    # Ensure collection exists before searching
-    _ensure_collection()
-
-    query_vec = embed(req.query_text)
-    qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port = os.getenv("QDRANT_PORT", "6333")
-
     try:
-        session = _get_http_session()
-        search_response = session.post(
-            f"http://{qdrant_host}:{qdrant_port}/collections/{collection_name}/points/search",
-            json={
-                "vector": query_vec,
-                "filter": {
-                    "must": [{"key": "user_id", "match": {"value": req.user_id}}]
-                },
-                "limit": req.top_k,
-                "with_payload": True,
-            },
-            timeout=5,
-        )
+        results = _search_text(req.user_id, req.query_text, req.top_k)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-        # Handle collection not found (404) - return empty, not error
-        if search_response.status_code == 404:
-            print(f"[/search] user={req.user_id} collection not found, returning empty")
-            raise HTTPException(status_code=404, detail="No memories found")
+    metrics.RESULT_COUNT.observe(len(results), "/search")
+    if not results:
+        raise HTTPException(status_code=404, detail="No memories found")
 
-        search_response.raise_for_status()
-        search_data = search_response.json()
-        results = search_data.get("result", []) if "result" in search_data else []
+    print(f"[/search] user={req.user_id} results={len(results)}")
 
-        if not results:
-            raise HTTPException(status_code=404, detail="No memories found")
+    return [_to_result(pt) for pt in results]
 
-        print(f"[/search] user={req.user_id} results={len(results)}")
 
-        return [
-            MemoryResult(
-                user_text=pt.get("payload", {}).get("user_text", ""),
-                facts=pt.get("payload", {}).get("facts"),
-                messages=None,
-                score=pt.get("score", 0),
-                source_type=pt.get("payload", {}).get("source_type"),
-                source_name=pt.get("payload", {}).get("source_name"),
-            )
-            for pt in results
-        ]
-    except HTTPException:
-        raise
+@router.post("/search-batch", response_model=list[QueryResults])
+def search_memory_batch(req: SearchBatchRequest) -> List[QueryResults]:
+    """
+    Run several searches for one user at once (e.g. the user text, an
+    attachment name and a continuation's original task). All queries are
+    embedded in one forward pass and sent to Qdrant as one batch request.
+    Returns one entry per query, in order; empty results are not an error.
+    """
+    try:
+        batches = _search_texts(req.user_id, req.queries, req.top_k)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+    for points in batches:
+        metrics.RESULT_COUNT.observe(len(points), "/search-batch")
+    print(
+        f"[/search-batch] user={req.user_id} queries={len(req.queries)} "
+        f"results={sum(len(b) for b in batches)}"
+    )
+
+    return [
+        QueryResults(query=query, results=[_to_result(pt) for pt in points])
+        for query, points in zip(req.queries, batches)
+    ]
+
 
 @router.post("/summaries")
 def list_summaries(req: SearchRequest) -> List[Dict[str, Any]]:
     """
-    Get memory summaries matching a query.
-    Like search but returns just the summary text, not full content.
-    """
-    query = req.query_text or "personal facts dates names preferences"
-    query_vec = embed(query)
-    qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port = os.getenv("QDRANT_PORT", "6333")
+    Get the user's memory digest.
 
+    Digests are precomputed by the background digest worker, so this is a
+    single point lookup - no search and no summarization on the request
+    path. query_text/top_k are accepted for compatibility and ignored.
+    """
     try:
-        session = _get_http_session()
-        search_response = session.post(
-            f"http://{qdrant_host}:{qdrant_port}/collections/{collection_name}/points/search",
-            json={
-                "vector": query_vec,
-                "filter": {
-                    "must": [{"key": "user_id", "match": {"value": req.user_id}}]
-                },
-                "limit": req.top_k,
-                "with_payload": True,
-            },
-            timeout=10,
-        )
-        search_response.raise_for_status()
-        data = search_response.json()
-        results = data.get("result", [])
-
-        summaries = [
-            {
-                "summary": pt.get("payload", {}).get("summary"),
-                "score": pt.get("score", 0),
-            }
-            for pt in results
-            if pt.get("payload", {}).get("summary")
-        ]
-
-        print(f"[/summaries] user={req.user_id} results={len(summaries)}")
-
-        if not summaries:
-            raise HTTPException(status_code=404, detail="No summaries found")
-
-        return summaries
-    except HTTPException:
-        raise
+        digest = load_digest(req.user_id)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Summaries failed: {str(e)}")
+
+    print(f"[/summaries] user={req.user_id} digest={'yes' if digest else 'no'}")
+
+    if not digest or not digest.get("summary"):
+        raise HTTPException(status_code=404, detail="No summaries found")
+
+    return [
+        {
+            "summary": digest["summary"],
+            "score": 1.0,
+            "fact_count": digest.get("fact_count", 0),
+            "updated_at": digest.get("updated_at"),
+        }
+    ]
+
+
+@router.get("/export")
+def export_memories(user_id: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream a user's points (or every point, without user_id) as NDJSON:
+    a header line, then {"id", "payload", "vector"} per line with the
+    vector as base64 float16. Feed the body to /import on another host.
+    """
+    try:
+        # Also surfaces an open breaker as 503 before the stream starts
+        count = 0
+        for shard in read_shards(user_id) if user_id else shards():
+            with use_shard(shard):
+                count += with_collection(
+                    lambda client: client.count(
+                        collection_name=_collection_name(),
+                        count_filter=user_filter(user_id) if user_id else None,
+                        exact=False,
+                    ).count
+                )
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+
+    print(f"[/export] user={user_id or '*'} ~{count} points")
+    return StreamingResponse(
+        snapshot.stream_ndjson(user_id),
+        media_type="application/x-ndjson",
+        headers={"X-Point-Count": str(count)},
+    )
+
+
+@router.post("/import")
+async def import_memories(request: Request) -> Dict[str, Any]:
+    """
+    Load an NDJSON stream from /export. Points are upserted by id in
+    batches as the body arrives, so re-sending an interrupted import is
+    safe and memory use doesn't grow with the upload.
+    """
+    importer = snapshot.StreamImporter()
+    buffer = b""
+    try:
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                if importer.add(line):
+                    await asyncio.to_thread(importer.flush)
+        importer.add(buffer)
+        await asyncio.to_thread(importer.flush)
+    except snapshot.SnapshotError as e:
+        raise HTTPException(status_code=400, detail=f"{e} ({importer.imported} points imported)")
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    finally:
+        for user_id in importer.users:
+            _forget_user_caches(user_id)
+
+    print(f"[/import] imported {importer.imported} points for {len(importer.users)} users")
+    return {"status": "imported", "imported": importer.imported, "users": len(importer.users)}
+
+
+@router.get("/blobs/{digest}")
+def get_blob(digest: str) -> FileResponse:
+    """
+    Bytes of an attachment saved with a message. digest is the "blob"
+    value of a payload attachment ref (with or without "sha256:").
+
+    Always served as opaque bytes: the content is whatever a caller
+    uploaded, so it is never given a type a browser would render. Callers
+    wanting the original type use the ref's media_type.
+    """
+    try:
+        path = _blob_store.path(digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Blob not found")
+    # Content-addressed: the bytes behind a digest never change
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "X-Content-Type-Options": "nosniff",
+        },
+    )
+
+
+@router.post("/migration/switch")
+def switch_migration() -> Dict[str, Any]:
+    """Switch to the migrated model now (when EMBEDDING_MIGRATION_AUTO_SWITCH is off)."""
+    if _migration is None:
+        raise HTTPException(status_code=404, detail="No embedding migration in progress")
+    try:
+        _migration.switch()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    return _migration.stats()
+
+
+@router.get("/shards")
+def shard_topology() -> Dict[str, Any]:
+    """Shards, endpoints and rebalance progress."""
+    return _rebalancer.stats() if _rebalancer is not None else {"enabled": False}
+
+
+@router.post("/shards")
+def add_shard(req: AddShardRequest) -> Dict[str, Any]:
+    """Add a shard; users whose ring segment it takes over are moved onto it in the background."""
+    if _rebalancer is None:
+        raise HTTPException(status_code=404, detail="Sharding isn't enabled (set MEMORY_SHARDS)")
+    if req.host == ":memory:":
+        # An in-process Qdrant would start empty and live only in this worker
+        raise HTTPException(
+            status_code=400, detail="':memory:' shards can only be set in MEMORY_SHARDS"
+        )
+    shard = sharding.Shard(req.name, req.host, req.port, req.collection)
+    router = sharding.get_router()
+    try:
+        sharding.check_targets([*(router.shards.values() if router else []), shard])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        _rebalancer.add_shards([shard])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _rebalancer.stats()
+
+
+@router.get("/stats")
+def memory_stats() -> Dict[str, Any]:
+    """Runtime stats for tuning: embedding scheduler, caches, hot set."""
+    return {
+        "embedder": embedder_stats(),
+        "hot_set": _hot_set.stats() if _hot_set is not None else {"enabled": False},
+        "search_cache": _result_cache.stats(),
+        "qdrant_breaker": breaker_stats(),
+        "digests": _digest_stats(),
+        "journal": (
+            _journal_worker.stats() if _journal_worker is not None else {"enabled": False}
+        ),
+        "compaction": (
+            _compaction.stats() if _compaction is not None else {"enabled": False}
+        ),
+        "migration": (
+            _migration.stats() if _migration is not None else {"enabled": False}
+        ),
+        "shards": _rebalancer.stats() if _rebalancer is not None else {"enabled": False},
+        "blobs": _blob_store.stats(),
+    }
+
+
+# Scrape-time gauges for GET /metrics (read when scraped, never on a request)
+metrics.REGISTRY.gauge(
+    "memory_model_loaded", "1 when the embedding model is in memory",
+    lambda: {current_model(): int(model_loaded())}, label="model",
+)
+metrics.REGISTRY.gauge(
+    "memory_embed_cache_entries", "Embedding cache entries by tier", cache_sizes, label="tier"
+)
+metrics.REGISTRY.gauge(
+    "memory_search_cache_entries", "Cached search results", lambda: _result_cache.stats()["size"]
+)
+metrics.REGISTRY.gauge(
+    "memory_hot_set_users", "Users held in the in-process hot set",
+    lambda: _hot_set.stats()["users"] if _hot_set is not None else None,
+)
+metrics.REGISTRY.gauge(
+    "memory_hot_set_bytes", "Bytes of vectors held in the hot set",
+    lambda: _hot_set.stats()["bytes"] if _hot_set is not None else None,
+)
+metrics.REGISTRY.gauge(
+    "memory_journal_pending", "Saves queued in the write-behind journal",
+    lambda: _journal_worker.journal.stats()["pending"] if _journal_worker is not None else None,
+)
+metrics.REGISTRY.gauge(
+    "memory_qdrant_breaker_open", "1 while the Qdrant circuit breaker is open",
+    lambda: int(breaker_stats()["state"] == "open"),
+)
@@ -1,14 +1,18 @@
 import logging
 import os
+import time
 from pathlib import Path
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 from api import memory
-from services.embedder import embed
+from services import metrics
+from services.filter_source import FilterSource, SourceVersion, accepts_gzip
+from services.embedder import embed, flush_cache, set_disk_cache_writable
+from services.qdrant_client import breaker_stats, ensure_collection_async
 
 
 # ============================================================================
@@ -39,11 +43,32 @@ app = FastAPI(
 # Middleware
 # ============================================================================
 
+def _route_label(scope) -> str:
+    """
+    Matched route as a template (/api/memory/blobs/{digest}), not the raw
+    path, so path parameters don't create a series per value.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in (scope.get("path_params") or {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
 @app.middleware("http")
 async def request_logging_middleware(request: Request, call_next):
-    """Log all HTTP requests for debugging."""
+    """Log all HTTP requests for debugging and time them for /metrics."""
     logger.debug(f"→ {request.method:6s} {request.url.path}")
-    response = await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started, _route_label(request.scope), request.method, status
+        )
     logger.debug(f"← {response.status_code} {request.url.path}")
     return response
 
@@ -94,6 +119,20 @@ async def startup_event():
     - Loads embedding model (all-mpnet-base-v2) for sub-second first request
     - Connects to Qdrant and initializes collection if needed
     """
+    # serve.py workers share the disk embedding cache; only worker 0 writes it
+    if os.getenv("MEMORY_WORKER_INDEX", "0") != "0":
+        set_disk_cache_writable(False)
+
+    # serve.py workers publish metric snapshots so any worker can answer /metrics
+    metrics.start_sharing()
+
+    # Shard routing first: the collection check and every job below use it
+    memory.start_sharding()
+
+    # A finished embedding migration picks the model and collection, so
+    # apply it before warming up either
+    memory.start_migration()
+
     logger.info("[startup] Preloading embedding model...")
     try:
         embed("warmup")  # Warmup call to load model
@@ -101,6 +140,34 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"[startup] ⚠ Failed to preload embedding model: {e}")
 
+    logger.info("[startup] Verifying Qdrant collection...")
+    try:
+        await ensure_collection_async()
+        logger.info("[startup] ✓ Qdrant collection ready")
+    except Exception as e:
+        # Not fatal - the first request will retry the check
+        logger.warning(f"[startup] ⚠ Qdrant collection check failed: {e}")
+
+    # Drain any saves queued before the last restart
+    memory.start_journal()
+    memory.start_digests()
+    memory.start_compaction()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and persist the on-disk embedding cache."""
+    memory.stop_compaction()
+    memory.stop_sharding()
+    memory.stop_migration()
+    memory.stop_digests()
+    memory.stop_journal()
+    metrics.stop_sharing()
+    try:
+        flush_cache()
+    except Exception as e:
+        logger.warning(f"[shutdown] ⚠ Failed to flush embedding cache: {e}")
+
 
 # ============================================================================
 # Routers
@@ -116,20 +183,60 @@ app.include_router(memory.router, prefix="/api/memory")
 
 FILTERS_PATH = Path(os.getenv("FILTERS_PATH", "/filters"))
 
+# Held in memory; re-read only when the file's mtime/size/inode changes.
+# Falls back to the local copy if the mounted volume isn't available.
+_filter_source = FilterSource(
+    [FILTERS_PATH / "aj.filter.py", Path(__file__).resolve().parent / "aj.filter.py"]
+)
+
+
+def _current_filter() -> SourceVersion:
+    try:
+        return _filter_source.get()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="aj.filter.py not found")
+
+
+def _serve_filter(request: Request) -> Response:
+    """
+    The filter source with ETag / Last-Modified validators: 304 when the
+    client's copy is current, the precompressed gzip body when accepted.
+    """
+    source = _current_filter()
+    gzipped = accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        # The gzip body is a different representation, so it has its own tag
+        "ETag": source.gzip_etag if gzipped else source.etag,
+        "Last-Modified": source.last_modified,
+        "Cache-Control": "no-cache",  # may store, must revalidate
+        "Vary": "Accept-Encoding",
+    }
+    if source.matches(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+        headers["ETag"],
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    body = source.gzipped if gzipped else source.body
+    return Response(body, media_type="text/plain; charset=utf-8", headers=headers)
+
 
 @app.get("/api/memory/filter", response_class=PlainTextResponse)
-def get_memory_filter() -> str:
+def get_memory_filter(request: Request) -> Response:
     """
     Legacy endpoint - redirects to /api/agent.
     
     Deprecated: Use http://memory_api:8000/api/agent instead.
     """
     logger.debug("[filter] Legacy /api/memory/filter requested - use /api/agent")
-    return get_agent_filter()
+    return get_agent_filter(request)
 
 
 @app.get("/api/agent", response_class=PlainTextResponse)
-def get_agent_filter() -> str:
+def get_agent_filter(request: Request) -> Response:
     """
     Serve the AJ agentic filter plugin source code.
     
@@ -137,29 +244,50 @@ def get_agent_filter() -> str:
     
     Open-WebUI periodically calls this endpoint to fetch the filter plugin
     source, parses it to find the Filter class, and instantiates it to
-    intercept conversations for agentic processing.
+    intercept conversations for agentic processing. Send If-None-Match
+    (the ETag of the last fetch) to get a 304 when nothing changed.
     
     Returns: Complete Python source of aj.filter.py
     """
     logger.debug("[filter] Serving AJ agent filter source")
-    filter_path = FILTERS_PATH / "aj.filter.py"
-    
-    if not filter_path.exists():
-        # Fallback to local copy if mounted volume not available
-        filter_path = Path(__file__).resolve().parent / "aj.filter.py"
-    
-    return filter_path.read_text(encoding="utf-8")
+    return _serve_filter(request)
+
+
+@app.get("/api/agent/version")
+def get_agent_filter_version() -> dict:
+    """Hash and timestamp of the current filter source, without the source."""
+    source = _current_filter()
+    return {
+        "sha256": source.sha256,
+        "etag": source.etag,
+        "last_modified": source.last_modified,
+        "size": len(source.body),
+        "path": source.path,
+    }
 
 
 @app.get("/api/aj/filter", response_class=PlainTextResponse)
-def get_aj_filter() -> str:
+def get_aj_filter(request: Request) -> Response:
     """
     Legacy endpoint - redirects to /api/agent.
     
     Deprecated: Use http://memory_api:8000/api/agent instead.
     """
     logger.debug("[filter] Legacy /api/aj/filter requested - use /api/agent")
-    return get_agent_filter()
+    return get_agent_filter(request)
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> Response:
+    """
+    Prometheus text format: request / embed / Qdrant latency histograms,
+    batch sizes and result counts, plus model and cache gauges.
+    """
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # ============================================================================
@@ -168,8 +296,18 @@ def get_aj_filter() -> str:
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for orchestration."""
-    return {"status": "healthy"}
+    """
+    Health check endpoint for orchestration.
+
+    Always 200 (the process is alive); status is "degraded" while the Qdrant
+    circuit breaker is open so callers can skip memory calls until
+    qdrant.retry_after_s has passed. No network call - reads breaker state.
+    """
+    qdrant = breaker_stats()
+    return {
+        "status": "degraded" if qdrant["state"] == "open" else "healthy",
+        "qdrant": qdrant,
+    }
 
 
 # ============================================================================
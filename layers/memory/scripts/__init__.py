@@ -0,0 +1,14 @@
+"""
+Memory Service Scripts
+
+Operational tools run inside the memory container, e.g.:
+    python -m scripts.embedding_parity
+
+Modules:
+    compact: Merge near-duplicate facts and apply retention limits.
+    snapshot: Export / import memory points as float16 snapshot directories.
+    loadtest: Offline save / search / mixed load test with a JSON QPS + latency report.
+    bench_workers: rps and RSS / PSS scaling of serve.py worker counts.
+    embedding_parity: Cosine drift + throughput of embedding backends vs fp32.
+    storage_profiles: Storage profile report and collection migration.
+"""
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Multi-Worker Scaling Benchmark
+
+Starts serve.py with 1, 2, 4, ... workers, drives concurrent /search load
+at each step and reports throughput against memory:
+  - requests/sec, p50 / p99 latency (ms), errors
+  - RSS and PSS summed over the master and its workers (from
+    /proc/<pid>/smaps_rollup). PSS splits shared pages between the
+    processes mapping them, so with copy-on-write model weights it should
+    grow far slower than RSS as workers are added.
+
+Every query is unique, so the search cache and embedding cache never
+answer - each request pays for an embedding and a Qdrant search.
+
+The servers it starts are isolated from the running service: they use a
+throwaway collection (--collection, dropped afterwards) on the configured
+Qdrant, keep the journal / shard / migration state in a temp dir, and run
+no digests, compaction or migration - otherwise worker 0 of the bench
+would be a second leader draining the live journal. Searches run against
+the empty collection, which still exercises the embedding path.
+
+Usage (inside the memory container, from /app):
+    python -m scripts.bench_workers
+    python -m scripts.bench_workers --workers 1 2 4 8 --duration 30 --concurrency 64
+    python -m scripts.bench_workers --output workers.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    """Rss / Pss (kB) of one process."""
+    out = {"rss_kb": 0, "pss_kb": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    out[f"{key.lower()}_kb"] = int(rest.split()[0])
+    except OSError:
+        pass
+    return out
+
+
+def _tree_memory(pid: int) -> Dict[str, Any]:
+    pids = [pid] + _children(pid)
+    per_process = [_memory_kb(p) for p in pids]
+    return {
+        "processes": len(pids),
+        "rss_mb": round(sum(m["rss_kb"] for m in per_process) / 1024, 1),
+        "pss_mb": round(sum(m["pss_kb"] for m in per_process) / 1024, 1),
+    }
+
+
+def _wait_healthy(base_url: str, proc: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"serve.py not healthy after {timeout:.0f}s")
+
+
+async def _drive(base_url: str, user_id: str, duration: float, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client: httpx.AsyncClient, worker: int) -> None:
+        nonlocal errors, counter
+        while time.monotonic() < deadline:
+            counter += 1
+            body = {"user_id": user_id, "query_text": f"what did I say about topic {worker}-{counter}?", "top_k": 5}
+            start = time.perf_counter()
+            try:
+                r = await client.post(f"{base_url}/api/memory/search", json=body)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+    }
+
+
+def _bench_env(args: argparse.Namespace, workdir: Path) -> Dict[str, str]:
+    """The service's environment, minus everything shared with the live service."""
+    env = dict(os.environ)
+    env["INDEX_NAME"] = args.collection
+    env["SAVE_MODE"] = "sync"
+    env["SAVE_JOURNAL_PATH"] = str(workdir / "save_journal.sqlite3")
+    env["SHARD_STATE"] = str(workdir / "shards.json")
+    env["EMBEDDING_MIGRATION_STATE"] = str(workdir / "embedding_migration.json")
+    env["BLOB_STORE_DIR"] = str(workdir / "blobs")
+    env["DIGEST_ENABLED"] = "false"
+    env["COMPACTION_INTERVAL"] = "0"
+    for name in ("MEMORY_SHARDS", "EMBEDDING_MIGRATION_TARGET", "EMBED_CACHE_DIR", "METRICS_DIR"):
+        env.pop(name, None)
+    return env
+
+
+def _drop_collection(name: str) -> None:
+    host = os.getenv("QDRANT_HOST", "localhost")
+    if host.startswith((":memory:", "path:")):
+        return
+    try:
+        from qdrant_client import QdrantClient
+
+        QdrantClient(host=host, port=int(os.getenv("QDRANT_PORT", "6333"))).delete_collection(name)
+    except Exception as e:
+        print(f"[bench] ✗ Could not drop '{name}': {e}")
+
+
+def bench(workers: int, args: argparse.Namespace, workdir: Path) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(args.port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=_bench_env(args, workdir),
+    )
+    try:
+        _wait_healthy(base_url, proc, args.startup_timeout)
+        # Warm every worker's model and connection pool before measuring
+        asyncio.run(_drive(base_url, args.user_id, 3.0, args.concurrency))
+        idle = _tree_memory(proc.pid)
+        load = asyncio.run(_drive(base_url, args.user_id, args.duration, args.concurrency))
+        loaded = _tree_memory(proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {"workers": workers, **load, "memory_idle": idle, "memory_loaded": loaded}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="rps vs. memory for serve.py worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per step")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections")
+    parser.add_argument("--port", type=int, default=int(os.getenv("BENCH_PORT", "8765")))
+    parser.add_argument("--user-id", default="bench-user")
+    parser.add_argument("--collection", default="bench_workers_collection",
+                        help="Throwaway collection the servers use (dropped afterwards)")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+    if args.collection == os.getenv("INDEX_NAME", "user_memory_collection"):
+        print(f"[bench] ✗ --collection '{args.collection}' is the live collection", file=sys.stderr)
+        return 1
+
+    results = []
+    try:
+        for workers in args.workers:
+            print(f"[bench] {workers} worker(s): {args.duration:.0f}s at concurrency {args.concurrency}")
+            with tempfile.TemporaryDirectory(prefix="bench-workers-") as workdir:
+                result = bench(workers, args, Path(workdir))
+            results.append(result)
+            print(f"[bench]   {result['rps']} rps, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+                  f"RSS {result['memory_loaded']['rss_mb']} MB, PSS {result['memory_loaded']['pss_mb']} MB")
+    finally:
+        _drop_collection(args.collection)
+
+    base = results[0]
+    for result in results:
+        result["rps_scaling"] = round(result["rps"] / base["rps"], 2) if base["rps"] else None
+        result["pss_growth"] = (
+            round(result["memory_loaded"]["pss_mb"] / base["memory_loaded"]["pss_mb"], 2)
+            if base["memory_loaded"]["pss_mb"] else None
+        )
+
+    report = json.dumps({"results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+        print(f"[bench] Wrote {args.output}")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
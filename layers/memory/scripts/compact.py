@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Memory Compaction
+
+One-off run of the compaction / retention job (services/compaction.py):
+merge near-duplicate facts, drop points past the age limit and enforce a
+per-user cap. Prints a JSON report with the number of points reclaimed.
+
+Defaults come from the COMPACTION_* env vars; flags override them. Start
+with --dry-run to see what would be reclaimed without writing anything.
+
+Runs on the collections the service uses (every shard of a sharded
+service, or a switched embedding migration's collection - see
+services/service_state.py).
+
+A running service doesn't see this process's deletes in its hot set or
+search cache until they expire - use COMPACTION_INTERVAL for in-app runs
+that keep the caches in step.
+
+Usage (inside the memory container):
+    python -m scripts.compact --dry-run
+    python -m scripts.compact --max-age-days 365 --max-points 5000
+    python -m scripts.compact --user alice --threshold 0.9 --rate 0
+"""
+
+import argparse
+import json
+import sys
+
+from services.compaction import CompactionSettings, Compactor
+from services.service_state import load_routing
+
+
+def main():
+    defaults = CompactionSettings.from_env()
+    parser = argparse.ArgumentParser(description="Compact the memory collection")
+    parser.add_argument("--user", action="append", dest="users",
+                        help="Only compact this user (repeatable; default: everyone)")
+    parser.add_argument("--threshold", type=float, default=defaults.threshold,
+                        help="Cosine similarity to merge facts at (default 0: no merging; "
+                             "e.g. 0.92 for all-mpnet-base-v2)")
+    parser.add_argument("--max-points", type=int, default=defaults.max_points,
+                        help="Per-user point cap (0 = no cap)")
+    parser.add_argument("--max-age-days", type=float, default=defaults.max_age_days,
+                        help="Delete points older than this (0 = keep forever)")
+    parser.add_argument("--rate", type=float, default=defaults.rate,
+                        help="Points scanned per second (0 = unthrottled)")
+    parser.add_argument("--dry-run", action="store_true", help="Report only, change nothing")
+    parser.add_argument("--output", help="Also write the JSON report here")
+    args = parser.parse_args()
+
+    settings = CompactionSettings(
+        threshold=args.threshold,
+        max_points=args.max_points,
+        max_age_days=args.max_age_days,
+        rate=args.rate,
+        dry_run=args.dry_run,
+    )
+    routing = load_routing()
+    if routing:
+        print(f"[compact] Routing as the service: {routing}", file=sys.stderr)
+    report = Compactor(settings).run(args.users)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    sys.exit(1 if report["stopped_early"] else 0)
+
+
+if __name__ == "__main__":
+    main()
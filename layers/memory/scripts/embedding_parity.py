@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Embedding Backend Parity Check
+
+Compares each EMBEDDING_PROVIDER backend against the PyTorch fp32
+reference on the same texts and reports:
+  - cosine drift (mean / min / p01 cosine similarity to the reference)
+  - max absolute element difference
+  - throughput (batched texts/sec) and single-text latency (p50/p95 ms)
+  - speedup vs the reference
+
+Usage (inside the memory container):
+    python -m scripts.embedding_parity
+    python -m scripts.embedding_parity --providers onnx_int8 --texts-file facts.txt
+    python -m scripts.embedding_parity --output parity.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.embedding_backends import BACKENDS, SentenceTransformerBackend, StubBackend
+
+MODEL_NAME = "all-mpnet-base-v2"
+
+# Short fact-style strings, like what /save and /search actually embed
+SAMPLE_TEXTS = [
+    "name: Ian",
+    "spouse: User is married to Sarah",
+    "pet: a golden retriever named Max",
+    "birthday: March 14",
+    "favorite_show: The Big Bang Theory",
+    "location: lives in Portland, Oregon",
+    "occupation: software engineer working on infrastructure automation",
+    "preference: prefers dark mode and vim keybindings",
+    "what is my wife's name?",
+    "remind me what servers are running the postfix relay",
+    "allergy: allergic to peanuts",
+    "project: migrating the homelab to Kubernetes",
+    "hobby: restores vintage motorcycles on weekends",
+    "car: drives a 2019 Subaru Outback",
+    "personal facts dates names preferences",
+    "The quarterly report shows revenue grew 12% year over year, driven by "
+    "subscription renewals and a new enterprise tier.",
+]
+
+
+def _load_texts(path: str | None, repeat: int) -> List[str]:
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS
+    return texts * max(1, repeat)
+
+
+def _throughput(backend, texts: List[str], batch_size: int, runs: int) -> Dict[str, float]:
+    """Batched texts/sec plus single-text latency percentiles."""
+    backend.encode(texts[:batch_size])  # warmup
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        for i in range(0, len(texts), batch_size):
+            backend.encode(texts[i : i + batch_size])
+    elapsed = time.perf_counter() - start
+
+    latencies = []
+    for text in texts[: min(len(texts), 200)]:
+        t0 = time.perf_counter()
+        backend.encode([text])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "texts_per_sec": round(len(texts) * runs / elapsed, 1),
+        "single_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def run(
+    providers: List[str], texts: List[str], batch_size: int, runs: int, model_name: str = MODEL_NAME
+) -> Dict[str, Any]:
+    reference = SentenceTransformerBackend(model_name)
+    ref_vecs = reference.encode(texts)
+    ref_perf = _throughput(reference, texts, batch_size, runs)
+
+    report: Dict[str, Any] = {
+        "model": model_name,
+        "texts": len(texts),
+        "batch_size": batch_size,
+        "reference": {"provider": reference.provider, "dim": reference.dim, **ref_perf},
+        "backends": {},
+    }
+
+    for provider in providers:
+        if provider == reference.provider:
+            continue
+        try:
+            backend = BACKENDS[provider](model_name)
+        except Exception as e:
+            report["backends"][provider] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+
+        vecs = backend.encode(texts)
+        if vecs.shape != ref_vecs.shape:
+            report["backends"][provider] = {
+                "error": f"shape mismatch {vecs.shape} vs {ref_vecs.shape}"
+            }
+            continue
+
+        # Both sides are L2-normalized, so row-wise dot product = cosine
+        cosines = np.sum(vecs * ref_vecs, axis=1)
+        norms = np.linalg.norm(vecs, axis=1)
+        perf = _throughput(backend, texts, batch_size, runs)
+
+        report["backends"][provider] = {
+            "dim": backend.dim,
+            "cosine_mean": round(float(cosines.mean()), 6),
+            "cosine_min": round(float(cosines.min()), 6),
+            "cosine_p01": round(float(np.percentile(cosines, 1)), 6),
+            "max_abs_diff": round(float(np.abs(vecs - ref_vecs).max()), 6),
+            "norm_max_error": round(float(np.abs(norms - 1.0).max()), 6),
+            **perf,
+            "speedup_batched": round(perf["texts_per_sec"] / ref_perf["texts_per_sec"], 2),
+            "speedup_single_p50": round(ref_perf["single_p50_ms"] / perf["single_p50_ms"], 2),
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against fp32")
+    parser.add_argument(
+        "--providers",
+        nargs="+",
+        default=[
+            p for p in BACKENDS if p not in (SentenceTransformerBackend.provider, StubBackend.provider)
+        ],
+        choices=list(BACKENDS),
+        help="Backends to compare against the sentence_transformers reference",
+    )
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--texts-file", help="One text per line (default: built-in samples)")
+    parser.add_argument("--repeat", type=int, default=8, help="Repeat the text set N times")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    texts = _load_texts(args.texts_file, args.repeat)
+    report = run(args.providers, texts, args.batch_size, args.runs, args.model)
+
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(out)
+
+    errors = [p for p, r in report["backends"].items() if "error" in r]
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Memory API Load Test
+
+Boots the memory app in this process against an in-process Qdrant and
+replays a synthetic multi-user workload, so /save and /search capacity can
+be measured offline and compared across commits:
+
+  1. seed: --users users, each with --seed-facts facts (via /save-batch)
+  2. each scenario sends --requests requests at --concurrency:
+       save   - /save with 1-3 new facts for a random user
+       search - /search for a random user (a 404 "no memories" is a result)
+       mixed  - --write-ratio saves, the rest searches
+  3. per scenario: QPS, p50 / p95 / p99 / max latency (ms), errors, and
+     process RSS (current and peak) after the run
+
+The request stream is generated up front from --seed, so two runs (two
+commits) replay exactly the same requests. Reports are JSON; pass an
+earlier report as --baseline to print QPS / p99 changes against it.
+
+Embedders:
+  - stub (default): hashed bag-of-words vectors, no model - measures the
+    service around the model (EMBEDDING_STUB_MS adds a fixed model cost)
+  - real: EMBEDDING_PROVIDER as configured (sentence_transformers / onnx...)
+
+Qdrant:
+  - :memory: (default) - in-process, nothing persisted
+  - path:<dir> - embedded local Qdrant persisted to <dir>
+  - host[:port] - a running server (use a throwaway INDEX_NAME)
+
+By default requests go straight to the ASGI app (no sockets). --http runs
+uvicorn on a loopback port instead, to include HTTP parsing. State files
+(journal, shard/migration state, blobs) go to a temp directory; other env
+vars (HOT_SET_ENABLED, SEARCH_CACHE_SIZE, ...) apply as usual.
+
+Usage (inside the memory container, from /app):
+    python -m scripts.loadtest
+    python -m scripts.loadtest --scenarios search --concurrency 32 --requests 5000
+    python -m scripts.loadtest --embedder real --output /models/loadtest.json
+    python -m scripts.loadtest --baseline /models/loadtest.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+FACT_TYPES = ["preference", "pet", "project", "location", "hobby", "food", "tool", "person"]
+WORDS = (
+    "coffee tea espresso golden retriever cat parrot kubernetes homelab postfix relay "
+    "portland seattle denver motorcycle guitar climbing ramen tacos sushi vim emacs "
+    "python rust terraform ansible grafana sarah max alex jordan morning evening "
+    "weekend garden sourdough chess marathon subaru camping photography jazz vinyl "
+    "backup nas router firewall dashboard invoice budget travel japan lisbon"
+).split()
+QUESTIONS = [
+    "what do I like to drink",
+    "what is my pet called",
+    "remind me about my project",
+    "where do I live",
+    "what did I say about",
+    "which tools do I use for",
+    "who is",
+]
+
+
+# ============================================================================
+# Environment
+# ============================================================================
+
+def _configure_env(args: argparse.Namespace, workdir: Path) -> None:
+    """Must run before main is imported (the model and clients load at import)."""
+    if args.embedder == "stub":
+        os.environ["EMBEDDING_PROVIDER"] = "stub"
+    if args.qdrant.startswith((":memory:", "path:")):
+        os.environ["QDRANT_HOST"] = args.qdrant
+    else:
+        host, _, port = args.qdrant.partition(":")
+        os.environ["QDRANT_HOST"] = host
+        if port:
+            os.environ["QDRANT_PORT"] = port
+    os.environ.setdefault("INDEX_NAME", "loadtest_memory_collection")
+    os.environ["SAVE_JOURNAL_PATH"] = str(workdir / "save_journal.sqlite3")
+    os.environ["SHARD_STATE"] = str(workdir / "shards.json")
+    os.environ["EMBEDDING_MIGRATION_STATE"] = str(workdir / "embedding_migration.json")
+    os.environ["BLOB_STORE_DIR"] = str(workdir / "blobs")
+    for name in ("MEMORY_SHARDS", "EMBEDDING_MIGRATION_TARGET", "EMBED_CACHE_DIR"):
+        os.environ.pop(name, None)
+
+
+def _rss_mb() -> Dict[str, float]:
+    """Current and peak resident set size of this process."""
+    out = {"rss_mb": 0.0, "peak_rss_mb": 0.0}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    out["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        # ru_maxrss is kB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out["peak_rss_mb"] = round(peak / (1024 if sys.platform != "darwin" else 2**20), 1)
+    return out
+
+
+def _commit() -> Optional[str]:
+    try:
+        git = {"cwd": APP_DIR, "capture_output": True, "text": True, "check": True}
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], **git).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], **git).stdout.strip()
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================================================================
+# Workload
+# ============================================================================
+
+def _fact(rng: random.Random) -> Dict[str, str]:
+    return {"type": rng.choice(FACT_TYPES), "value": " ".join(rng.sample(WORDS, 3))}
+
+
+def _save_request(rng: random.Random, users: List[str]) -> Tuple[str, Dict[str, Any]]:
+    facts = [_fact(rng) for _ in range(rng.randint(1, 3))]
+    text = "remember that " + ", ".join(f["value"] for f in facts)
+    return "/api/memory/save", {
+        "user_id": rng.choice(users),
+        "messages": [{"role": "user", "content": text}],
+        "facts": facts,
+    }
+
+
+def _search_request(rng: random.Random, users: List[str]) -> Tuple[str, Dict[str, Any]]:
+    query = f"{rng.choice(QUESTIONS)} {' '.join(rng.sample(WORDS, 2))}"
+    return "/api/memory/search", {"user_id": rng.choice(users), "query_text": query, "top_k": 5}
+
+
+def build_requests(
+    scenario: str, count: int, users: List[str], rng: random.Random, write_ratio: float
+) -> List[Tuple[str, Dict[str, Any]]]:
+    requests = []
+    for _ in range(count):
+        if scenario == "save" or (scenario == "mixed" and rng.random() < write_ratio):
+            requests.append(_save_request(rng, users))
+        else:
+            requests.append(_search_request(rng, users))
+    return requests
+
+
+async def seed(
+    client: httpx.AsyncClient, users: List[str], facts_per_user: int, rng: random.Random
+) -> None:
+    for user in users:
+        items = [{"fact": _fact(rng)} for _ in range(facts_per_user)]
+        r = await client.post("/api/memory/save-batch", json={"user_id": user, "items": items})
+        r.raise_for_status()
+
+
+async def replay(
+    client: httpx.AsyncClient, requests: List[Tuple[str, Dict[str, Any]]], concurrency: int
+) -> Dict[str, Any]:
+    """Send requests from `concurrency` closed-loop clients; returns latency / QPS stats."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    position = 0
+
+    async def client_loop() -> None:
+        nonlocal errors, position
+        while position < len(requests):
+            path, body = requests[position]
+            position += 1
+            start = time.perf_counter()
+            try:
+                r = await client.post(path, json=body)
+                status = r.status_code
+            except httpx.HTTPError:
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            # "No memories found" is a valid search answer, not a failure
+            if status not in (200, 404):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "qps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+# ============================================================================
+# App hosting
+# ============================================================================
+
+@contextlib.asynccontextmanager
+async def _app_client(args: argparse.Namespace):
+    """An httpx client talking to the app, in-process (ASGI) or over loopback (--http)."""
+    import main
+
+    timeout = httpx.Timeout(60.0)
+    if not args.http:
+        await main.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://loadtest", timeout=timeout
+            ) as client:
+                yield client
+        finally:
+            await main.shutdown_event()
+        return
+
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn exited during startup")
+        await asyncio.sleep(0.05)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=timeout, limits=limits
+        ) as client:
+            yield client
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+        sock.close()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    users = [f"loadtest-user-{i}" for i in range(args.users)]
+    results: Dict[str, Any] = {}
+
+    async with _app_client(args) as client:
+        from services.embedder import embedder_stats
+
+        # The service prints a line per request; keep that out of the timings
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            started = time.perf_counter()
+            await seed(client, users, args.seed_facts, rng)
+            seed_s = time.perf_counter() - started
+            warmup = build_requests("mixed", args.warmup, users, random.Random(args.seed + 1), 0.5)
+            await replay(client, warmup, args.concurrency)
+
+        _log(f"seeded {len(users)} users x {args.seed_facts} facts in {seed_s:.1f}s")
+        for i, scenario in enumerate(args.scenarios):
+            scenario_rng = random.Random(args.seed + 100 + i)
+            requests = build_requests(scenario, args.requests, users, scenario_rng, args.write_ratio)
+            with quiet:
+                stats = await replay(client, requests, args.concurrency)
+            stats.update(_rss_mb())
+            results[scenario] = stats
+            _log(
+                f"{scenario:6s} {stats['qps']:8.1f} qps  p50 {stats['p50_ms']:7.2f}  "
+                f"p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f} ms  "
+                f"errors {stats['errors']}  RSS {stats['rss_mb']} MB"
+            )
+        embedder = embedder_stats()
+
+    return {
+        "commit": _commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "embedder": args.embedder,
+            "provider": embedder.get("provider"),
+            "model": embedder.get("model"),
+            "qdrant": args.qdrant,
+            "transport": "http" if args.http else "asgi",
+            "users": args.users,
+            "seed_facts": args.seed_facts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "write_ratio": args.write_ratio,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "seed_seconds": round(seed_s, 3),
+        "scenarios": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print QPS and p99 change per scenario against an earlier report."""
+    _log(f"vs baseline {baseline.get('commit')} ({baseline.get('created_at')}):")
+    workload = (
+        "embedder", "qdrant", "transport", "users", "seed_facts",
+        "requests", "concurrency", "write_ratio", "seed",
+    )
+    changed = [k for k in workload if baseline.get("config", {}).get(k) != report["config"][k]]
+    if changed:
+        _log(f"  (warning: different {', '.join(changed)} - not the same workload)")
+    for name, stats in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        qps = (stats["qps"] / base["qps"] - 1) * 100 if base["qps"] else 0.0
+        p99 = (stats["p99_ms"] / base["p99_ms"] - 1) * 100 if base["p99_ms"] else 0.0
+        _log(f"  {name:6s} qps {qps:+6.1f}%  p99 {p99:+6.1f}%")
+
+
+def _log(message: str) -> None:
+    print(f"[loadtest] {message}", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline /save and /search load test for the memory API")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=["save", "search", "mixed"], default=["save", "search", "mixed"]
+    )
+    parser.add_argument("--embedder", choices=["stub", "real"], default="stub")
+    parser.add_argument("--qdrant", default=":memory:", help=":memory:, path:<dir> or host[:port]")
+    parser.add_argument(
+        "--http", action="store_true", help="Serve over loopback with uvicorn instead of ASGI in-process"
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed-facts", type=int, default=50, help="Facts per user stored before measuring")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests before the first scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of saves in the mixed scenario")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Earlier report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the service's per-request log lines")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="memory-loadtest-") as workdir:
+        _configure_env(args, Path(workdir))
+        sys.path.insert(0, str(APP_DIR))
+        # httpx logs every request at INFO; those lines would skew the timings
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        report = asyncio.run(run(args))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+        _log(f"Wrote {args.output}")
+    else:
+        print(text)
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Memory Snapshot Export / Import
+
+Back up or move memory points between hosts without copying Qdrant's
+storage directory (format: services/snapshot.py).
+
+  export  Stream the collection (or one user with --user) into a snapshot
+          directory: float16 vector files plus NDJSON or Parquet payloads.
+  import  Upsert a snapshot into the live collection, parts in parallel.
+          Re-running after an interruption skips finished parts;
+          --restart ignores earlier progress.
+
+Both act on the collections the service uses (services/service_state.py):
+every shard of a sharded service, each point imported to the shard that
+owns its user, or a switched embedding migration's collection. Import
+refuses to run while a migration is still backfilling - points written
+behind its cursor would never reach the new collection.
+
+Usage (inside the memory container):
+    python -m scripts.snapshot export /backups/memory-2026-10-16
+    python -m scripts.snapshot export /backups/alice --user alice --format parquet
+    python -m scripts.snapshot import /backups/memory-2026-10-16 --workers 8
+"""
+
+import argparse
+import json
+import sys
+
+from services import snapshot
+from services.service_state import load_routing, migration_in_progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory snapshot export / import")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    e = sub.add_parser("export", help="Write points to a snapshot directory")
+    e.add_argument("directory")
+    e.add_argument("--user", help="Only this user's points (default: whole collection)")
+    e.add_argument("--format", default="ndjson", choices=snapshot.PAYLOAD_FORMATS,
+                   help="Payload format (parquet needs pyarrow)")
+    e.add_argument("--part-size", type=int, default=snapshot.DEFAULT_PART_SIZE)
+    e.add_argument("--batch-size", type=int, default=snapshot.DEFAULT_BATCH_SIZE)
+
+    i = sub.add_parser("import", help="Load a snapshot directory into the collection")
+    i.add_argument("directory")
+    i.add_argument("--workers", type=int, default=4)
+    i.add_argument("--batch-size", type=int, default=snapshot.DEFAULT_BATCH_SIZE)
+    i.add_argument("--restart", action="store_true", help="Ignore progress from earlier runs")
+
+    args = parser.parse_args()
+    if args.command == "import" and migration_in_progress():
+        print("[snapshot] ✗ An embedding migration is in progress; import after it switches",
+              file=sys.stderr)
+        sys.exit(1)
+    routing = load_routing()
+    if routing:
+        print(f"[snapshot] Routing as the service: {routing}", file=sys.stderr)
+    try:
+        if args.command == "export":
+            result = snapshot.export_snapshot(
+                args.directory,
+                user_id=args.user,
+                payload_format=args.format,
+                part_size=args.part_size,
+                batch_size=args.batch_size,
+            )
+            result = {k: v for k, v in result.items() if k != "parts"}
+        else:
+            result = snapshot.import_snapshot(
+                args.directory,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                resume=not args.restart,
+            )
+    except snapshot.SnapshotError as err:
+        print(f"[snapshot] ✗ {err}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Storage Profile Migration & Report
+
+Two commands for the memory collection's vector storage profile
+(fp32 / float16 / int8 / binary, optionally with on-disk originals - see
+services/storage_profiles.py):
+
+  migrate  Rebuild the live collection into a new collection with the chosen
+           profile, copying every point (vectors + payloads) via scroll,
+           then re-copying points saved while the copy ran (by saved_at)
+           until a pass finds nothing new.
+           With --swap the service name (INDEX_NAME) becomes an alias for the
+           new collection. If INDEX_NAME is already an alias the swap is
+           atomic, the old collection is kept, and a last catch-up pass picks
+           up writes that landed on it just before the switch. If it is a
+           real collection the old one must be deleted first, which needs
+           --yes and --offline: memory_api has to be stopped, otherwise a
+           request in the gap re-creates an empty collection under the name.
+
+  report   Sample points from the live collection, load them into a
+           temporary collection per profile and compare estimated RAM use,
+           p50/p99 filtered-search latency and recall@k against exact fp32
+           search on the same data. Temporary collections are dropped after.
+
+The live collection is the one the service uses: after a switched
+embedding migration that is the migrated collection. A sharded service
+has one per shard, so pick it with --shard.
+
+Usage (inside the memory container):
+    python -m scripts.storage_profiles report --sample 5000 --queries 200
+    python -m scripts.storage_profiles migrate --profile int8 --on-disk
+    python -m scripts.storage_profiles migrate --profile int8 --swap
+    python -m scripts.storage_profiles migrate --profile int8 --swap --yes --offline
+    python -m scripts.storage_profiles migrate --profile int8 --shard s1
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client.http import models
+
+from services import storage_profiles
+from services.qdrant_client import (
+    _client,
+    _collection_name,
+    _create_collection,
+    get_router,
+    invalidate_collection,
+    iter_points,
+    use_shard,
+    user_filter,
+)
+from services.service_state import load_routing
+
+
+def _resolve_alias(client, name: str) -> str | None:
+    """Collection that `name` points to if it is an alias, else None."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return None
+
+
+def _vector_size(client, collection_name: str) -> int:
+    """Vector size of a collection (it changes with the embedding model)."""
+    return client.get_collection(collection_name=collection_name).config.params.vectors.size
+
+
+def _wait_green(client, collection_name: str, timeout: float = 600) -> None:
+    """Block until Qdrant has finished optimizing/indexing the collection."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get_collection(collection_name=collection_name).status
+        if status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"[storage] ⚠ {collection_name} still optimizing after {timeout}s", file=sys.stderr)
+
+
+# ============================================================================
+# migrate
+# ============================================================================
+
+# Slack on saved_at for clock skew between workers (as the embedding migration)
+CATCH_UP_SLACK_S = 60
+MAX_CATCH_UP_PASSES = 10
+
+
+def _copy(
+    client,
+    source: str,
+    target: str,
+    batch_size: int,
+    since: Optional[float] = None,
+    progress: bool = False,
+) -> int:
+    """
+    Copy points from source to target. With `since`, only points saved after
+    it whose copy in target is missing or older. Returns points written.
+    """
+    scroll_filter = None
+    if since is not None:
+        scroll_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="saved_at", range=models.Range(gte=since - CATCH_UP_SLACK_S)
+                )
+            ]
+        )
+    copied = 0
+    started = time.perf_counter()
+    for records in iter_points(source, batch_size=batch_size, scroll_filter=scroll_filter, client=client):
+        if since is not None:
+            copies = {
+                r.id: float((r.payload or {}).get("saved_at", 0))
+                for r in client.retrieve(
+                    collection_name=target,
+                    ids=[r.id for r in records],
+                    with_payload=["saved_at"],
+                    with_vectors=False,
+                )
+            }
+            records = [
+                r for r in records
+                if copies.get(r.id, -1.0) < float((r.payload or {}).get("saved_at", 0))
+            ]
+            if not records:
+                continue
+        client.upsert(
+            collection_name=target,
+            points=[
+                models.PointStruct(id=r.id, vector=r.vector, payload=r.payload)
+                for r in records
+            ],
+            wait=True,
+        )
+        copied += len(records)
+        if progress:
+            rate = copied / max(time.perf_counter() - started, 1e-6)
+            print(f"[storage] copied {copied} points ({rate:.0f}/s)", end="\r")
+    if progress:
+        print()
+    return copied
+
+
+def _catch_up(client, source: str, target: str, since: float, batch_size: int) -> float:
+    """
+    Re-copy points saved since `since` until a pass copies nothing (the
+    service keeps writing to source meanwhile). Returns the start time of
+    the last pass, for a final pass after the swap.
+    """
+    for _ in range(MAX_CATCH_UP_PASSES):
+        pass_started = time.time()
+        recopied = _copy(client, source, target, batch_size, since=since)
+        print(f"[storage] catch-up: {recopied} points saved during the copy")
+        since = pass_started
+        if not recopied:
+            break
+    return since
+
+
+def migrate(args) -> int:
+    client = _client()
+    name = _collection_name()
+    alias_target = _resolve_alias(client, name)
+    source = alias_target or name
+    suffix = args.profile + ("_disk" if args.on_disk else "")
+    target = args.target or f"{name}__{suffix}"
+
+    if target == source:
+        print(f"[storage] Source and target are both '{source}'", file=sys.stderr)
+        return 1
+
+    if args.swap and not alias_target and not (args.yes and args.offline):
+        print(
+            f"[storage] '{name}' is a real collection; swapping deletes it, and a request "
+            "in between would re-create it empty. Stop memory_api and re-run with "
+            "--swap --yes --offline (or migrate without --swap and set INDEX_NAME).",
+            file=sys.stderr,
+        )
+        return 1
+
+    print(f"[storage] Migrating '{source}' -> '{target}' (profile={args.profile}, on_disk={args.on_disk})")
+    if not client.collection_exists(target):
+        _create_collection(
+            client, target, profile=args.profile, on_disk=args.on_disk,
+            size=_vector_size(client, source),
+        )
+
+    copy_started = time.time()
+    _copy(client, source, target, args.batch_size, progress=True)
+    last_pass = _catch_up(client, source, target, copy_started, args.batch_size)
+
+    source_count = client.count(collection_name=source, exact=True).count
+    target_count = client.count(collection_name=target, exact=True).count
+    print(f"[storage] source={source_count} target={target_count}")
+    if target_count < source_count:
+        print("[storage] ✗ Target has fewer points than source - not swapping", file=sys.stderr)
+        return 1
+
+    if not args.swap:
+        print(f"[storage] ✓ Copied. Re-run with --swap, or set INDEX_NAME={target}")
+        return 0
+
+    if alias_target:
+        # Atomic: re-point the alias, old collection stays for rollback
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=name)),
+                models.CreateAliasOperation(
+                    create_alias=models.CreateAlias(collection_name=target, alias_name=name)
+                ),
+            ]
+        )
+        print(f"[storage] ✓ Alias '{name}' now points to '{target}' (old: '{source}')")
+        # Writes that reached the old collection before the alias moved
+        _copy(client, source, target, args.batch_size, since=last_pass)
+    else:
+        # --offline: nothing else writes, so the delete/alias gap is safe
+        client.delete_collection(collection_name=name)
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                models.CreateAliasOperation(
+                    create_alias=models.CreateAlias(collection_name=target, alias_name=name)
+                )
+            ]
+        )
+        print(f"[storage] ✓ Replaced '{name}' with alias -> '{target}'")
+
+    invalidate_collection(name)
+    print("[storage] Restart memory_api so it picks up the new search params")
+    return 0
+
+
+# ============================================================================
+# report
+# ============================================================================
+
+
+def _sample(client, collection_name: str, size: int) -> List[models.Record]:
+    points: List[models.Record] = []
+    for records in iter_points(collection_name, batch_size=512, client=client):
+        points.extend(r for r in records if r.vector is not None)
+        if len(points) >= size:
+            break
+    return points[:size]
+
+
+def _run_queries(client, collection_name, queries, k, params) -> tuple[list, list]:
+    """Returns (result id lists, latencies in ms)."""
+    results, latencies = [], []
+    for point in queries:
+        t0 = time.perf_counter()
+        hits = client.query_points(
+            collection_name=collection_name,
+            query=point.vector,
+            query_filter=user_filter(point.payload.get("user_id", "")),
+            search_params=params,
+            limit=k + 1,
+            with_payload=False,
+        ).points
+        latencies.append((time.perf_counter() - t0) * 1000)
+        # Drop the query point itself - it trivially matches
+        results.append([h.id for h in hits if h.id != point.id][:k])
+    return results, latencies
+
+
+def report(args) -> int:
+    client = _client()
+    source = _collection_name()
+    sample = _sample(client, source, args.sample)
+    if not sample:
+        print(f"[storage] '{source}' has no points to sample", file=sys.stderr)
+        return 1
+
+    dim = len(sample[0].vector)
+    rng = random.Random(args.seed)
+    queries = rng.sample(sample, min(args.queries, len(sample)))
+    out: Dict[str, Any] = {
+        "source": source,
+        "points": len(sample),
+        "queries": len(queries),
+        "k": args.k,
+        "on_disk": args.on_disk,
+        "profiles": {},
+    }
+
+    truth = None
+    profiles = ["fp32"] + [p for p in args.profiles if p != "fp32"]
+    for profile in profiles:
+        temp = f"__profile_bench_{profile}"
+        if client.collection_exists(temp):
+            client.delete_collection(temp)
+        _create_collection(client, temp, profile=profile, on_disk=args.on_disk, size=dim)
+        try:
+            for i in range(0, len(sample), 512):
+                client.upsert(
+                    collection_name=temp,
+                    points=[
+                        models.PointStruct(id=r.id, vector=r.vector, payload=r.payload)
+                        for r in sample[i : i + 512]
+                    ],
+                    wait=True,
+                )
+            _wait_green(client, temp)
+
+            if truth is None:
+                truth, _ = _run_queries(
+                    client, temp, queries, args.k, models.SearchParams(exact=True)
+                )
+
+            results, latencies = _run_queries(
+                client, temp, queries, args.k, storage_profiles.search_params(profile)
+            )
+            recalls = [
+                len(set(got) & set(want)) / len(want)
+                for got, want in zip(results, truth)
+                if want
+            ]
+            footprint = storage_profiles.estimated_bytes_per_vector(profile, dim, args.on_disk)
+            out["profiles"][profile] = {
+                "est_vector_ram_mb": round(footprint["ram"] * len(sample) / 2**20, 2),
+                "est_vector_disk_mb": round(footprint["disk"] * len(sample) / 2**20, 2),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                f"recall@{args.k}": round(float(np.mean(recalls)), 4) if recalls else None,
+            }
+        finally:
+            if not args.keep:
+                client.delete_collection(temp)
+
+    base_ram = out["profiles"]["fp32"]["est_vector_ram_mb"] or 1e-9
+    for row in out["profiles"].values():
+        row["ram_vs_fp32"] = round(row["est_vector_ram_mb"] / base_ram, 3)
+
+    text = json.dumps(out, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory collection storage profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    m = sub.add_parser("migrate", help="Rebuild the collection into a storage profile")
+    m.add_argument("--profile", required=True, choices=storage_profiles.PROFILES)
+    m.add_argument("--on-disk", action="store_true", help="Keep original vectors on disk")
+    m.add_argument("--target", help="Target collection name (default: <INDEX_NAME>__<profile>)")
+    m.add_argument("--batch-size", type=int, default=512)
+    m.add_argument("--swap", action="store_true", help="Point INDEX_NAME at the new collection")
+    m.add_argument("--yes", action="store_true", help="Allow deleting a non-alias source on swap")
+    m.add_argument("--offline", action="store_true",
+                   help="Confirm memory_api is stopped (needed to swap a non-alias source)")
+    m.add_argument("--shard", help="Shard whose collection to migrate (sharded services)")
+
+    r = sub.add_parser("report", help="Compare RAM, latency and recall per profile")
+    r.add_argument("--profiles", nargs="+", default=list(storage_profiles.PROFILES),
+                   choices=storage_profiles.PROFILES)
+    r.add_argument("--on-disk", action="store_true")
+    r.add_argument("--sample", type=int, default=5000, help="Points to sample from the live collection")
+    r.add_argument("--queries", type=int, default=200)
+    r.add_argument("--k", type=int, default=5)
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--keep", action="store_true", help="Keep the temporary collections")
+    r.add_argument("--output", help="Also write the JSON report here")
+    r.add_argument("--shard", help="Shard whose collection to sample (sharded services)")
+
+    args = parser.parse_args()
+    load_routing()
+    router = get_router()
+    shard = None
+    if router is not None:
+        if args.shard not in router.shards:
+            print(f"[storage] Sharded service: pass --shard ({', '.join(router.shards)})", file=sys.stderr)
+            sys.exit(1)
+        shard = router.shards[args.shard]
+    elif args.shard:
+        print("[storage] --shard given but the service isn't sharded", file=sys.stderr)
+        sys.exit(1)
+    with use_shard(shard):
+        sys.exit(migrate(args) if args.command == "migrate" else report(args))
+
+
+if __name__ == "__main__":
+    main()
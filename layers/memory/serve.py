@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Pre-fork Multi-Worker Server
+
+Runs the memory API in N worker processes that share one copy of the
+embedding model. `uvicorn --workers N` would import the app (and load the
+model) once per worker; here the master imports it once, then forks, so the
+weights live in copy-on-write pages every worker maps:
+
+  - The model is loaded but never run in the master. The first forward pass
+    allocates per-thread scratch and starts the OpenMP pool, neither of which
+    survives a fork, so warmup happens in each worker after fork.
+  - An embedding migration's models are loaded in the master too (a
+    switched-to model replaces the startup one; an unfinished migration's
+    target is loaded alongside), so workers only pick the collection.
+  - gc.freeze() moves everything imported so far into a permanent
+    generation, so the collector never writes refcount/GC headers into those
+    pages and un-shares them.
+  - Nothing in the master touches CUDA (a CUDA context can't be forked); if
+    torch reports one anyway, I refuse to fork. The summarizer model is
+    loaded lazily in each worker.
+  - Each worker gets cpu_count / N intra-op threads (OMP_NUM_THREADS and
+    torch.set_num_threads) so N workers don't oversubscribe the cores.
+
+Workers share the listening socket (the kernel spreads connections) and,
+through api/memory.py, per-user version tables in shared memory, so a save
+on one worker invalidates cached searches on all of them. They also write
+metric snapshots to METRICS_DIR, so /metrics answers with the sum over all
+workers whichever one accepts the scrape. Worker 0 is the
+leader: it drains the save journal, runs compaction and the embedding
+migration backfill, and is the only writer of the disk embedding cache.
+
+The master restarts a worker that dies (same index) and forwards
+SIGTERM / SIGINT for a graceful shutdown.
+
+Usage (inside the memory container):
+    python serve.py --workers 4
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+Env vars:
+  - MEMORY_WORKERS (default: 1) - used when --workers isn't given
+  - MEMORY_WORKER_INDEX - set by this script in each worker (0 = leader)
+  - METRICS_DIR (default: a fresh temp dir when workers > 1) - metric snapshots;
+    emptied at startup
+"""
+
+import argparse
+import gc
+import glob
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the memory API in pre-forked workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MEMORY_WORKERS", "1")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+def _threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _cuda_initialized() -> bool:
+    torch = sys.modules.get("torch")
+    return bool(torch is not None and torch.cuda.is_initialized())
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _prepare_metrics_dir(workers: int) -> str | None:
+    """
+    Directory the workers share /metrics snapshots through. Leftovers from
+    the previous run are removed: their counts belong to other processes.
+    """
+    directory = os.getenv("METRICS_DIR")
+    if workers == 1 and not directory:
+        return None
+    if not directory:
+        directory = tempfile.mkdtemp(prefix="memory-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "worker-*.json*")):
+        os.remove(path)
+    os.environ["METRICS_DIR"] = directory
+    return directory
+
+
+def _run_worker(app, sock: socket.socket, index: int, args: argparse.Namespace) -> None:
+    """Child process: serve on the inherited socket until told to stop."""
+    import uvicorn
+
+    os.environ["MEMORY_WORKER_INDEX"] = str(index)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(_threads_per_worker(args.workers))
+
+    config = uvicorn.Config(app, log_level=args.log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> int:
+    args = _parse_args()
+    workers = max(1, args.workers)
+
+    # Must be set before the app (torch, the shared version tables) is imported
+    os.environ["MEMORY_WORKERS"] = str(workers)
+    os.environ.setdefault("OMP_NUM_THREADS", str(_threads_per_worker(workers)))
+
+    from main import app  # loads the embedding model once, in the master
+    from api import memory
+
+    # A migration's models too: loading them in each worker would give
+    # every worker a private copy
+    memory.preload_models()
+
+    if workers > 1 and _cuda_initialized():
+        print("[serve] ✗ CUDA was initialized before fork - run a single worker instead")
+        return 1
+
+    user_metrics_dir = os.getenv("METRICS_DIR")
+    metrics_dir = _prepare_metrics_dir(workers)  # read by each worker at startup
+    sock = _bind(args.host, args.port)
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}  # pid -> worker index
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, index, args)
+            finally:
+                os._exit(0)
+        children[pid] = index
+        print(f"[serve] Worker {index} started (pid={pid})")
+
+    def shutdown(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"[serve] Listening on {args.host}:{args.port} with {workers} workers "
+          f"({_threads_per_worker(workers)} threads each)")
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        print(f"[serve] ✗ Worker {index} (pid={pid}) exited with status {status}, restarting")
+        time.sleep(1.0)  # don't spin if it dies at startup
+        spawn(index)
+
+    sock.close()
+    if metrics_dir and not user_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    print("[serve] All workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
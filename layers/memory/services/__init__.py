@@ -5,7 +5,24 @@ Core services for the memory API.
 
 Modules:
     embedder: Text embedding using SentenceTransformers (768-dim vectors).
+    embedding_backends: PyTorch / ONNX / int8 ONNX inference backends.
+    embed_scheduler: Cross-request micro-batching for embedding calls.
+    embedding_cache: Content-addressed LRU + mmap disk cache for embeddings.
     qdrant_client: Singleton Qdrant client and collection management.
+    sharding: Consistent-hash user -> shard routing and online rebalancing.
+    circuit_breaker: Closed/open/half-open breaker and retry helpers.
+    storage_profiles: fp32 / float16 / int8 / binary vector storage options.
+    hot_set: In-process per-user vector matrices for brute-force top-k.
+    result_cache: Per-user versioned search-result cache with single-flight.
+    shared_versions: Per-user write counters shared across forked workers.
+    save_journal: Durable SQLite write-behind queue for async saves.
     fact_extractor: Utility functions for formatting pre-extracted facts.
-    summarizer: Multi-backend text summarization.
+    fact_dedup: Write-time semantic near-duplicate suppression for facts.
+    compaction: Background merge of near-duplicates plus age / cap retention.
+    blob_store: SHA-256 content-addressed files for image / binary message parts.
+    snapshot: Streaming export / import of points (float16 + NDJSON/Parquet).
+    embedding_migration: Dual-write + backfill + switch to a new embedding model.
+    metrics: Latency / size histograms and gauges for GET /metrics (Prometheus text).
+    summarizer: Multi-backend text summarization (single and batched).
+    digest: Background worker keeping a precomputed summary per user.
 """
\ No newline at end of file
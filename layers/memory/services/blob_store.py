@@ -0,0 +1,122 @@
+"""
+Blob Store
+
+Content-addressed storage for the binary parts of saved messages (pasted
+screenshots, images, files). Each blob is written once, named by the
+SHA-256 of its bytes, under the models volume:
+
+    <root>/ab/cd/abcd...ef    (sharded by the first two hex byte pairs)
+
+so the same screenshot pasted in ten turns is one file, and the Qdrant
+payload only carries a small reference ({"sha256", "media_type", "bytes"})
+instead of a multi-megabyte data URL.
+
+Writes go to a temp file in the same directory and are renamed into
+place, so a reader (or another worker) never sees a half-written blob and
+two workers writing the same content just race to the same final file.
+
+Size accounting works on the base64 text: decoded length is
+3/4 of the base64 length minus padding, so an over-limit upload is
+rejected before anything is decoded.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+REF_PREFIX = "sha256:"
+
+
+def base64_size(data: str) -> int:
+    """Decoded byte length of a base64 string, without decoding it."""
+    data = data.strip()
+    n = len(data)
+    if n == 0:
+        return 0
+    padding = 2 if data.endswith("==") else 1 if data.endswith("=") else 0
+    return n * 3 // 4 - padding
+
+
+def parse_data_url(url: str) -> Optional[Tuple[str, str]]:
+    """(media_type, base64 payload) of a base64 data URL, or None if it isn't one."""
+    if not url.startswith("data:"):
+        return None
+    header, sep, data = url.partition(",")
+    if not sep or not header.endswith(";base64"):
+        return None
+    media_type = header[len("data:") : -len(";base64")].split(";")[0]
+    return media_type or "application/octet-stream", data
+
+
+def decode_base64(data: str) -> bytes:
+    """Decode a base64 payload, raising ValueError if it isn't base64."""
+    try:
+        return base64.b64decode(data, validate=False)
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError(f"invalid base64 payload: {exc}") from exc
+
+
+class BlobStore:
+    """SHA-256 addressed files on local disk. Safe to share between workers."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.dedup_hits = 0
+        self.bytes_written = 0
+
+    def path(self, digest: str) -> Path:
+        digest = digest.removeprefix(REF_PREFIX).lower()
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            raise ValueError(f"not a sha256 digest: {digest!r}")
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def put(self, data: bytes) -> str:
+        """Store data (once) and return its hex SHA-256."""
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if target.is_file():
+            with self._lock:
+                self.dedup_hits += 1
+            return digest
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+        with self._lock:
+            self.writes += 1
+            self.bytes_written += len(data)
+        return digest
+
+    def put_base64(self, data: str) -> Tuple[str, int]:
+        """Decode and store a base64 payload. Returns (hex SHA-256, byte size)."""
+        raw = decode_base64(data)
+        return self.put(raw), len(raw)
+
+    def get(self, digest: str) -> Optional[bytes]:
+        try:
+            return self.path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "writes": self.writes,
+                "dedup_hits": self.dedup_hits,
+                "bytes_written": self.bytes_written,
+            }
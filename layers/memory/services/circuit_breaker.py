@@ -0,0 +1,199 @@
+"""
+Circuit Breaker
+
+Guards calls to a dependency (Qdrant) so an outage costs one fast error
+per request instead of every request sleeping through its own retries.
+
+States:
+  - closed: calls go through; consecutive transient failures are counted
+  - open: calls fail immediately with CircuitOpenError until reset_timeout
+    has passed
+  - half_open: a limited number of trial calls go through; one success
+    closes the breaker, one failure re-opens it
+
+Only failures the caller classifies as transient (connection refused,
+timeouts, 5xx) count. A bad request or a missing collection is the
+caller's problem, not the dependency's, and leaves the breaker alone.
+
+call_with_retry() retries transient failures with short jittered backoff
+and stops as soon as the breaker opens. call_with_retry_async() does the
+same for async callers: the call runs in a worker thread and the backoff
+is an asyncio.sleep, so no thread is parked while waiting.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the dependency while the breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} unavailable (circuit open, retry in {retry_after:.1f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker counting consecutive failures."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.trips = 0
+        self.last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> None:
+        """Reserve a call, or raise CircuitOpenError if the breaker is open."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self._retry_after())
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"[breaker] {self.name} recovered, closing circuit")
+            self._state = CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    def record_failure(self, error: BaseException | None = None) -> None:
+        with self._lock:
+            if error is not None:
+                self.last_error = f"{type(error).__name__}: {error}"
+            state = self._current_state()
+            self._failures += 1
+            if state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != OPEN:
+                    self.trips += 1
+                    print(
+                        f"[breaker] {self.name} circuit open after {self._failures} failures "
+                        f"({self.last_error})"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trials = 0
+
+    def call(self, func: Callable[[], T], is_transient: Callable[[BaseException], bool]) -> T:
+        """Run func() once through the breaker."""
+        self.allow()
+        try:
+            result = func()
+        except Exception as e:
+            if is_transient(e):
+                self.record_failure(e)
+            else:
+                # The dependency answered - it's up, even if the call was bad
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_after_s": round(self._retry_after(), 2) if state == OPEN else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    # Caller holds the lock
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    def _retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+def _backoff(attempt: int, base_delay: float) -> float:
+    """Full-jitter exponential backoff so concurrent callers don't retry in lockstep."""
+    return random.uniform(0, base_delay * (2 ** attempt))
+
+
+def call_with_retry(
+    func: Callable[[], T],
+    breaker: CircuitBreaker,
+    is_transient: Callable[[BaseException], bool],
+    attempts: int = 2,
+    base_delay: float = 0.1,
+) -> T:
+    """Call func() through the breaker, retrying transient failures while it stays closed."""
+    for attempt in range(attempts):
+        try:
+            return breaker.call(func, is_transient)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if not is_transient(e) or attempt == attempts - 1 or breaker.state == OPEN:
+                raise
+        time.sleep(_backoff(attempt, base_delay))
+    raise AssertionError("unreachable")
+
+
+async def call_with_retry_async(
+    func: Callable[[], T],
+    breaker: CircuitBreaker,
+    is_transient: Callable[[BaseException], bool],
+    attempts: int = 3,
+    base_delay: float = 0.2,
+) -> T:
+    """Async call_with_retry: func runs in a thread, backoff doesn't hold one."""
+    for attempt in range(attempts):
+        try:
+            return await asyncio.to_thread(breaker.call, func, is_transient)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if not is_transient(e) or attempt == attempts - 1 or breaker.state == OPEN:
+                raise
+        await asyncio.sleep(_backoff(attempt, base_delay))
+    raise AssertionError("unreachable")
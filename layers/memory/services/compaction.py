@@ -0,0 +1,368 @@
+"""
+Compaction & Retention
+
+Reclaims points from the memory collection, one user at a time:
+  - merge (off unless a threshold is set): near-duplicate facts
+    (cosine >= threshold) are clustered in NumPy; the newest point of each
+    cluster is kept and the others are folded into its payload `variants`
+    (same merge as write-time dedup) and deleted
+  - age: points whose `saved_at` is older than max_age_days are deleted
+  - cap: if a user still has more than max_points, their oldest points
+    are deleted
+
+Write-time dedup (services/fact_dedup) stops new paraphrases; this job
+cleans up what was stored before it existed, or below its threshold drift.
+
+Points written before `saved_at` was recorded have no age: age retention
+never removes them, and the cap removes them first.
+
+Each user is streamed with the scroll API, planned in memory and applied
+with one batch_update_points request (payload overwrites + one delete).
+The job is rate-limited to `rate` points scanned per second so it never
+competes with live search for Qdrant, and skips the rest of a shard's
+users once that shard's circuit breaker opens. plan_user() is pure -
+easy to test and dry-run.
+
+When sharded, users are listed from every shard and each one is compacted
+on the shard that owns it. A run is skipped while a shard rebalance is
+moving users (their points are split across two shards).
+
+Env vars (read by api/memory.py for the in-app schedule, and by
+scripts/compact.py as defaults):
+  - COMPACTION_INTERVAL (default: 0 = off) - seconds between in-app runs
+  - COMPACTION_MERGE_THRESHOLD (default: 0 = no merging) - cosine
+    similarity to merge at. Like SAVE_DEDUP_THRESHOLD it depends on the
+    model: check that distinct values of one fact type stay below it
+    (0.92 suits all-mpnet-base-v2) before turning it on
+  - COMPACTION_MAX_POINTS (default: 0 = no cap) - per-user point cap
+  - COMPACTION_MAX_AGE_DAYS (default: 0 = keep forever)
+  - COMPACTION_RATE (default: 500) - points scanned per second
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+from qdrant_client.http import models
+
+from services.fact_dedup import merge_payload
+from services.qdrant_client import (
+    _breaker,
+    _collection_name,
+    get_router,
+    iter_points,
+    shards,
+    user_filter,
+    user_shard,
+    with_collection,
+    use_shard,
+)
+
+
+@dataclass
+class CompactionSettings:
+    threshold: float = 0.0
+    max_points: int = 0
+    max_age_days: float = 0.0
+    rate: float = 500.0
+    dry_run: bool = False
+
+    @classmethod
+    def from_env(cls) -> "CompactionSettings":
+        return cls(
+            threshold=float(os.getenv("COMPACTION_MERGE_THRESHOLD", "0")),
+            max_points=int(os.getenv("COMPACTION_MAX_POINTS", "0")),
+            max_age_days=float(os.getenv("COMPACTION_MAX_AGE_DAYS", "0")),
+            rate=float(os.getenv("COMPACTION_RATE", "500")),
+        )
+
+
+@dataclass
+class UserPlan:
+    """What compaction will do to one user's points."""
+
+    overwrite: Dict[Any, Dict[str, Any]] = field(default_factory=dict)  # id -> merged payload
+    merged: List[Any] = field(default_factory=list)  # folded into a kept point
+    expired: List[Any] = field(default_factory=list)  # past max age
+    capped: List[Any] = field(default_factory=list)  # over the per-user cap
+
+    @property
+    def delete(self) -> List[Any]:
+        return self.merged + self.expired + self.capped
+
+
+def cluster(vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """
+    Greedy leader clustering: walk rows in order; each unassigned row
+    becomes a leader and claims every unassigned row with cosine similarity
+    >= threshold. Rows should be ordered by preference (newest first) so
+    the leader is the point worth keeping. O(n * clusters) dot products.
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+
+    assigned = np.zeros(n, dtype=bool)
+    clusters: List[List[int]] = []
+    for i in range(n):
+        if assigned[i]:
+            continue
+        sims = matrix @ matrix[i]
+        members = np.flatnonzero((sims >= threshold) & ~assigned)
+        assigned[members] = True
+        clusters.append([i] + [int(j) for j in members if j != i])
+    return clusters
+
+
+def _saved_at(payload: Dict[str, Any]) -> float:
+    value = payload.get("saved_at")
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+def plan_user(
+    ids: List[Any],
+    vectors: List[List[float]],
+    payloads: List[Dict[str, Any]],
+    settings: CompactionSettings,
+    now: Optional[float] = None,
+) -> UserPlan:
+    """Decide which of one user's points to merge, expire and cap."""
+    now = time.time() if now is None else now
+    plan = UserPlan()
+    alive: Set[int] = set(range(len(ids)))
+
+    # Age retention first - no point merging what is about to expire
+    if settings.max_age_days > 0:
+        cutoff = now - settings.max_age_days * 86400
+        for i in list(alive):
+            saved = _saved_at(payloads[i])
+            if saved and saved < cutoff:
+                plan.expired.append(ids[i])
+                alive.discard(i)
+
+    # Merge near-duplicate facts (chunks are left alone)
+    facts = sorted(
+        (i for i in alive if payloads[i].get("facts")),
+        key=lambda i: _saved_at(payloads[i]),
+        reverse=True,
+    )
+    if settings.threshold > 0 and len(facts) > 1:
+        for members in cluster(np.asarray([vectors[i] for i in facts]), settings.threshold):
+            if len(members) < 2:
+                continue
+            keep, *rest = [facts[m] for m in members]
+            payload: Dict[str, Any] = {}
+            for i in reversed(rest):  # oldest first, so the kept phrasing lands last
+                payload = merge_payload(payload, payloads[i]) if payload else dict(payloads[i])
+            plan.overwrite[ids[keep]] = merge_payload(payload, payloads[keep])
+            for i in rest:
+                plan.merged.append(ids[i])
+                alive.discard(i)
+
+    # Per-user cap: drop the oldest survivors
+    if settings.max_points > 0 and len(alive) > settings.max_points:
+        oldest = sorted(alive, key=lambda i: _saved_at(payloads[i]))
+        for i in oldest[: len(alive) - settings.max_points]:
+            plan.capped.append(ids[i])
+            plan.overwrite.pop(ids[i], None)
+            alive.discard(i)
+
+    return plan
+
+
+class Compactor:
+    """Runs compaction over every user in the collection, rate-limited."""
+
+    def __init__(
+        self,
+        settings: CompactionSettings,
+        on_user_changed: Optional[Callable[[str], None]] = None,
+    ):
+        self.settings = settings
+        self._on_user_changed = on_user_changed
+        self._budget_started = time.monotonic()
+        self._budget_used = 0.0
+
+    def run(self, user_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Compact the given users (default: everyone). Returns a report."""
+        started = time.perf_counter()
+        report: Dict[str, Any] = {
+            "dry_run": self.settings.dry_run,
+            "users": 0,
+            "users_changed": 0,
+            "scanned": 0,
+            "merged": 0,
+            "expired": 0,
+            "capped": 0,
+            "reclaimed": 0,
+            "stopped_early": False,
+        }
+
+        router = get_router()
+        if router is not None and router.rebalancing:
+            print("[compaction] Shard rebalance in progress, skipping this run")
+            report["stopped_early"] = True
+            report["duration_s"] = 0.0
+            return report
+
+        down: Set[str] = set()  # breakers found not closed this run
+        for user_id in user_ids if user_ids is not None else self.list_users():
+            # The breaker of the shard that owns the user (the global one when unsharded)
+            with user_shard(user_id):
+                owner_breaker = _breaker()
+            if owner_breaker.name in down or owner_breaker.state != "closed":
+                if owner_breaker.name not in down:
+                    print(f"[compaction] Breaker '{owner_breaker.name}' not closed, skipping its users")
+                    down.add(owner_breaker.name)
+                report["stopped_early"] = True
+                continue
+            user_report = self.compact_user(user_id)
+            report["users"] += 1
+            for key in ("scanned", "merged", "expired", "capped", "reclaimed"):
+                report[key] += user_report[key]
+            if user_report["reclaimed"]:
+                report["users_changed"] += 1
+
+        report["duration_s"] = round(time.perf_counter() - started, 2)
+        print(
+            f"[compaction] users={report['users']} scanned={report['scanned']} "
+            f"reclaimed={report['reclaimed']} (merged={report['merged']} "
+            f"expired={report['expired']} capped={report['capped']}) "
+            f"in {report['duration_s']}s{' [dry run]' if self.settings.dry_run else ''}"
+        )
+        return report
+
+    def list_users(self) -> List[str]:
+        """Every user_id in the collection, across shards (payload-only scroll, rate-limited)."""
+        users: Set[str] = set()
+
+        def scan(client):
+            for records in iter_points(
+                _collection_name(), batch_size=1024, with_vectors=False, client=client
+            ):
+                self._throttle(len(records))
+                for r in records:
+                    user_id = (r.payload or {}).get("user_id")
+                    if user_id:
+                        users.add(user_id)
+
+        for shard in shards():
+            with use_shard(shard):
+                with_collection(scan)
+        return sorted(users)
+
+    def compact_user(self, user_id: str) -> Dict[str, int]:
+        with user_shard(user_id):
+            return self._compact_user(user_id)
+
+    def _compact_user(self, user_id: str) -> Dict[str, int]:
+        ids: List[Any] = []
+        vectors: List[List[float]] = []
+        payloads: List[Dict[str, Any]] = []
+
+        def load(client):
+            for records in iter_points(
+                _collection_name(),
+                batch_size=256,
+                scroll_filter=user_filter(user_id),
+                client=client,
+            ):
+                self._throttle(len(records))
+                for r in records:
+                    if r.vector is None:
+                        continue
+                    ids.append(r.id)
+                    vectors.append(r.vector)
+                    payloads.append(r.payload or {})
+
+        with_collection(load)
+        plan = plan_user(ids, vectors, payloads, self.settings)
+        reclaimed = len(plan.delete)
+
+        if reclaimed and not self.settings.dry_run:
+            self._apply(plan)
+            if self._on_user_changed is not None:
+                self._on_user_changed(user_id)
+
+        return {
+            "scanned": len(ids),
+            "merged": len(plan.merged),
+            "expired": len(plan.expired),
+            "capped": len(plan.capped),
+            "reclaimed": reclaimed,
+        }
+
+    def _apply(self, plan: UserPlan) -> None:
+        operations: List[Any] = [
+            models.OverwritePayloadOperation(
+                overwrite_payload=models.SetPayload(payload=payload, points=[point_id])
+            )
+            for point_id, payload in plan.overwrite.items()
+        ]
+        operations.append(
+            models.DeleteOperation(delete=models.PointIdsList(points=plan.delete))
+        )
+        with_collection(
+            lambda client: client.batch_update_points(
+                collection_name=_collection_name(), update_operations=operations, wait=True
+            )
+        )
+
+    def _throttle(self, points: int) -> None:
+        """Sleep as needed to stay under settings.rate points per second."""
+        if self.settings.rate <= 0:
+            return
+        self._budget_used += points
+        ahead = self._budget_used / self.settings.rate - (time.monotonic() - self._budget_started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class CompactionScheduler:
+    """Runs a Compactor every `interval` seconds on a daemon thread."""
+
+    def __init__(self, compactor: Compactor, interval: float):
+        self.compactor = compactor
+        self.interval = interval
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.runs = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-compaction", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "last_report": self.last_report,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                # Fresh rate budget per run - idle time doesn't bank a burst
+                self.compactor._budget_started = time.monotonic()
+                self.compactor._budget_used = 0.0
+                self.last_report = self.compactor.run()
+                self.runs += 1
+            except Exception as e:
+                print(f"[compaction] Run failed: {e}")
@@ -0,0 +1,408 @@
+"""
+Memory Digests
+
+Background worker that keeps one precomputed summary ("digest") per user,
+so /summaries is a single point lookup with no summarization on the
+request path.
+
+A digest is its own point in the memory collection with a deterministic
+ID per user. Its payload has no `user_id` field (the user lives in
+`digest_user_id`), so user-filtered searches, the hot set and counts
+never see it.
+
+Only the leader worker runs a DigestWorker (and loads the summarizer).
+Which users need a new digest:
+  - writes in the leader call mark_dirty(user_id)
+  - writes in the other workers add the user to a DigestInbox, a table in
+    the save journal's SQLite file that the leader drains on every pass
+  - a periodic reconcile scan (payloads only) compares each user's fact
+    IDs with the IDs their digest covers - this catches writes from other
+    workers and maintenance scripts
+
+Digests are regenerated incrementally: if a user only gained facts, the
+previous digest plus the new facts is summarized; if facts were removed
+or changed, the digest is rebuilt from all of them. Dirty users are
+processed in batches - one summarize_batch() call, one embed call and
+one upsert per batch. Saves are debounced by the poll interval, so a
+burst of facts produces one digest.
+
+Env vars (read by api/memory.py):
+  - DIGEST_ENABLED (default: false)
+  - DIGEST_INTERVAL (default: 30) - seconds between digest passes
+  - DIGEST_BATCH (default: 8) - users summarized per pipeline call
+  - DIGEST_RECONCILE_INTERVAL (default: 3600) - seconds between full scans, 0 disables
+  - DIGEST_MAX_WORDS (default: 80)
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from qdrant_client.http import models
+
+from services.qdrant_client import (
+    _collection_name,
+    group_by_shard,
+    iter_points,
+    read_shards,
+    shards,
+    use_shard,
+    user_filter,
+    with_collection,
+)
+
+DIGEST_SOURCE = "digest"
+
+
+def digest_point_id(user_id: str) -> int:
+    """Deterministic point ID of a user's digest."""
+    return int(uuid.uuid5(uuid.NAMESPACE_DNS, f"{user_id}:__digest__").int) % (2**63)
+
+
+def fact_text(payload: Dict[str, Any]) -> Optional[str]:
+    """The fact string of a stored point, or None for non-fact points (chunks, digests)."""
+    facts = payload.get("facts")
+    if isinstance(facts, str) and facts.strip():
+        return facts.strip()
+    if isinstance(facts, list):
+        joined = "; ".join(str(f) for f in facts if f)
+        return joined or None
+    return None
+
+
+def digest_input(
+    previous: Optional[Dict[str, Any]], facts: Dict[Any, str]
+) -> Optional[Tuple[str, str]]:
+    """
+    (text to summarize, mode) for a user's facts, or None if the previous
+    digest already covers exactly these facts. Mode is "incremental" when
+    facts were only added, "full" otherwise.
+    """
+    ids = set(facts)
+    covered = set(previous.get("fact_ids", [])) if previous else set()
+
+    if previous and covered == ids:
+        return None
+    if previous and previous.get("summary") and covered < ids:
+        new = [facts[i] for i in facts if i not in covered]
+        return previous["summary"] + "\n" + ". ".join(new), "incremental"
+    return ". ".join(facts.values()), "full"
+
+
+def load_digests(user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Stored digest payloads by user ID (one retrieve call per shard); users without one are absent."""
+    by_shard: Dict[Any, Dict[int, str]] = {}
+    for user_id in user_ids:
+        for shard in read_shards(user_id):
+            by_shard.setdefault(shard, {})[digest_point_id(user_id)] = user_id
+
+    found: Dict[str, Dict[str, Any]] = {}
+    for shard, ids in by_shard.items():
+        with use_shard(shard):
+            points = with_collection(
+                lambda client: client.retrieve(
+                    collection_name=_collection_name(),
+                    ids=list(ids),
+                    with_payload=True,
+                    with_vectors=False,
+                )
+            )
+        for p in points:
+            if p.id in ids:
+                found.setdefault(ids[p.id], p.payload or {})
+    return found
+
+
+def load_digest(user_id: str) -> Optional[Dict[str, Any]]:
+    """A user's digest payload, or None - what /summaries serves."""
+    return load_digests([user_id]).get(user_id)
+
+
+class DigestInbox:
+    """
+    Users with changed facts, handed from the other workers to the leader's
+    DigestWorker. A set (the user is the primary key), so a burst of saves
+    queues a user once.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digest_dirty (user_id TEXT PRIMARY KEY, marked_at REAL NOT NULL)"
+        )
+
+    def add(self, user_ids: Iterable[str]) -> None:
+        rows = [(user_id, time.time()) for user_id in user_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO digest_dirty (user_id, marked_at) VALUES (?, ?)", rows
+            )
+
+    def take(self) -> List[str]:
+        """Remove and return every queued user."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT user_id FROM digest_dirty").fetchall()
+                self._conn.execute("DELETE FROM digest_dirty")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM digest_dirty").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DigestWorker:
+    """Regenerates per-user digests in the background."""
+
+    def __init__(
+        self,
+        summarize_batch: Callable[[List[str], int], List[str]],
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        batch_size: int = 8,
+        interval: float = 30.0,
+        reconcile_interval: float = 3600.0,
+        max_words: int = 80,
+        inbox: Optional[DigestInbox] = None,
+    ):
+        self._summarize_batch = summarize_batch
+        self._embed_batch = embed_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.max_words = max_words
+        self.inbox = inbox
+
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_reconcile = 0.0
+
+        self.built = {"incremental": 0, "full": 0}
+        self.removed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_run_ms = 0.0
+
+    def mark_dirty(self, user_id: str) -> None:
+        """A user's facts changed - regenerate their digest on the next pass."""
+        with self._lock:
+            self._dirty.add(user_id)
+
+    # ------------------------------------------------------------------
+    # Background passes
+    # ------------------------------------------------------------------
+
+    def run_once(self) -> int:
+        """Regenerate digests for every dirty user. Returns users processed."""
+        if self.inbox is not None:
+            queued = self.inbox.take()
+            with self._lock:
+                self._dirty.update(queued)
+        with self._lock:
+            users = sorted(self._dirty)
+            self._dirty.clear()
+        if not users:
+            return 0
+
+        started = time.perf_counter()
+        for i in range(0, len(users), self.batch_size):
+            batch = users[i : i + self.batch_size]
+            try:
+                self._build(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"[digest] ✗ Batch failed ({e}), will retry {len(batch)} users")
+                with self._lock:
+                    self._dirty.update(batch)
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 1)
+        return len(users)
+
+    def reconcile(self) -> int:
+        """Scan all payloads and mark users whose digest is stale. Returns users marked."""
+        facts_by_user: Dict[str, Set[Any]] = {}
+        covered: Dict[str, Set[Any]] = {}
+
+        def scan(client):
+            for records in iter_points(
+                _collection_name(), batch_size=1024, with_vectors=False, client=client
+            ):
+                for r in records:
+                    payload = r.payload or {}
+                    if payload.get("source_type") == DIGEST_SOURCE:
+                        covered[payload.get("digest_user_id")] = set(payload.get("fact_ids", []))
+                    elif payload.get("user_id") and fact_text(payload):
+                        facts_by_user.setdefault(payload["user_id"], set()).add(r.id)
+
+        for shard in shards():
+            with use_shard(shard):
+                with_collection(scan)
+        stale = {
+            user_id
+            for user_id in set(facts_by_user) | set(covered)
+            if facts_by_user.get(user_id, set()) != covered.get(user_id)
+        }
+        with self._lock:
+            self._dirty.update(stale)
+        self._last_reconcile = time.monotonic()
+        if stale:
+            print(f"[digest] Reconcile: {len(stale)} users need a new digest")
+        return len(stale)
+
+    def request_reconcile(self) -> None:
+        """Run a reconcile scan on the next pass (e.g. after a collection switch)."""
+        self._last_reconcile = float("-inf")
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-digest", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            dirty = len(self._dirty)
+        return {
+            "enabled": True,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "dirty_users": dirty,
+            "queued_users": self.inbox.count() if self.inbox is not None else 0,
+            "built_incremental": self.built["incremental"],
+            "built_full": self.built["full"],
+            "removed": self.removed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_run_ms": self.last_run_ms,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if (
+                    self.reconcile_interval > 0
+                    and time.monotonic() - self._last_reconcile >= self.reconcile_interval
+                ):
+                    self.reconcile()
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"[digest] Pass failed: {e}")
+
+    def _user_facts(self, user_id: str) -> Dict[Any, str]:
+        facts: Dict[Any, str] = {}
+
+        def load(client):
+            for records in iter_points(
+                _collection_name(),
+                batch_size=512,
+                with_vectors=False,
+                scroll_filter=user_filter(user_id),
+                client=client,
+            ):
+                for r in records:
+                    text = fact_text(r.payload or {})
+                    if text:
+                        facts[r.id] = text
+
+        for shard in read_shards(user_id):
+            with use_shard(shard):
+                with_collection(load)
+        return facts
+
+    def _build(self, users: List[str]) -> None:
+        previous = load_digests(users)
+        todo: List[Tuple[str, Dict[Any, str], str, str]] = []
+        gone: List[str] = []
+
+        for user_id in users:
+            facts = self._user_facts(user_id)
+            if not facts:
+                if user_id in previous:
+                    gone.append(user_id)
+                continue
+            built = digest_input(previous.get(user_id), facts)
+            if built is not None:
+                todo.append((user_id, facts, built[0], built[1]))
+
+        for shard, idx in group_by_shard(gone).items():
+            with use_shard(shard):
+                with_collection(
+                    lambda client: client.delete(
+                        collection_name=_collection_name(),
+                        points_selector=models.PointIdsList(
+                            points=[digest_point_id(gone[i]) for i in idx]
+                        ),
+                    )
+                )
+        self.removed += len(gone)
+
+        if not todo:
+            return
+
+        summaries = self._summarize_batch([text for _, _, text, _ in todo], self.max_words)
+        vectors = self._embed_batch(summaries)
+        now = time.time()
+        points = [
+            models.PointStruct(
+                id=digest_point_id(user_id),
+                vector=vector,
+                payload={
+                    "digest_user_id": user_id,
+                    "source_type": DIGEST_SOURCE,
+                    "summary": summary,
+                    "fact_ids": list(facts),
+                    "fact_count": len(facts),
+                    "mode": mode,
+                    "updated_at": now,
+                },
+            )
+            for (user_id, facts, _, mode), summary, vector in zip(todo, summaries, vectors)
+        ]
+        for shard, idx in group_by_shard([user_id for user_id, _, _, _ in todo]).items():
+            with use_shard(shard):
+                with_collection(
+                    lambda client: client.upsert(
+                        collection_name=_collection_name(),
+                        points=[points[i] for i in idx],
+                        wait=True,
+                    )
+                )
+        for _, _, _, mode in todo:
+            self.built[mode] += 1
+        self.batches += 1
+        print(f"[digest] Updated {len(points)} digests")
@@ -0,0 +1,201 @@
+"""
+Embedding Scheduler
+
+Cross-request micro-batching for the embedding model. Request threads
+submit texts to a shared queue and block; a single worker thread drains
+the queue and runs one encode() call per batch, then hands each caller
+back its own vectors.
+
+A batch is flushed when either:
+  - it holds max_batch_size texts, or
+  - max_wait_ms has passed since the first request in the batch arrived
+
+Under concurrent /save and /search traffic this keeps the model busy with
+real batches instead of a stream of batch-size-1 forward passes. With a
+single caller the only cost is the (small) max wait.
+
+Env vars (read by embedder.py):
+  - EMBED_BATCHING (default: true)
+  - EMBED_MAX_WAIT_MS (default: 5)
+  - EMBED_MAX_BATCH (default: 64)
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+# Upper bounds of the batch size histogram buckets
+_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class _Request:
+    """One caller's texts plus the future it is waiting on."""
+
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingScheduler:
+    """
+    Collects concurrent embed requests into micro-batches.
+
+    encode_fn takes a list of strings and returns a sequence of vectors
+    (numpy array or list of lists) in the same order.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, texts: List[str]) -> List[list[float]]:
+        """Queue texts for the next batch and block until their vectors are ready."""
+        if not texts:
+            return []
+        self._ensure_worker()
+        request = _Request(list(texts))
+        self._queue.put(request)
+        return request.future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Achieved batch sizes and queue wait times since startup."""
+        with self._stats_lock:
+            batches = self._batches
+            requests = self._requests
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": batches,
+                "requests": requests,
+                "texts": self._texts,
+                "avg_batch_size": round(self._texts / batches, 2) if batches else 0.0,
+                "max_observed_batch": self._max_batch,
+                "batch_size_histogram": dict(self._histogram),
+                "avg_queue_wait_ms": (
+                    round(self._wait_total * 1000 / requests, 3) if requests else 0.0
+                ),
+                "max_queue_wait_ms": round(self._wait_max * 1000, 3),
+                "avg_encode_ms": (
+                    round(self._encode_total * 1000 / batches, 3) if batches else 0.0
+                ),
+                "queue_depth": self._queue.qsize(),
+            }
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread on first use (after any fork)."""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embed-scheduler", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            self._process(batch)
+
+    def _collect_batch(self) -> List[_Request]:
+        """Block for the first request, then gather more until full or timed out."""
+        first = self._queue.get()
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _process(self, batch: List[_Request]) -> None:
+        """Run one encode() for the whole batch and fan results back out."""
+        started = time.perf_counter()
+        texts = [t for request in batch for t in request.texts]
+
+        try:
+            vectors = self._encode_fn(texts)
+            if hasattr(vectors, "tolist"):
+                vectors = vectors.tolist()
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self._record(batch, len(texts), started, time.perf_counter() - started)
+
+        offset = 0
+        for request in batch:
+            count = len(request.texts)
+            request.future.set_result(vectors[offset : offset + count])
+            offset += count
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def _reset_stats(self) -> None:
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+        self._max_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._encode_total = 0.0
+        self._histogram = {f"<={b}": 0 for b in _BATCH_BUCKETS}
+        self._histogram[f">{_BATCH_BUCKETS[-1]}"] = 0
+
+    def _record(
+        self, batch: List[_Request], size: int, started: float, encode_time: float
+    ) -> None:
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._texts += size
+            self._max_batch = max(self._max_batch, size)
+            self._encode_total += encode_time
+            for request in batch:
+                wait = started - request.enqueued_at
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+
+            for bound in _BATCH_BUCKETS:
+                if size <= bound:
+                    self._histogram[f"<={bound}"] += 1
+                    break
+            else:
+                self._histogram[f">{_BATCH_BUCKETS[-1]}"] += 1
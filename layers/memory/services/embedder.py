@@ -2,21 +2,130 @@
 Embedding Service
 
 Generates 768-dim semantic embeddings using SentenceTransformers.
-I use all-mpnet-base-v2 - good balance of quality and speed.
+I use all-mpnet-base-v2 - good balance of quality and speed. EMBEDDING_MODEL
+overrides it; change models on a live service with an embedding migration
+(services/embedding_migration.py), which swaps the backend in place via
+use_backend() once the new collection is backfilled.
+
+EMBEDDING_PROVIDER picks the inference backend (PyTorch fp32, ONNX Runtime,
+or int8-quantized ONNX) - see embedding_backends.py.
 
 The embeddings are normalized, so COSINE = DOT product (same ordering).
 
+Concurrent calls are funnelled through an EmbeddingScheduler so requests
+from different threads share one encode() batch (see embed_scheduler.py).
+Set EMBED_BATCHING=false to call the model directly.
+
+Every call checks the EmbeddingCache first (see embedding_cache.py), so
+repeated strings never reach the model.
+
 Key functions:
     embed(text) - embed a single string
+    embed_batch(texts) - embed many strings in one forward pass
     embed_messages(messages) - embed a full conversation with role prefixes
 """
 
-from sentence_transformers import SentenceTransformer
 import json
-from typing import List, Any
+import os
+from typing import List, Any, Dict
+
+from services import metrics
+from services.embed_scheduler import EmbeddingScheduler
+from services.embedding_backends import load_backend
+from services.embedding_cache import EmbeddingCache
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-mpnet-base-v2")
+
+
+def load_model(model_name: str):
+    """Load a backend for model_name with the configured EMBEDDING_PROVIDER."""
+    return load_backend(os.getenv("EMBEDDING_PROVIDER", "sentence_transformers"), model_name)
+
 
 # Load model once at import time
-_model = SentenceTransformer("all-mpnet-base-v2")
+_backend = load_model(MODEL_NAME)
+
+
+def _encode(texts: List[str]):
+    """Run the model over a list of strings (normalized vectors)."""
+    with metrics.EMBED_SECONDS.time():
+        vectors = _backend.encode(texts)
+    metrics.EMBED_BATCH_SIZE.observe(len(texts))
+    return vectors
+
+
+_batching_enabled = os.getenv("EMBED_BATCHING", "true").lower() in ("1", "true", "yes")
+_scheduler = EmbeddingScheduler(
+    _encode,
+    max_batch_size=int(os.getenv("EMBED_MAX_BATCH", "64")),
+    max_wait_ms=float(os.getenv("EMBED_MAX_WAIT_MS", "5")),
+)
+
+
+_disk_cache_writable = True
+
+
+def _make_cache(backend) -> EmbeddingCache:
+    # A read-only worker never opens a new disk tier: opening one may reset
+    # the files under the worker that owns them
+    return EmbeddingCache(
+        backend.cache_name,
+        max_entries=int(os.getenv("EMBED_CACHE_SIZE", "10000")),
+        dim=backend.dim,
+        disk_path=(os.getenv("EMBED_CACHE_DIR") or None) if _disk_cache_writable else None,
+        disk_capacity=int(os.getenv("EMBED_CACHE_DISK_CAPACITY", "200000")),
+    )
+
+
+_cache = _make_cache(_backend)
+
+
+def current_model() -> str:
+    return _backend.model_name
+
+
+def current_backend():
+    """The backend embed calls go to right now."""
+    return _backend
+
+
+def use_backend(backend) -> None:
+    """
+    Serve every embed call from `backend` from now on (embedding migration
+    switch). The cache is rebuilt for the new model; a batch already inside
+    the old model finishes with it.
+    """
+    global _backend, _cache
+    try:
+        # Before the new cache opens the same disk tier
+        _cache.flush()
+    except Exception as e:
+        print(f"[embedder] Failed to flush old cache: {e}")
+    cache = _make_cache(backend)
+    _backend, _cache = backend, cache
+    print(f"[embedder] Now serving {backend.model_name} via {backend.provider} (dim={backend.dim})")
+
+
+def _run_model(texts: List[str]) -> list[list[float]]:
+    """Embed a list of strings, via the micro-batching scheduler when enabled."""
+    if _batching_enabled:
+        return _scheduler.submit(texts)
+    return _encode(texts).tolist()
+
+
+def _embed_texts(texts: List[str]) -> list[list[float]]:
+    """Embed a list of strings, serving repeats from the cache."""
+    if not _cache.enabled:
+        return _run_model(texts)
+
+    vectors = _cache.get_many(texts)
+    # Deduplicate misses so a repeated string is only embedded once
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, _run_model(missing)))
+        _cache.put_many(missing, [fresh[t] for t in missing])
+        vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+    return vectors
 
 
 def _extract_text_from_content(content: List[dict] | str) -> str:
@@ -71,10 +180,54 @@ def embed_messages(messages: List[dict]) -> list[float]:
     if not combined_text.strip():
         combined_text = "[empty conversation]"
     
-    vec = _model.encode(combined_text, normalize_embeddings=True)
-    return vec.tolist()
+    return _embed_texts([combined_text])[0]
 
 def embed(text: str) -> list[float]:
     """Embed a single string into 768 dimensions. Low-level version—use embed_messages() for conversations."""
-    vec = _model.encode(text, normalize_embeddings=True)
-    return vec.tolist()
\ No newline at end of file
+    return _embed_texts([text])[0]
+
+
+def embed_batch(texts: List[str]) -> list[list[float]]:
+    """
+    Embed many strings in a single encode() call. Much cheaper than calling
+    embed() in a loop - one forward pass per batch instead of one per string.
+    Output order matches input order.
+    """
+    if not texts:
+        return []
+    return _embed_texts(list(texts))
+
+
+def embedder_stats() -> Dict[str, Any]:
+    """Scheduler stats (batch sizes, queue waits) plus cache hit/miss counters."""
+    return {
+        "provider": _backend.provider,
+        "model": _backend.model_name,
+        "dim": _backend.dim,
+        "batching": _batching_enabled,
+        **_scheduler.stats(),
+        "cache": _cache.stats(),
+    }
+
+
+def model_loaded() -> bool:
+    """True once the current backend's model weights are in memory."""
+    return _backend.loaded
+
+
+def cache_sizes() -> Dict[str, int]:
+    """Entries in the in-memory and on-disk embedding cache tiers."""
+    stats = _cache.stats()
+    return {"memory": stats["size"], "disk": stats["disk_size"] or 0}
+
+
+def flush_cache() -> None:
+    """Persist the on-disk embedding cache tier (no-op without one)."""
+    _cache.flush()
+
+
+def set_disk_cache_writable(writable: bool) -> None:
+    """Make this process a read-only user of the shared disk cache tier (serve.py workers)."""
+    global _disk_cache_writable
+    _disk_cache_writable = writable
+    _cache.set_disk_writable(writable)
@@ -0,0 +1,206 @@
+"""
+Embedding Backends
+
+CPU inference backends for the embedding model, selected with the
+EMBEDDING_PROVIDER env var. Every backend returns L2-normalized float32
+vectors of the same dimension (768 for all-mpnet-base-v2), so they are
+interchangeable as far as Qdrant is concerned.
+
+Providers:
+  - sentence_transformers: PyTorch fp32 (reference, default)
+  - onnx: ONNX Runtime export of the same model
+  - onnx_int8: ONNX Runtime with dynamic int8 quantization (fastest on CPU)
+  - stub: hashed bag-of-words vectors, no model (load tests / offline runs)
+
+The ONNX variants need sentence-transformers >= 3.2 with
+optimum[onnxruntime]. If a backend fails to load I fall back to
+sentence_transformers and log why, so a bad env var never takes the
+service down.
+
+Env vars:
+  - EMBEDDING_PROVIDER (default: sentence_transformers)
+  - EMBEDDING_EXPORT_DIR (default: $HF_HOME/onnx or ./onnx) - where ONNX
+    exports are written so they are only built once
+  - EMBEDDING_QUANT_CONFIG (default: avx2) - arm64, avx2, avx512, avx512_vnni
+  - EMBEDDING_STUB_DIM (default: 768) - vector size of the stub backend
+  - EMBEDDING_STUB_MS (default: 0) - simulated model time per stub encode() batch
+"""
+
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger("memory.embedding_backends")
+
+DEFAULT_PROVIDER = "sentence_transformers"
+
+
+class EmbeddingBackend:
+    """Base class: encode(texts) -> (n, dim) normalized float32 array."""
+
+    provider = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def cache_name(self) -> str:
+        """Identity used for cache keys - vectors differ slightly per backend."""
+        return f"{self.model_name}@{self.provider}"
+
+    @property
+    def dim(self) -> int:
+        return int(self._model.get_sentence_embedding_dimension())
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vecs = self._model.encode(
+            list(texts), normalize_embeddings=True, convert_to_numpy=True
+        )
+        return np.asarray(vecs, dtype=np.float32)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch fp32 - the reference implementation."""
+
+    provider = "sentence_transformers"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime export of the model (exported once, then reused)."""
+
+    provider = "onnx"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        export_dir = _export_dir(model_name)
+        if (export_dir / "onnx" / "model.onnx").exists():
+            self._model = SentenceTransformer(str(export_dir), backend="onnx")
+        else:
+            # First run: export from the hub model and keep a local copy
+            self._model = SentenceTransformer(model_name, backend="onnx")
+            self._model.save_pretrained(str(export_dir))
+            logger.info(f"[embedder] Exported ONNX model to {export_dir}")
+
+
+class QuantizedOnnxBackend(EmbeddingBackend):
+    """ONNX Runtime with dynamic int8 weight quantization."""
+
+    provider = "onnx_int8"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        config = os.getenv("EMBEDDING_QUANT_CONFIG", "avx2")
+        export_dir = _export_dir(model_name)
+        file_name = f"onnx/model_qint8_{config}.onnx"
+
+        if not (export_dir / file_name).exists():
+            base = OnnxBackend(model_name)._model
+            export_dynamic_quantized_onnx_model(
+                base, config, str(export_dir), push_to_hub=False
+            )
+            logger.info(f"[embedder] Wrote int8 ONNX model {export_dir / file_name}")
+
+        self._model = SentenceTransformer(
+            str(export_dir), backend="onnx", model_kwargs={"file_name": file_name}
+        )
+
+
+class StubBackend(EmbeddingBackend):
+    """
+    Deterministic hashed bag-of-words vectors - no model, no torch. Texts
+    that share words land close together, so search and fact dedup still
+    behave plausibly. For load tests: throughput then measures everything
+    except the model, or EMBEDDING_STUB_MS stands in for its cost.
+    """
+
+    provider = "stub"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        self._dim = int(os.getenv("EMBEDDING_STUB_DIM", "768"))
+        self._delay = float(os.getenv("EMBEDDING_STUB_MS", "0")) / 1000
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    @property
+    def loaded(self) -> bool:
+        return True
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vecs = np.zeros((len(texts), self._dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.lower().split():
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                h = int.from_bytes(digest, "little")
+                vecs[i, h % self._dim] += 1.0 if h >> 63 else -1.0
+        vecs[~vecs.any(axis=1), 0] = 1.0  # blank text -> a fixed unit vector
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        if self._delay:
+            time.sleep(self._delay)
+        return vecs
+
+
+BACKENDS = {
+    SentenceTransformerBackend.provider: SentenceTransformerBackend,
+    OnnxBackend.provider: OnnxBackend,
+    QuantizedOnnxBackend.provider: QuantizedOnnxBackend,
+    StubBackend.provider: StubBackend,
+}
+
+
+def _export_dir(model_name: str) -> Path:
+    root = os.getenv("EMBEDDING_EXPORT_DIR") or os.path.join(
+        os.getenv("HF_HOME", "."), "onnx"
+    )
+    return Path(root) / model_name.replace("/", "__")
+
+
+def load_backend(provider: str, model_name: str) -> EmbeddingBackend:
+    """
+    Build the backend for `provider`. Unknown providers or load failures
+    fall back to the sentence_transformers reference backend.
+    """
+    provider = (provider or DEFAULT_PROVIDER).strip().lower()
+    backend_cls = BACKENDS.get(provider)
+    if backend_cls is None:
+        logger.warning(
+            f"[embedder] Unknown EMBEDDING_PROVIDER '{provider}', "
+            f"using {DEFAULT_PROVIDER} (options: {', '.join(BACKENDS)})"
+        )
+        backend_cls = SentenceTransformerBackend
+
+    try:
+        backend = backend_cls(model_name)
+    except Exception as e:
+        if backend_cls is SentenceTransformerBackend:
+            raise
+        logger.warning(
+            f"[embedder] {backend_cls.provider} backend unavailable ({e}), "
+            f"falling back to {DEFAULT_PROVIDER}"
+        )
+        backend = SentenceTransformerBackend(model_name)
+
+    logger.info(f"[embedder] Loaded {model_name} via {backend.provider} (dim={backend.dim})")
+    return backend
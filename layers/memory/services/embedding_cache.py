@@ -0,0 +1,258 @@
+"""
+Embedding Cache
+
+Content-addressed cache in front of the embedding model. The same strings
+get embedded over and over (facts re-saved every turn, regenerated queries,
+the default /summaries query), so hits skip the model entirely.
+
+Keys are SHA-256 of model name + normalized text (whitespace collapsed).
+Case is kept - the model is case-sensitive, so "Sarah" and "sarah" are
+different vectors.
+
+Two tiers:
+  - memory: bounded LRU (OrderedDict of float32 arrays)
+  - disk (optional): fixed-size memory-mapped ring of vectors plus a parallel
+    key table, so entries survive restarts. Lookups promote into memory.
+
+In the pre-fork multi-worker mode (serve.py) the disk tier is mapped once
+before fork and shared: only worker 0 writes to it; the others call
+set_disk_writable(False) and just read. Their slot index is a snapshot
+from fork time, so a disk read checks the slot's key before and after
+copying the vector and treats a slot rewritten underneath it as a miss.
+
+Env vars (read by embedder.py):
+  - EMBED_CACHE_SIZE (default: 10000, 0 disables the cache)
+  - EMBED_CACHE_DIR (default: unset, no disk tier; ignored when the cache is disabled)
+  - EMBED_CACHE_DISK_CAPACITY (default: 200000 vectors)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+_DIGEST_SIZE = 32  # sha256
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different strings share an entry."""
+    return " ".join((text or "").split())
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Content address for a (model, text) pair."""
+    return hashlib.sha256(
+        f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+    ).digest()
+
+
+class DiskTier:
+    """
+    Memory-mapped vector store that survives restarts.
+
+    Layout in `path`:
+      - vectors.f32  (capacity x dim float32)
+      - keys.bin     (capacity x 32 bytes, all-zero row = empty slot)
+      - meta.json    (dim, capacity, next write cursor)
+
+    Slots are reused ring-style once the file is full, so disk use is fixed.
+    """
+
+    def __init__(self, path: str | Path, dim: int, capacity: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.capacity = capacity
+
+        meta_path = self.path / "meta.json"
+        meta = {}
+        if meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text())
+            except Exception:
+                meta = {}
+
+        expected = {
+            "vectors.f32": capacity * dim * np.dtype(np.float32).itemsize,
+            "keys.bin": capacity * _DIGEST_SIZE,
+        }
+        intact = all(
+            (self.path / name).is_file() and (self.path / name).stat().st_size == size
+            for name, size in expected.items()
+        )
+        if meta.get("dim") != dim or meta.get("capacity") != capacity or not intact:
+            # Layout changed, first run, or a file missing / truncated - start fresh
+            if meta:
+                print(f"[embed-cache] Resetting disk tier at {self.path}")
+            for name in expected:
+                (self.path / name).unlink(missing_ok=True)
+            meta = {"dim": dim, "capacity": capacity, "cursor": 0}
+            intact = False
+
+        mode = "r+" if intact else "w+"
+        self._vectors = np.memmap(
+            self.path / "vectors.f32", dtype=np.float32, mode=mode, shape=(capacity, dim)
+        )
+        self._keys = np.memmap(
+            self.path / "keys.bin", dtype=np.uint8, mode=mode, shape=(capacity, _DIGEST_SIZE)
+        )
+        self._cursor = int(meta.get("cursor", 0)) % capacity
+        self._meta_path = meta_path
+
+        # Rebuild the key -> slot index from the key table
+        self._index: Dict[bytes, int] = {}
+        filled = np.flatnonzero(self._keys.any(axis=1))
+        for slot in filled:
+            self._index[self._keys[slot].tobytes()] = int(slot)
+
+        self._write_meta()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self._index.get(key)
+        if slot is None:
+            return None
+        if self._keys[slot].tobytes() != key:
+            return None  # slot reused by another process
+        vector = np.array(self._vectors[slot], dtype=np.float32)
+        if self._keys[slot].tobytes() != key:
+            return None  # rewritten while we copied
+        return vector
+
+    def put(self, key: bytes, vector: np.ndarray) -> None:
+        if key in self._index:
+            return
+        slot = self._cursor
+        old_key = self._keys[slot].tobytes()
+        if old_key in self._index and self._index[old_key] == slot:
+            del self._index[old_key]
+
+        # Vector first, then key - a torn write leaves an empty slot, not a bad one
+        self._keys[slot] = 0
+        self._vectors[slot] = vector
+        self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+        self._index[key] = slot
+        self._cursor = (slot + 1) % self.capacity
+
+    def flush(self) -> None:
+        self._vectors.flush()
+        self._keys.flush()
+        self._write_meta()
+
+    def _write_meta(self) -> None:
+        self._meta_path.write_text(
+            json.dumps({"dim": self.dim, "capacity": self.capacity, "cursor": self._cursor})
+        )
+
+
+class EmbeddingCache:
+    """Bounded LRU of embeddings with an optional persistent disk tier."""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10000,
+        dim: int = 768,
+        disk_path: Optional[str | Path] = None,
+        disk_capacity: int = 200000,
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.dim = dim
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[DiskTier] = None
+        self._disk_writable = True
+        if disk_path and self.enabled:
+            try:
+                self._disk = DiskTier(disk_path, dim, disk_capacity)
+            except (OSError, ValueError) as e:
+                # A broken cache directory costs hit rate, never the service
+                print(f"[embed-cache] ⚠ Disk tier at {disk_path} unavailable, memory only: {e}")
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._puts_since_flush = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, text: str) -> bytes:
+        return cache_key(self.model_name, text)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[list[float]]]:
+        """Look up each text. Returns a vector per text, or None on a miss."""
+        results: List[Optional[list[float]]] = []
+        with self._lock:
+            for text in texts:
+                k = self.key(text)
+                vec = self._lru.get(k)
+                if vec is not None:
+                    self._lru.move_to_end(k)
+                    self.hits += 1
+                elif self._disk is not None and (vec := self._disk.get(k)) is not None:
+                    self.disk_hits += 1
+                    self._remember(k, vec)
+                else:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                results.append(vec.tolist())
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Any]) -> None:
+        """Store freshly computed vectors in both tiers."""
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                k = self.key(text)
+                arr = np.asarray(vector, dtype=np.float32)
+                self._remember(k, arr)
+                if self._disk is not None and self._disk_writable:
+                    self._disk.put(k, arr)
+                    self._puts_since_flush += 1
+            if self._disk is not None and self._puts_since_flush >= 256:
+                self._disk.flush()
+                self._puts_since_flush = 0
+
+    def flush(self) -> None:
+        """Persist disk-tier pages and metadata (call on shutdown)."""
+        with self._lock:
+            if self._disk is not None and self._disk_writable:
+                self._disk.flush()
+                self._puts_since_flush = 0
+
+    def set_disk_writable(self, writable: bool) -> None:
+        """Stop (or resume) writing to the disk tier; reads are unaffected."""
+        with self._lock:
+            self._disk_writable = writable
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._lru),
+                "max_entries": self.max_entries,
+                "disk_size": len(self._disk) if self._disk is not None else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+                ),
+            }
+
+    def _remember(self, k: bytes, vec: np.ndarray) -> None:
+        self._lru[k] = vec
+        self._lru.move_to_end(k)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
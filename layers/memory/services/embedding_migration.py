@@ -0,0 +1,491 @@
+"""
+Embedding Migration
+
+Moves the memory collection to a new embedding model on a live service,
+without recreate_collection and without losing memories.
+
+Phases (persisted in a JSON state file, so a restart resumes where it
+stopped):
+  backfill  A versioned collection (<INDEX_NAME>__<model>) is created for
+            the new model. Every save is dual-written: upserted as usual,
+            then re-embedded with the new model into the target
+            (dual_write). Meanwhile existing points are scrolled in large
+            batches and re-embedded from their stored text (facts,
+            user_text or a digest's summary) - vectors from the old model
+            can't be converted.
+  ready     The backfill caught up. Points deleted from the source during
+            the backfill are removed from the target, and points saved
+            since the migration started whose target copy is missing or
+            older (a failed dual-write, or a backfill batch that raced a
+            save) are copied again. With auto_switch this runs straight
+            into the switch; otherwise it waits for switch().
+  switched  on_switch() moves reads and writes to the target collection and
+            the new model in one step (embedder.use_backend +
+            qdrant_client.set_active_collection, caches cleared). Saves in
+            this process hold `writes` (a WriteGate) from embedding through
+            dual-write, and the switch waits for them and holds new ones
+            back, so no save straddles it. Other workers keep writing the
+            source until they poll the state file; `settle` seconds after
+            the switch the leader runs catch-up once more (re-copy only) to
+            pick up their saves and any failed dual-writes. The source
+            collection is kept for rollback.
+
+Backfill throughput is capped at `rate` points per second so live traffic
+keeps the model and Qdrant; progress (done / total, rate, ETA) is in
+stats().
+
+Catch-up compares the `saved_at` stamp every save writes, so it works
+across processes: in the pre-fork multi-worker mode (serve.py) every worker
+dual-writes, but only the leader (worker 0) runs the backfill; the others
+poll the state file and apply the switch when it lands.
+
+Payload-only edits made during the backfill (compaction merges) aren't
+mirrored; the next compaction run after the switch redoes them.
+
+Env vars (read by api/memory.py):
+  - EMBEDDING_MIGRATION_TARGET (default: unset) - model to migrate to
+  - EMBEDDING_MIGRATION_STATE (default: embedding_migration.json)
+  - EMBEDDING_MIGRATION_BATCH (default: 256) - points re-embedded per batch
+  - EMBEDDING_MIGRATION_RATE (default: 200) - points per second (0 = unthrottled)
+  - EMBEDDING_MIGRATION_AUTO_SWITCH (default: true)
+  - EMBEDDING_MIGRATION_SETTLE (default: 30) - seconds before the post-switch catch-up
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from qdrant_client.http import models
+
+from services.qdrant_client import _create_collection, with_collection
+
+BACKFILL = "backfill"
+READY = "ready"
+SWITCHED = "switched"
+
+
+def model_slug(model_name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", model_name.lower()).strip("_")
+
+
+def versioned_collection(base: str, model_name: str) -> str:
+    """Collection name for `base` embedded with `model_name`."""
+    return f"{base}__{model_slug(model_name)}"
+
+
+def embedding_text(payload: Dict[str, Any]) -> Optional[str]:
+    """The text a point's vector was built from (fact, chunk or digest)."""
+    for key in ("facts", "user_text", "summary"):
+        value = payload.get(key)
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def load_state(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def new_state(source_collection: str, source_model: str, target_model: str, dim: int) -> Dict[str, Any]:
+    base = source_collection.split("__")[0]
+    return {
+        "phase": BACKFILL,
+        "source": {"collection": source_collection, "model": source_model},
+        "target": {
+            "collection": versioned_collection(base, target_model),
+            "model": target_model,
+            "dim": dim,
+        },
+        "cursor": None,
+        "done": 0,
+        "skipped": 0,
+        "total": None,
+        "started_at": time.time(),
+        "switched_at": None,
+        "settled": False,
+    }
+
+
+class WriteGate:
+    """
+    Any number of saves at once, but none across a switch: saves hold it
+    shared (writing()), the switch holds it exclusively (exclusive()) and
+    waits for the saves in flight to finish first.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._writers = 0
+        self._switching = False
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        with self._cond:
+            while self._switching:
+                self._cond.wait()
+            self._writers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writers -= 1
+                if not self._writers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._cond:
+            while self._switching:
+                self._cond.wait()
+            self._switching = True
+            while self._writers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._switching = False
+                self._cond.notify_all()
+
+
+class EmbeddingMigration:
+    """Dual-write + throttled backfill + switch for one model change."""
+
+    def __init__(
+        self,
+        state: Dict[str, Any],
+        state_path: str,
+        encode: Callable[[List[str]], List[List[float]]],
+        on_switch: Callable[[Dict[str, Any]], None],
+        batch_size: int = 256,
+        rate: float = 200.0,
+        auto_switch: bool = True,
+        retry_interval: float = 5.0,
+        settle: float = 30.0,
+        leader: bool = True,
+    ):
+        self.state = state
+        self.state_path = state_path
+        self._encode = encode
+        self._on_switch = on_switch
+        self.batch_size = batch_size
+        self.rate = rate
+        self.auto_switch = auto_switch
+        self.retry_interval = retry_interval
+        self.settle = settle
+        self.leader = leader
+
+        self.writes = WriteGate()
+        self._switch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.dual_writes = 0
+        self.errors = 0
+        self._run_started = time.monotonic()
+        self._run_done = 0
+
+    @property
+    def phase(self) -> str:
+        return self.state["phase"]
+
+    @property
+    def source(self) -> str:
+        return self.state["source"]["collection"]
+
+    @property
+    def target(self) -> str:
+        return self.state["target"]["collection"]
+
+    # ------------------------------------------------------------------
+    # Dual-write (called from the save path)
+    # ------------------------------------------------------------------
+
+    def dual_write(self, points: List[models.PointStruct]) -> None:
+        """Mirror points just upserted into the source. Never raises."""
+        if self.phase == SWITCHED:
+            return
+        try:
+            self.dual_writes += self._upsert_target([(p.id, p.payload or {}) for p in points])
+        except Exception as e:
+            # Catch-up copies it again: before the switch, and once more
+            # after it (for workers that hadn't switched yet)
+            self.errors += 1
+            print(f"[migration] ✗ Dual-write of {len(points)} points failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Backfill
+    # ------------------------------------------------------------------
+
+    def prepare(self) -> None:
+        """Create the target collection and count the source (idempotent)."""
+        target = self.state["target"]
+
+        def create(client):
+            if not client.collection_exists(target["collection"]):
+                _create_collection(client, target["collection"], size=target["dim"])
+            if self.state["total"] is None:
+                self.state["total"] = client.count(collection_name=self.source, exact=True).count
+
+        with_collection(create)
+        save_state(self.state_path, self.state)
+
+    def backfill_batch(self) -> bool:
+        """Re-embed the next page of source points. Returns False once caught up."""
+        records, next_offset = with_collection(
+            lambda client: client.scroll(
+                collection_name=self.source,
+                limit=self.batch_size,
+                offset=self.state["cursor"],
+                with_payload=True,
+                with_vectors=False,
+            )
+        )
+        rows = [(r.id, r.payload or {}) for r in records]
+        copied = self._upsert_target(rows)
+
+        self.state["cursor"] = next_offset
+        self.state["done"] += len(records)
+        self.state["skipped"] += len(records) - copied
+        save_state(self.state_path, self.state)
+
+        self._run_done += len(records)
+        self._throttle()
+        return next_offset is not None
+
+    def catch_up(self, remove_deleted: bool = True) -> Dict[str, int]:
+        """
+        Re-copy points saved since the migration started whose target copy
+        is missing or older; remove target points deleted from the source
+        (not after the switch, when the target has saves the source lacks).
+        """
+        since = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="saved_at",
+                    # A minute of slack for clock skew between workers
+                    range=models.Range(gte=self.state["started_at"] - 60),
+                )
+            ]
+        )
+        recopied = 0
+        offset = None
+        while True:
+            records, offset = with_collection(
+                lambda client: client.scroll(
+                    collection_name=self.source,
+                    scroll_filter=since,
+                    limit=self.batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False,
+                )
+            )
+            if records:
+                copies = self._target_saved_at([r.id for r in records])
+                stale = [
+                    (r.id, r.payload or {})
+                    for r in records
+                    if copies.get(r.id, -1.0) < float((r.payload or {}).get("saved_at", 0))
+                ]
+                recopied += self._upsert_target(stale)
+            if offset is None:
+                break
+
+        removed = 0
+        offset = None
+        while remove_deleted:
+            records, offset = with_collection(
+                lambda client: client.scroll(
+                    collection_name=self.target,
+                    limit=1024,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False,
+                )
+            )
+            ids = [r.id for r in records]
+            if ids:
+                present = with_collection(
+                    lambda client: client.retrieve(
+                        collection_name=self.source, ids=ids, with_payload=False, with_vectors=False
+                    )
+                )
+                gone = list(set(ids) - {r.id for r in present})
+                if gone:
+                    with_collection(
+                        lambda client: client.delete(
+                            collection_name=self.target,
+                            points_selector=models.PointIdsList(points=gone),
+                            wait=True,
+                        )
+                    )
+                    removed += len(gone)
+            if offset is None:
+                break
+
+        print(f"[migration] Caught up: re-copied {recopied} points, removed {removed} deleted")
+        return {"recopied": recopied, "removed": removed}
+
+    def switch(self) -> None:
+        """Catch up, then move reads and writes to the target (any worker may call this)."""
+        with self._switch_lock:
+            self._refresh()
+            if self.phase == SWITCHED:
+                return
+            if self.phase != READY:
+                raise RuntimeError(f"Backfill not finished ({self.progress()['percent']}%)")
+            self.catch_up()
+            with self.writes.exclusive():
+                self.state["phase"] = SWITCHED
+                self.state["switched_at"] = time.time()
+                save_state(self.state_path, self.state)
+                self._on_switch(self.state["target"])
+        print(f"[migration] ✓ Switched to '{self.target}' ({self.state['target']['model']})")
+
+    def progress(self) -> Dict[str, Any]:
+        total = self.state["total"] or 0
+        done = self.state["done"]
+        elapsed = max(time.monotonic() - self._run_started, 1e-6)
+        rate = self._run_done / elapsed
+        remaining = max(total - done, 0)
+        return {
+            "done": done,
+            "total": total,
+            "skipped": self.state["skipped"],
+            "percent": round(100.0 * min(done, total) / total, 1) if total else 100.0,
+            "rate_pps": round(rate, 1),
+            "eta_s": round(remaining / rate) if rate > 0 and self.phase == BACKFILL else None,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def finished(self) -> bool:
+        """Switched, and (in the leader) the post-switch catch-up has run."""
+        return self.phase == SWITCHED and (not self.leader or self.state.get("settled", True))
+
+    def start(self) -> None:
+        if self.finished or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-migration", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "phase": self.phase,
+            "source": self.state["source"],
+            "target": self.state["target"],
+            **self.progress(),
+            "dual_writes": self.dual_writes,
+            "errors": self.errors,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.leader and self.phase == BACKFILL:
+                    if self.state["total"] is None:
+                        self.prepare()
+                    if self.backfill_batch():
+                        continue
+                    self.state["phase"] = READY
+                    save_state(self.state_path, self.state)
+                    print(f"[migration] Backfill done: {self.progress()}")
+                if self.leader and self.phase == READY and self.auto_switch:
+                    self.switch()
+                if self.leader and self.phase == SWITCHED and not self.finished:
+                    # Other workers write the source until they poll the switch
+                    wait = self.state["switched_at"] + self.settle - time.time()
+                    if wait > 0:
+                        self._stop.wait(wait)
+                        continue
+                    self.catch_up(remove_deleted=False)
+                    self.state["settled"] = True
+                    save_state(self.state_path, self.state)
+                if self.finished:
+                    return
+                # Wait for a switch made elsewhere (manual, or by the leader worker)
+                self._stop.wait(self.retry_interval)
+                with self._switch_lock:
+                    self._refresh()
+            except Exception as e:
+                self.errors += 1
+                print(f"[migration] Pass failed: {e}")
+                self._stop.wait(self.retry_interval)
+
+    def _refresh(self) -> None:
+        """Pick up progress / a switch written by another worker. Caller holds _switch_lock."""
+        if self.phase == SWITCHED:
+            return
+        state = load_state(self.state_path)
+        if not state or state["target"]["collection"] != self.target:
+            return
+        if state["phase"] == SWITCHED:
+            with self.writes.exclusive():
+                self.state = state
+                self._on_switch(self.state["target"])
+            print(f"[migration] Switched to '{self.target}' (by another worker)")
+        elif not self.leader:
+            self.state = state
+
+    def _target_saved_at(self, ids: List[Any]) -> Dict[Any, float]:
+        """saved_at of each id's copy in the target (0 if unstamped, absent if missing)."""
+        copies = with_collection(
+            lambda client: client.retrieve(
+                collection_name=self.target, ids=ids, with_payload=["saved_at"], with_vectors=False
+            )
+        )
+        return {r.id: float((r.payload or {}).get("saved_at", 0)) for r in copies}
+
+    def _upsert_target(self, rows: List[tuple]) -> int:
+        """Re-embed (id, payload) rows into the target. Returns points written."""
+        rows = [(pid, payload, embedding_text(payload)) for pid, payload in rows]
+        rows = [row for row in rows if row[2] is not None]
+        if not rows:
+            return 0
+        vectors = self._encode([text for _, _, text in rows])
+        points = [
+            models.PointStruct(id=pid, vector=list(vec), payload=payload)
+            for (pid, payload, _), vec in zip(rows, vectors)
+        ]
+        with_collection(
+            lambda client: client.upsert(collection_name=self.target, points=points, wait=True)
+        )
+        return len(points)
+
+    def _throttle(self) -> None:
+        if self.rate <= 0:
+            return
+        ahead = self._run_done / self.rate - (time.monotonic() - self._run_started)
+        if ahead > 0:
+            self._stop.wait(ahead)
@@ -0,0 +1,77 @@
+"""
+Fact Dedup
+
+Semantic near-duplicate suppression for fact writes. Deterministic IDs
+(_make_fact_uuid) only catch exact normalized repeats; paraphrases like
+"wife: Sarah" / "spouse: Sarah" get different IDs and pile up. At write
+time I compare each new fact's embedding with:
+  - the other facts in the same write (collapse_batch)
+  - the user's nearest stored fact (one batched kNN lookup in api/memory.py)
+
+Anything at or above the similarity threshold is folded into the earlier
+point instead of becoming a new one: the newest phrasing and vector win,
+and merge_payload() keeps the previous phrasings in `variants` plus a
+`merged` counter.
+
+Only fact points are deduplicated - document chunks are stored as-is.
+
+Off by default: the check only sees the embedded "type: value" text, and a
+merge replaces the stored vector (older phrasings survive unembedded in
+`variants`), so enable it once the threshold has been checked against the
+model in use.
+
+Env vars (read by api/memory.py):
+  - SAVE_DEDUP_THRESHOLD (default: 0 = off; 0.92 cosine suits all-mpnet-base-v2)
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+MAX_VARIANTS = 5
+
+
+def collapse_batch(
+    users: Sequence[str],
+    vectors: Sequence[Sequence[float]],
+    is_fact: Sequence[bool],
+    threshold: float,
+) -> Dict[int, int]:
+    """
+    Within one write, map each fact that near-duplicates an earlier fact of
+    the same user to that earlier item's index. Items not in the result are
+    kept. O(n^2) over the facts in the write, which is small.
+    """
+    facts = [i for i, f in enumerate(is_fact) if f]
+    if len(facts) < 2:
+        return {}
+
+    matrix = np.asarray([vectors[i] for i in facts], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    sims = matrix @ matrix.T
+
+    into: Dict[int, int] = {}
+    kept: List[int] = []  # positions in `facts`
+    for a, i in enumerate(facts):
+        for b in kept:
+            if users[facts[b]] == users[i] and sims[a, b] >= threshold:
+                into[i] = facts[b]
+                break
+        else:
+            kept.append(a)
+    return into
+
+
+def merge_payload(existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload for a stored fact that a new near-duplicate is folded into."""
+    variants = list(existing.get("variants") or [existing.get("facts")])
+    variants.append(new.get("facts"))
+    variants = [v for v in dict.fromkeys(variants) if v][-MAX_VARIANTS:]
+    return {
+        **existing,
+        **new,
+        "variants": variants,
+        "merged": int(existing.get("merged", 0)) + 1,
+    }
@@ -0,0 +1,146 @@
+"""
+Filter Source Cache
+
+Holds the AJ filter plugin source (aj.filter.py) that Open-WebUI polls from
+/api/agent in memory, with everything a conditional / compressed response
+needs precomputed once per file version:
+
+  - the UTF-8 bytes and a gzip copy
+  - the SHA-256 (the strong ETags are derived from it - the gzip body has
+    its own, suffixed "-gz", since it is a different representation)
+  - the mtime as an HTTP Last-Modified date
+
+Each get() costs one stat() of the file. If mtime, size or inode changed
+(edited in place, or replaced by an atomic rename on the mounted volume),
+the file is re-read; otherwise the cached version is returned. A file that
+disappears keeps serving the last good version.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class SourceVersion:
+    path: str
+    body: bytes
+    gzipped: bytes
+    sha256: str
+    mtime: float
+    stat_key: Tuple[int, int, int]  # (mtime_ns, size, inode)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256[:32]}"'
+
+    @property
+    def gzip_etag(self) -> str:
+        return f'"{self.sha256[:32]}-gz"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+    def matches(
+        self,
+        if_none_match: Optional[str],
+        if_modified_since: Optional[str],
+        etag: Optional[str] = None,
+    ) -> bool:
+        """
+        True if the client's copy is current (answer 304). `etag` is the
+        tag of the representation being served (default: the plain body).
+        """
+        if if_none_match:
+            # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+            etag = etag or self.etag
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(self.mtime) <= since
+        return False
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    True if an Accept-Encoding header allows gzip: listed (or x-gzip) with
+    q > 0, or not listed but covered by a "*" with q > 0. "gzip;q=0"
+    refuses it.
+    """
+    if not accept_encoding:
+        return False
+    qualities = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.strip()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+class FilterSource:
+    """First existing path of `candidates`, cached and re-read when it changes."""
+
+    def __init__(self, candidates: Sequence[Path]):
+        self.candidates = [Path(p) for p in candidates]
+        self._current: Optional[SourceVersion] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _stat(self) -> Optional[Tuple[Path, os.stat_result]]:
+        for path in self.candidates:
+            try:
+                return path, path.stat()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def get(self) -> SourceVersion:
+        """Current version of the source. Raises FileNotFoundError if none was ever found."""
+        found = self._stat()
+        current = self._current
+        if found is None:
+            if current is None:
+                raise FileNotFoundError(", ".join(str(p) for p in self.candidates))
+            return current
+
+        path, st = found
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if current is not None and current.path == str(path) and current.stat_key == key:
+            return current
+
+        with self._lock:
+            current = self._current
+            if current is not None and current.path == str(path) and current.stat_key == key:
+                return current
+            body = path.read_bytes()
+            self._current = SourceVersion(
+                path=str(path),
+                body=body,
+                gzipped=gzip.compress(body, compresslevel=9, mtime=0),
+                sha256=hashlib.sha256(body).hexdigest(),
+                mtime=st.st_mtime,
+                stat_key=key,
+            )
+            self.reloads += 1
+            print(f"[filter] Loaded {path} ({len(body)} bytes, sha256={self._current.sha256[:12]})")
+            return self._current
@@ -0,0 +1,272 @@
+"""
+User Hot Set
+
+Optional in-process tier that keeps recently active users' vectors in RAM
+so /search can skip the Qdrant round-trip. Most users have a few hundred
+facts, and at that size a brute-force matrix-vector product beats a
+network hop by a wide margin.
+
+Per user I keep one contiguous (n x dim) matrix (float32 or float16), the
+point IDs, and the payloads. Search is a single `matrix @ query` followed by
+`argpartition` for the top-k. Vectors are L2-normalized, so the dot
+product equals Qdrant's COSINE score.
+
+Users are evicted LRU once the total footprint passes the memory budget.
+Users with more than max_user_points points are never loaded - they fall
+through to Qdrant (and are remembered as "too large" for a while so we
+don't count them on every request).
+
+Writes go through apply_upsert()/invalidate(). Each user has a generation
+counter bumped on every write, so a load that raced with a save is thrown
+away instead of caching stale data.
+
+In the pre-fork multi-worker mode a SharedVersions table (shared memory)
+records writes from every worker. Each entry remembers the shared version
+it reflects; an entry another worker has written past is dropped on the
+next lookup and reloaded.
+
+Env vars (read by api/memory.py):
+  - HOT_SET_ENABLED (default: false)
+  - HOT_SET_MAX_MB (default: 256)
+  - HOT_SET_MAX_USER_POINTS (default: 5000)
+  - HOT_SET_DTYPE (default: float32) - or float16 to halve RAM
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# loader(user_id, max_points) -> (ids, vectors, payloads), or None if too large
+Loader = Callable[[str, int], Optional[Tuple[list, Sequence[Any], List[dict]]]]
+
+# (point_id, score, payload)
+Hit = Tuple[Any, float, dict]
+
+_TOO_LARGE_TTL = 300.0  # seconds before re-checking an oversized user
+
+
+class _UserEntry:
+    """Immutable snapshot of one user's points - replaced, never mutated."""
+
+    __slots__ = ("ids", "matrix", "payloads", "index", "nbytes", "version")
+
+    def __init__(self, ids: list, matrix: np.ndarray, payloads: List[dict], version: int = 0):
+        self.ids = ids
+        self.version = version  # shared write version this snapshot reflects
+        self.matrix = matrix
+        self.payloads = payloads
+        self.index = {pid: i for i, pid in enumerate(ids)}
+        # Payload size is a rough estimate - good enough for budgeting
+        self.nbytes = matrix.nbytes + sum(len(repr(p)) for p in payloads) + 64 * len(ids)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class UserHotSet:
+    """LRU of per-user vector matrices under a memory budget."""
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 2**20,
+        max_user_points: int = 5000,
+        dtype: str = "float32",
+        shared: Optional[Any] = None,
+    ):
+        self.max_bytes = max_bytes
+        self._shared = shared
+        self.max_user_points = max_user_points
+        self.dtype = np.dtype(dtype)
+
+        self._entries: "OrderedDict[str, _UserEntry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._too_large: Dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.loads = 0
+        self.fallthroughs = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(
+        self, user_id: str, vector: Sequence[float], k: int, loader: Loader
+    ) -> Optional[List[Hit]]:
+        """
+        Top-k for the user, loading their points on first use.
+        Returns None if the user is too large for the hot set (use Qdrant).
+        """
+        entry = self._get(user_id)
+        if entry is None:
+            entry = self._load(user_id, loader)
+            if entry is None:
+                return None
+        else:
+            with self._lock:
+                self.hits += 1
+
+        n = len(entry.ids)
+        if n == 0 or k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        scores = (entry.matrix @ query.astype(entry.matrix.dtype)).astype(np.float32)
+
+        if n > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(entry.ids[i], float(scores[i]), entry.payloads[i]) for i in top]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def apply_upsert(
+        self, user_id: str, ids: list, vectors: Sequence[Any], payloads: List[dict]
+    ) -> None:
+        """Fold freshly saved points into a loaded user (no-op if not loaded)."""
+        with self._lock:
+            self._bump(user_id)
+            version = self._shared.bump(user_id) if self._shared is not None else 0
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            if self._shared is not None and version != entry.version + 1:
+                # Another worker wrote since this snapshot - reload instead
+                self._drop(user_id)
+                return
+
+            new_ids = list(entry.ids)
+            new_payloads = list(entry.payloads)
+            rows = _normalize(np.asarray(vectors, dtype=np.float32)).astype(self.dtype)
+            matrix = entry.matrix.copy()
+            appended = []
+
+            for pid, row, payload in zip(ids, rows, payloads):
+                i = entry.index.get(pid)
+                if i is not None:
+                    matrix[i] = row
+                    new_payloads[i] = payload
+                else:
+                    new_ids.append(pid)
+                    new_payloads.append(payload)
+                    appended.append(row)
+
+            if appended:
+                extra = np.stack(appended)
+                matrix = np.vstack([matrix, extra]) if len(matrix) else extra
+
+            if len(new_ids) > self.max_user_points:
+                self._drop(user_id)
+                self._too_large[user_id] = time.monotonic()
+                return
+
+            self._store(
+                user_id, _UserEntry(new_ids, np.ascontiguousarray(matrix), new_payloads, version)
+            )
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget a user's cached points (e.g. after deletes)."""
+        with self._lock:
+            self._bump(user_id)
+            if self._shared is not None:
+                self._shared.bump(user_id)
+            self._drop(user_id)
+            self._too_large.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            for user_id in list(self._entries):
+                self._bump(user_id)
+            self._entries.clear()
+            self._too_large.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "dtype": self.dtype.name,
+                "hits": self.hits,
+                "loads": self.loads,
+                "fallthroughs": self.fallthroughs,
+                "evictions": self.evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _get(self, user_id: str) -> Optional[_UserEntry]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if self._shared is not None and entry.version != self._shared.get(user_id):
+                self._drop(user_id)
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def _load(self, user_id: str, loader: Loader) -> Optional[_UserEntry]:
+        with self._lock:
+            marked = self._too_large.get(user_id)
+            if marked is not None and time.monotonic() - marked < _TOO_LARGE_TTL:
+                self.fallthroughs += 1
+                return None
+            generation = self._generations.get(user_id, 0)
+            version = self._shared.get(user_id) if self._shared is not None else 0
+
+        loaded = loader(user_id, self.max_user_points)
+
+        with self._lock:
+            if loaded is None:
+                self._too_large[user_id] = time.monotonic()
+                self.fallthroughs += 1
+                return None
+
+            ids, vectors, payloads = loaded
+            if len(ids):
+                matrix = _normalize(np.asarray(vectors, dtype=np.float32)).astype(self.dtype)
+            else:
+                matrix = np.zeros((0, 0), dtype=self.dtype)
+            entry = _UserEntry(list(ids), np.ascontiguousarray(matrix), list(payloads), version)
+            self.loads += 1
+            self._too_large.pop(user_id, None)
+
+            # A write landed while we were loading - serve this result, don't cache it
+            if self._generations.get(user_id, 0) == generation:
+                self._store(user_id, entry)
+            return entry
+
+    def _store(self, user_id: str, entry: _UserEntry) -> None:
+        self._drop(user_id)
+        self._entries[user_id] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _bump(self, user_id: str) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
@@ -0,0 +1,368 @@
+"""
+Metrics
+
+Process-local histograms and gauges rendered in the Prometheus text format
+at GET /metrics. No prometheus_client dependency - the hot path only needs
+an observe() (a bisect and three adds under a lock), and gauges are callbacks
+evaluated at scrape time, so requests never pay for them.
+
+The metric objects are module-level so the code being timed can import and
+observe them directly:
+
+    with metrics.QDRANT_SECONDS.time("search"):
+        ...
+    metrics.RESULT_COUNT.observe(len(hits), "/search")
+
+Under serve.py each worker keeps its own registry, but a scrape is answered
+by whichever worker accepts the connection, so every worker also writes a
+snapshot of its registry to METRICS_DIR (set by serve.py) once a second.
+The scraped worker writes its own snapshot first and then renders from the
+snapshot files only - never its live registry on top of the others' older
+files, which would let a count drop when the next scrape lands on another
+worker (Prometheus reads that as a counter reset). Every worker's share of
+a sum is its latest file, so it only grows. Histograms are summed across
+workers (no `worker` label, so each series is in every scrape), gauges are
+per worker (labelled `worker`) and only come from workers that are still
+running. Snapshot files are named by pid, so
+a restarted worker's old counts stay in the sum instead of looking like a
+counter reset.
+
+Env vars:
+  - METRICS_DIR (default: unset) - snapshot directory shared by serve.py workers
+  - METRICS_SHARE_INTERVAL (default: 1.0) - seconds between snapshot writes
+"""
+
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds: 1 ms .. 10 s (embed and Qdrant calls sit in the low buckets)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1,
+    0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+# Counts: batch sizes and result counts
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[Any, ...]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[Any, ...], List[Any]] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels: Any) -> _Timer:
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self, labels)
+
+    def snapshot(self) -> List[List[Any]]:
+        """[[label values], bucket counts, sum, count] per series (JSON-safe)."""
+        with self._lock:
+            return [[list(map(str, k)), list(v[0]), v[1], v[2]] for k, v in self._series.items()]
+
+    def render(self, snapshots: Sequence[List[List[Any]]] = (), local: bool = True) -> List[str]:
+        """Render the series of `snapshots` summed, plus this histogram's if local."""
+        merged: Dict[Tuple[str, ...], List[Any]] = {}
+        for snapshot in ((self.snapshot(),) if local else ()) + tuple(snapshots):
+            for key, counts, total, count in snapshot:
+                if len(counts) != len(self.buckets) + 1:
+                    continue  # written by a build with other buckets
+                series = merged.setdefault(tuple(key), [[0] * len(counts), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bucket_names = self.label_names + ("le",)
+        for key, (counts, total, count) in sorted(merged.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _labels(bucket_names, key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(bucket_names, key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Value read at scrape time. fn returns a number, or {label value: number}
+    for a gauge with one label. A failing callback is skipped.
+    """
+
+    def __init__(
+        self, name: str, help: str, fn: Callable[[], Any], label: Optional[str] = None
+    ):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.label = label
+
+    def snapshot(self) -> Any:
+        """Current value (number, {label value: number}) or None."""
+        try:
+            return self.fn()
+        except Exception:
+            return None
+
+    def render(self, values: Sequence[Tuple[str, Any]]) -> List[str]:
+        """Render one sample set per (worker, value)."""
+        lines = []
+        for worker, value in values:
+            if value is None:
+                continue
+            if isinstance(value, dict):
+                for key, v in sorted(value.items()):
+                    labels = _labels(("worker", self.label), (worker, key))
+                    lines.append(f"{self.name}{labels} {_number(v)}")
+            else:
+                lines.append(f"{self.name}{_labels(('worker',), (worker,))} {_number(value)}")
+        if not lines:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"] + lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, help, labels, buckets)
+            return metric
+
+    def gauge(
+        self, name: str, help: str, fn: Callable[[], Any], label: Optional[str] = None
+    ) -> Gauge:
+        """Register (or replace) a scrape-time gauge."""
+        with self._lock:
+            metric = self._metrics[name] = Gauge(name, help, fn, label)
+            return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's histogram series and gauge values, JSON-safe."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "pid": os.getpid(),
+            "worker": os.getenv("MEMORY_WORKER_INDEX", "0"),
+            "histograms": {m.name: m.snapshot() for m in metrics if isinstance(m, Histogram)},
+            "gauges": {m.name: m.snapshot() for m in metrics if isinstance(m, Gauge)},
+        }
+
+    def render(self, peers: Sequence[Dict[str, Any]] = (), local: bool = True) -> str:
+        """
+        Prometheus text for this registry plus `peers` (snapshots of the
+        other workers): histograms summed, gauges one sample per worker.
+        With local=False only `peers` are rendered (this worker's own
+        snapshot among them).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        worker = os.getenv("MEMORY_WORKER_INDEX", "0")
+        lines: List[str] = []
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                lines.extend(
+                    metric.render([p["histograms"].get(metric.name, []) for p in peers], local)
+                )
+            else:
+                values = [(worker, metric.snapshot())] if local else []
+                values += [
+                    (p["worker"], p["gauges"].get(metric.name))
+                    for p in peers
+                    if p.get("alive", True)
+                ]
+                lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "memory_request_seconds", "HTTP request time by route template, method and status",
+    ("route", "method", "status"),
+)
+EMBED_SECONDS = REGISTRY.histogram(
+    "memory_embed_encode_seconds", "Model forward pass time per encode() batch",
+)
+EMBED_BATCH_SIZE = REGISTRY.histogram(
+    "memory_embed_batch_size", "Texts per encode() batch", buckets=SIZE_BUCKETS,
+)
+QDRANT_SECONDS = REGISTRY.histogram(
+    "memory_qdrant_seconds", "Qdrant call time by operation (search, search_batch, upsert)",
+    ("op",),
+)
+WRITE_BATCH_SIZE = REGISTRY.histogram(
+    "memory_write_batch_size", "Points embedded and upserted per write, by route",
+    ("route",), buckets=SIZE_BUCKETS,
+)
+RESULT_COUNT = REGISTRY.histogram(
+    "memory_result_count", "Memories returned per query, by route",
+    ("route",), buckets=(0,) + SIZE_BUCKETS,
+)
+
+
+# ============================================================================
+# Cross-worker sharing (serve.py)
+# ============================================================================
+
+_share_dir: Optional[str] = None
+_share_thread: Optional[threading.Thread] = None
+_share_stop = threading.Event()
+_write_lock = threading.Lock()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_snapshot(directory: str, registry: Registry = REGISTRY) -> None:
+    """
+    Atomically (re)write this process's snapshot file in directory.
+    Serialized, so a slow writer never replaces a newer snapshot (the
+    scrape's) with an older one (the share loop's).
+    """
+    with _write_lock:
+        snapshot = registry.snapshot()
+        path = os.path.join(directory, f"worker-{snapshot['worker']}-{snapshot['pid']}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+
+def read_snapshots(directory: str, exclude_pid: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Snapshots of the other workers (dead ones marked alive=False)."""
+    peers = []
+    for path in glob.glob(os.path.join(directory, "worker-*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue  # vanished or half-written by an older build
+        if snapshot.get("pid") == exclude_pid:
+            continue
+        snapshot["alive"] = _pid_alive(snapshot.get("pid", 0))
+        peers.append(snapshot)
+    return peers
+
+
+def _share_loop(interval: float) -> None:
+    while not _share_stop.wait(interval):
+        try:
+            write_snapshot(_share_dir)
+        except OSError as e:
+            print(f"[metrics] ⚠ Failed to write snapshot: {e}")
+
+
+def start_sharing() -> None:
+    """Write this worker's snapshot to METRICS_DIR periodically (no-op if unset)."""
+    global _share_dir, _share_thread
+    directory = os.getenv("METRICS_DIR")
+    if not directory or (_share_thread is not None and _share_thread.is_alive()):
+        return
+    os.makedirs(directory, exist_ok=True)
+    _share_dir = directory
+    write_snapshot(directory)
+    _share_stop.clear()
+    interval = float(os.getenv("METRICS_SHARE_INTERVAL", "1.0"))
+    _share_thread = threading.Thread(
+        target=_share_loop, args=(interval,), name="metrics-share", daemon=True
+    )
+    _share_thread.start()
+
+
+def stop_sharing() -> None:
+    """Stop the writer and leave a final snapshot (keeps counts summed after exit)."""
+    _share_stop.set()
+    if _share_thread is not None:
+        _share_thread.join(timeout=5)
+    if _share_dir is not None:
+        try:
+            write_snapshot(_share_dir)
+        except OSError:
+            pass
+
+
+def render() -> str:
+    if _share_dir is None:
+        return REGISTRY.render()
+    try:
+        write_snapshot(_share_dir, REGISTRY)
+    except OSError as e:
+        print(f"[metrics] ⚠ Failed to write snapshot: {e}")
+        return REGISTRY.render(read_snapshots(_share_dir, exclude_pid=os.getpid()))
+    return REGISTRY.render(read_snapshots(_share_dir), local=False)
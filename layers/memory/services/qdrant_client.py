@@ -5,87 +5,627 @@ My singleton client for Qdrant. Connects lazily on first use and keeps
 the connection alive. The collection is 768-dim COSINE (matches my
 all-mpnet-base-v2 embeddings).
 
-Includes retry logic for transient connection failures.
+Reads and writes go to INDEX_NAME until an embedding migration switches
+them to a versioned collection for the new model (set_active_collection,
+see services/embedding_migration.py).
+
+Every collection operation goes through a circuit breaker
+(services/circuit_breaker.py). Errors are classified by type - connection
+failures, timeouts and 5xx/429 responses are transient and retried briefly;
+anything else is raised at once. After QDRANT_BREAKER_FAILURES consecutive
+transient failures the breaker opens and calls fail fast with
+CircuitOpenError (HTTP 503) until QDRANT_BREAKER_RESET seconds pass and a
+trial call succeeds. App startup checks the collections with
+ensure_collection_async(), which backs off with asyncio.sleep instead of
+parking a thread.
+
+Collection state is cached in-process: the collection is verified once
+(at startup) and only re-checked when an operation fails with not-found.
+New collections get payload indexes for the fields I filter on, so
+per-user filtered search doesn't scan.
 
 Payload fields I store:
   - user_id, user_text, facts, facts_text, source_type, source_name
 
+With MEMORY_SHARDS set (services/sharding.py), users are spread over
+several collections / Qdrant endpoints. use_shard() / user_shard() pick
+the shard for the current context (a ContextVar, so it follows threads
+started with asyncio.to_thread); _client(), _collection_name() and the
+breaker follow it. Per-user reads (search_user_points, load_user_points)
+route themselves and, while a rebalance is moving the user, read the old
+and the new shard. Each endpoint has its own client and breaker.
+
+Unsharded, all reads and writes go through one client. With QDRANT_PREFER_GRPC
+on, vectors travel as protobuf over a single multiplexed gRPC channel
+instead of JSON float lists; otherwise REST calls share a keep-alive
+connection pool.
+
 Env vars:
-  - QDRANT_HOST (default: localhost)
+  - QDRANT_HOST (default: localhost) - ":memory:" or "path:<dir>" run an
+    in-process Qdrant instead of connecting (tests, load tests)
   - QDRANT_PORT (default: 6333)
+  - QDRANT_GRPC_PORT (default: 6334)
+  - QDRANT_PREFER_GRPC (default: false)
+  - QDRANT_TIMEOUT (default: 10) - client request timeout, seconds
+  - QDRANT_SEARCH_TIMEOUT (default: 5) - server-side search timeout, seconds
+  - QDRANT_POOL_SIZE (default: 32) - max pooled REST connections
+  - QDRANT_RETRY_ATTEMPTS (default: 2) - tries per operation (sync)
+  - QDRANT_RETRY_DELAY (default: 0.1) - base backoff, seconds (jittered, doubles)
+  - QDRANT_BREAKER_FAILURES (default: 5) - consecutive failures that open the breaker
+  - QDRANT_BREAKER_RESET (default: 10) - seconds before a half-open trial call
   - INDEX_NAME (default: user_memory_collection)
 """
 
 import os
-import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, TypeVar
+import httpx
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+from services import metrics, storage_profiles
+from services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    call_with_retry,
+    call_with_retry_async,
+)
+
+if TYPE_CHECKING:
+    from services.sharding import Shard, ShardRouter
+
+T = TypeVar("T")
 
 _client_instance: QdrantClient | None = None
+_client_lock = threading.Lock()
+
+# Sharding (services/sharding.py): router, the current context's shard, and
+# one client / breaker per shard endpoint
+_router: Optional["ShardRouter"] = None
+_shard: ContextVar[Optional["Shard"]] = ContextVar("qdrant_shard", default=None)
+_shard_clients: Dict[str, QdrantClient] = {}
+_shard_breakers: Dict[str, CircuitBreaker] = {}
+
+# Collections verified to exist (with indexes) in this process -> storage profile
+_ready_collections: dict[str, str] = {}
+_collection_lock = threading.Lock()
+
+# Set when an embedding migration switches to its versioned collection
+_active_collection: Optional[str] = None
+_vector_size = 768
+
+# Payload fields used in filters - indexed on collection creation
+PAYLOAD_INDEXES = {
+    "user_id": models.PayloadSchemaType.KEYWORD,
+    "source_type": models.PayloadSchemaType.KEYWORD,
+}
+
+# Retry config - kept short: the breaker, not sleeping, handles outages
+MAX_RETRIES = int(os.getenv("QDRANT_RETRY_ATTEMPTS", "2"))
+RETRY_DELAY = float(os.getenv("QDRANT_RETRY_DELAY", "0.1"))  # seconds, doubles each retry
+
+breaker = CircuitBreaker(
+    "qdrant",
+    failure_threshold=int(os.getenv("QDRANT_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("QDRANT_BREAKER_RESET", "10")),
+)
+
+# Status codes that mean "Qdrant is struggling", not "the request is wrong"
+_TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+_TRANSIENT_GRPC = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "ABORTED"}
+
 
-# Retry config
-MAX_RETRIES = 3
-RETRY_DELAY = 1.0  # seconds, doubles each retry
+def is_transient(error: BaseException) -> bool:
+    """True if a Qdrant error is worth retrying (and counts against the breaker)."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, ResponseHandlingException):
+        # qdrant-client wraps transport errors; classify the cause
+        return error.source is None or is_transient(error.source)
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in _TRANSIENT_STATUS
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc.RpcError
+        try:
+            return code().name in _TRANSIENT_GRPC
+        except Exception:
+            return False
+    return False
 
 
 def with_retry(func):
-    """Decorator that retries a function on connection errors with exponential backoff."""
+    """Decorator: run func through the Qdrant breaker with short jittered retries."""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        last_error = None
-        delay = RETRY_DELAY
-        for attempt in range(MAX_RETRIES):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                last_error = e
-                err_str = str(e).lower()
-                # Only retry on connection-related errors
-                if any(x in err_str for x in ["connection", "timeout", "refused", "unavailable"]):
-                    if attempt < MAX_RETRIES - 1:
-                        time.sleep(delay)
-                        delay *= 2
-                        continue
-                raise
-        raise last_error
+        return call_with_retry(
+            lambda: func(*args, **kwargs),
+            _breaker(),
+            is_transient,
+            attempts=MAX_RETRIES,
+            base_delay=RETRY_DELAY,
+        )
     return wrapper
 
 
-@with_retry
+def breaker_stats() -> Dict[str, Any]:
+    """Breaker state for /health and /stats (plus each shard endpoint's, when sharded)."""
+    stats = breaker.stats()
+    if _shard_breakers:
+        stats["shards"] = {endpoint: b.stats() for endpoint, b in _shard_breakers.items()}
+    return stats
+
+
+def _breaker() -> CircuitBreaker:
+    """Breaker for the current shard's endpoint (the default one when unsharded)."""
+    shard = _shard.get()
+    if shard is None or shard.endpoint == "default":
+        return breaker
+    with _client_lock:
+        if shard.endpoint not in _shard_breakers:
+            _shard_breakers[shard.endpoint] = CircuitBreaker(
+                f"qdrant:{shard.endpoint}",
+                failure_threshold=breaker.failure_threshold,
+                reset_timeout=breaker.reset_timeout,
+            )
+        return _shard_breakers[shard.endpoint]
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+class _LocalClient:
+    """
+    In-process (local mode) QdrantClient with every call serialized. Local
+    mode keeps numpy arrays that concurrent upserts and searches from the
+    request thread pool would corrupt; a real server needs no lock.
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def locked(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+
+def _connect(host: str, port: int) -> QdrantClient:
+    if host == ":memory:":
+        return _LocalClient(QdrantClient(":memory:"))
+    if host.startswith("path:"):
+        # Embedded local mode: persisted to a directory, no server
+        return _LocalClient(QdrantClient(path=host[len("path:"):]))
+    pool_size = int(os.getenv("QDRANT_POOL_SIZE", "32"))
+    return QdrantClient(
+        host=host,
+        port=port,
+        grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+        prefer_grpc=_env_flag("QDRANT_PREFER_GRPC"),
+        timeout=int(os.getenv("QDRANT_TIMEOUT", "10")),
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+        ),
+    )
+
+
 def _client() -> QdrantClient:
-    """Get the singleton Qdrant client. Creates and caches the connection on first call."""
+    """
+    Get the Qdrant client for the current shard (the singleton when
+    unsharded). Creates and caches the connection on first call.
+    """
     global _client_instance
+    shard = _shard.get()
+    if shard is not None and shard.endpoint != "default":
+        client = _shard_clients.get(shard.endpoint)
+        if client is None:
+            with _client_lock:
+                client = _shard_clients.get(shard.endpoint)
+                if client is None:
+                    client = _shard_clients[shard.endpoint] = _connect(shard.host, shard.port)
+        return client
     if _client_instance is None:
-        host = os.getenv("QDRANT_HOST", "localhost")
-        port = int(os.getenv("QDRANT_PORT", "6333"))
-        _client_instance = QdrantClient(host=host, port=port, timeout=10)
+        with _client_lock:
+            if _client_instance is None:
+                _client_instance = _connect(
+                    os.getenv("QDRANT_HOST", "localhost"), int(os.getenv("QDRANT_PORT", "6333"))
+                )
     return _client_instance
 
 
+# ============================================================================
+# Sharding
+# ============================================================================
+
+def set_router(router: Optional["ShardRouter"]) -> None:
+    """Route users over shards from now on (None = unsharded)."""
+    global _router
+    _router = router
+
+
+def get_router() -> Optional["ShardRouter"]:
+    return _router
+
+
+@contextmanager
+def use_shard(shard: Optional["Shard"]) -> Iterator[None]:
+    """Send Qdrant calls in this context to `shard` (None = the unsharded default)."""
+    token = _shard.set(shard)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+def user_shard(user_id: str):
+    """use_shard() for the shard that owns user_id (a no-op when unsharded)."""
+    return use_shard(_router.owner(user_id) if _router is not None else None)
+
+
+def shards() -> List[Optional["Shard"]]:
+    """Every shard, for whole-collection jobs ([None] when unsharded)."""
+    return list(_router.shards.values()) if _router is not None else [None]
+
+
+def read_shards(user_id: str) -> List[Optional["Shard"]]:
+    """Shards holding user_id's points - two while a rebalance is moving them."""
+    return _router.read_shards(user_id) if _router is not None else [None]
+
+
+def group_by_shard(user_ids: List[str]) -> Dict[Optional["Shard"], List[int]]:
+    """{owner shard: positions in user_ids}, for splitting a write across shards."""
+    groups: Dict[Optional["Shard"], List[int]] = {}
+    for i, user_id in enumerate(user_ids):
+        groups.setdefault(_router.owner(user_id) if _router is not None else None, []).append(i)
+    return groups
+
+
+def _merge_hits(points: List[models.ScoredPoint], limit: int) -> List[models.ScoredPoint]:
+    """Best-first top `limit` of hits gathered from more than one shard."""
+    return sorted(points, key=lambda p: p.score, reverse=True)[:limit]
+
+
+def user_filter(user_id: str) -> models.Filter:
+    """Filter that scopes a query to one user's points."""
+    return models.Filter(
+        must=[models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id))]
+    )
+
+
+def search_user_points(
+    user_id: str, vector: List[float], limit: int
+) -> List[models.ScoredPoint]:
+    """Nearest-neighbour search over one user's points, with payloads."""
+    timeout = int(os.getenv("QDRANT_SEARCH_TIMEOUT", "5"))
+    hits: List[models.ScoredPoint] = []
+    sources = read_shards(user_id)
+    for shard in sources:
+        with use_shard(shard), metrics.QDRANT_SECONDS.time("search"):
+            hits.extend(
+                with_collection(
+                    lambda client: client.query_points(
+                        collection_name=_collection_name(),
+                        query=vector,
+                        query_filter=user_filter(user_id),
+                        search_params=_search_params(),
+                        limit=limit,
+                        with_payload=True,
+                        timeout=timeout,
+                    ).points
+                )
+            )
+    return _merge_hits(hits, limit) if len(sources) > 1 else hits
+
+
+def search_user_points_batch(
+    searches: List[tuple[str, List[float], int]],
+) -> List[List[models.ScoredPoint]]:
+    """
+    Several (user_id, vector, limit) searches in one Qdrant request.
+    Results are returned in the same order as the searches.
+    """
+    if not searches:
+        return []
+    timeout = int(os.getenv("QDRANT_SEARCH_TIMEOUT", "5"))
+    # One batch request per shard; a user mid-rebalance is searched on both
+    by_shard: Dict[Optional["Shard"], List[int]] = {}
+    for i, (user_id, _, _) in enumerate(searches):
+        for shard in read_shards(user_id):
+            by_shard.setdefault(shard, []).append(i)
+
+    results: List[List[models.ScoredPoint]] = [[] for _ in searches]
+    for shard, positions in by_shard.items():
+        with use_shard(shard), metrics.QDRANT_SECONDS.time("search_batch"):
+            params = _search_params()
+            requests = [
+                models.QueryRequest(
+                    query=searches[i][1],
+                    filter=user_filter(searches[i][0]),
+                    params=params,
+                    limit=searches[i][2],
+                    with_payload=True,
+                )
+                for i in positions
+            ]
+            responses = with_collection(
+                lambda client: client.query_batch_points(
+                    collection_name=_collection_name(), requests=requests, timeout=timeout
+                )
+            )
+        for i, response in zip(positions, responses):
+            results[i].extend(response.points)
+
+    if len(by_shard) > 1:
+        results = [_merge_hits(points, limit) for points, (_, _, limit) in zip(results, searches)]
+    return results
+
+
+def iter_points(
+    collection_name: str,
+    batch_size: int = 256,
+    with_vectors: bool = True,
+    scroll_filter: Optional[models.Filter] = None,
+    client: Optional[QdrantClient] = None,
+) -> Iterator[List[models.Record]]:
+    """
+    Stream a collection in pages via the scroll API (constant memory).
+    Yields lists of records; used by migration, export and maintenance jobs.
+    """
+    client = client or _client()
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        if records:
+            yield records
+        if offset is None:
+            break
+
+
+def load_user_points(user_id: str, max_points: int):
+    """
+    Fetch all of a user's points (ids, vectors, payloads) for the in-process
+    hot set. Returns None if the user has more than max_points.
+    """
+    user_points = user_filter(user_id)
+    ids, vectors, payloads = [], [], []
+
+    def load(client: QdrantClient):
+        collection_name = _collection_name()
+        count = client.count(
+            collection_name=collection_name, count_filter=user_points, exact=True
+        ).count
+        if len(ids) + count > max_points:
+            return False
+        for records in iter_points(
+            collection_name, batch_size=512, scroll_filter=user_points, client=client
+        ):
+            for r in records:
+                ids.append(r.id)
+                vectors.append(r.vector)
+                payloads.append(r.payload or {})
+        return True
+
+    for shard in read_shards(user_id):
+        with use_shard(shard):
+            if not with_collection(load):
+                return None
+    return ids, vectors, payloads
+
+
+def _search_params() -> models.SearchParams | None:
+    """Rescoring/oversampling for the collection's storage profile (None for fp32)."""
+    profile = _ready_collections.get(_ready_key(), storage_profiles.DEFAULT_PROFILE)
+    return storage_profiles.search_params(profile)
+
+
+def _collection_name() -> str:
+    shard = _shard.get()
+    if shard is not None and shard.collection:
+        return shard.collection
+    return _active_collection or os.getenv("INDEX_NAME", "user_memory_collection")
+
+
+def _ready_key(collection_name: Optional[str] = None) -> str:
+    """_ready_collections key: the collection, qualified by endpoint for remote shards."""
+    collection_name = collection_name or _collection_name()
+    shard = _shard.get()
+    if shard is None or shard.endpoint == "default":
+        return collection_name
+    return f"{shard.endpoint}/{collection_name}"
+
+
+def set_active_collection(collection_name: Optional[str], vector_size: int = 768) -> None:
+    """
+    Point every read and write at collection_name (None = back to
+    INDEX_NAME). vector_size is used if the collection has to be re-created.
+    """
+    global _active_collection, _vector_size
+    _active_collection = collection_name
+    _vector_size = vector_size
+
+
+def is_not_found(error: BaseException) -> bool:
+    """True if a Qdrant error is a 404 / NOT_FOUND (REST or gRPC)."""
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code == 404
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc.RpcError
+        try:
+            return code().name == "NOT_FOUND"
+        except Exception:
+            return False
+    return False
+
+
+def is_conflict(error: BaseException) -> bool:
+    """True if a Qdrant error is a 409 / ALREADY_EXISTS (REST or gRPC)."""
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code == 409
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc.RpcError
+        try:
+            return code().name == "ALREADY_EXISTS"
+        except Exception:
+            return False
+    return False
+
+
+def _collection_vanished(client: QdrantClient, error: BaseException) -> bool:
+    """
+    True if an operation failed because the collection is gone. Untyped
+    errors (local mode raises plain ValueError) are settled by asking
+    collection_exists() rather than by reading the message.
+    """
+    if is_not_found(error):
+        return True
+    if is_transient(error) or isinstance(error, CircuitOpenError):
+        return False
+    try:
+        return not client.collection_exists(_collection_name())
+    except Exception:
+        return False
+
+
 @with_retry
-def _ensure_collection() -> None:
+def _ensure_collection(force: bool = False) -> None:
     """
     Make sure the collection exists. Creates it if missing, but leaves
     existing collections alone to avoid data loss. Idempotent and safe to
-    call repeatedly.
+    call repeatedly - after the first successful check it's a set lookup,
+    no network round-trip. Pass force=True to re-verify.
     """
-    collection_name = os.getenv("INDEX_NAME", "user_memory_collection")
-    client = _client()
+    _verify_collection(force)
+
+
+async def ensure_collection_async() -> None:
+    """_ensure_collection() for async callers (e.g. app startup), on every shard."""
+    for shard in shards():
+        with use_shard(shard):
+            await call_with_retry_async(_verify_collection, _breaker(), is_transient)
+
+
+def _verify_collection(force: bool = False) -> None:
+    """_ensure_collection() without the breaker - for use inside a guarded call."""
+    collection_name = _collection_name()
+    key = _ready_key(collection_name)
+    if not force and key in _ready_collections:
+        return
+
+    with _collection_lock:
+        if not force and key in _ready_collections:
+            return
+
+        client = _client()
+        created = not client.collection_exists(collection_name)
+        if created:
+            _create_collection(client, collection_name)
+        info = client.get_collection(collection_name=collection_name)
+        if not created:
+            _ensure_payload_indexes(client, collection_name, info.payload_schema or {})
+
+        _ready_collections[key] = storage_profiles.profile_of(
+            info.config.quantization_config
+        )
+
+
+def invalidate_collection(collection_name: str | None = None) -> None:
+    """Forget the cached state so the next _ensure_collection() re-checks."""
+    _ready_collections.pop(_ready_key(collection_name), None)
 
+
+def with_collection(operation: Callable[[QdrantClient], T]) -> T:
+    """
+    Run operation(client) against the collection through the breaker. If it
+    fails because the collection vanished (e.g. Qdrant storage wiped),
+    recreate it and retry once.
+    """
+    return call_with_retry(
+        lambda: _run_on_collection(operation),
+        _breaker(),
+        is_transient,
+        attempts=MAX_RETRIES,
+        base_delay=RETRY_DELAY,
+    )
+
+
+def _run_on_collection(operation: Callable[[QdrantClient], T]) -> T:
+    _verify_collection()
+    client = _client()
     try:
-        client.get_collection(collection_name=collection_name)
-    except Exception:
-        _create_collection(client, collection_name)
+        return operation(client)
+    except Exception as e:
+        if not _collection_vanished(client, e):
+            raise
+        print(f"[qdrant] Collection '{_collection_name()}' missing, re-creating")
+        invalidate_collection()
+        _verify_collection(force=True)
+        return operation(_client())
 
 
-def _create_collection(client: QdrantClient, collection_name: str) -> None:
-    """Create a new collection with 768-dim COSINE vectors."""
-    client.recreate_collection(
-        collection_name=collection_name,
-        vectors_config=models.VectorParams(
-            size=768,
-            distance=models.Distance.COSINE,
-        ),
+def _create_collection(
+    client: QdrantClient,
+    collection_name: str,
+    profile: str | None = None,
+    on_disk: bool | None = None,
+    size: int | None = None,
+) -> None:
+    """
+    Create a new collection with COSINE vectors and payload indexes. Size
+    defaults to the active model's (768 for all-mpnet-base-v2). Storage
+    profile defaults to QDRANT_STORAGE_PROFILE / QDRANT_VECTORS_ON_DISK.
+    """
+    profile = profile or storage_profiles.env_profile()
+    on_disk = storage_profiles.env_on_disk() if on_disk is None else on_disk
+    try:
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=storage_profiles.vectors_config(profile, size or _vector_size, on_disk),
+            quantization_config=storage_profiles.quantization_config(profile),
+        )
+    except Exception as e:
+        # Another worker may have created it between our check and create
+        if not is_conflict(e):
+            raise
+    print(
+        f"[qdrant] Created collection '{collection_name}' "
+        f"(profile={profile}, on_disk={on_disk})"
     )
-    print(f"[qdrant] Created collection '{collection_name}'")
\ No newline at end of file
+    _ensure_payload_indexes(client, collection_name, {})
+
+
+def _ensure_payload_indexes(
+    client: QdrantClient, collection_name: str, existing: dict
+) -> None:
+    """Create any missing payload indexes (older collections predate them)."""
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field in existing:
+            continue
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=schema,
+            wait=True,
+        )
+        print(f"[qdrant] Indexed payload field '{field}' on '{collection_name}'")
@@ -0,0 +1,193 @@
+"""
+Search Result Cache
+
+Caches search results per (user_id, query hash, top_k), scoped to a
+per-user version counter. /save bumps the user's version after its upsert,
+so every cached result for that user becomes unreachable at once - no
+stale reads after a write, and no scanning to invalidate.
+
+Regenerations and follow-up turns repeat the same query, so a hit skips
+both the embedding and the vector search.
+
+Identical concurrent searches are coalesced (single-flight): the first
+caller computes, the rest wait for its result instead of issuing their
+own Qdrant call.
+
+Entries also expire after a TTL, as a backstop for writes that don't go
+through this process (maintenance scripts, other workers). clear() drops
+everything at once (e.g. when the embedding model switches).
+
+In the pre-fork multi-worker mode the per-user versions come from a
+SharedVersions table (services/shared_versions.py), so a save in one
+worker invalidates the user's cached results in all of them.
+
+Env vars (read by api/memory.py):
+  - SEARCH_CACHE_SIZE (default: 2048, 0 disables)
+  - SEARCH_CACHE_TTL (default: 300 seconds)
+"""
+
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Key = Tuple[str, Any, str, int]
+
+
+def query_hash(query_text: str) -> str:
+    return hashlib.sha256(" ".join((query_text or "").split()).encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """Versioned LRU of search results with single-flight coalescing."""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 300.0, shared: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._shared = shared
+        self._entries: "OrderedDict[Key, Tuple[Any, float, float]]" = OrderedDict()
+        # Versions come from one monotonic clock, so after clear() every
+        # user's version is newer than anything computed before it
+        self._versions: Dict[str, int] = {}
+        self._clock = itertools.count(1)
+        self._floor = 0
+        self._inflight: Dict[Key, Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def version(self, user_id: str) -> Any:
+        with self._lock:
+            return self._current(user_id)
+
+    def bump(self, user_id: str) -> None:
+        """Invalidate every cached result for a user (call after writes)."""
+        if self._shared is not None:
+            self._shared.bump(user_id)
+            return
+        with self._lock:
+            self._versions[user_id] = next(self._clock)
+
+    def clear(self) -> None:
+        """Invalidate every cached result for every user."""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._floor = next(self._clock)
+
+    def get(self, user_id: str, query_text: str, top_k: int) -> Tuple[Any, Any]:
+        """
+        (cached result or None, current version) - for callers that compute
+        misses themselves (batch search). Pass the version back to put().
+        """
+        with self._lock:
+            version = self._current(user_id)
+            if not self.enabled:
+                return None, version
+            key = (user_id, version, query_hash(query_text), top_k)
+            cached = self._entries.get(key)
+            if cached is not None:
+                result, stored_at, cost_ms = cached
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_ms += cost_ms
+                    return result, version
+                del self._entries[key]
+            self.misses += 1
+            return None, version
+
+    def put(
+        self, user_id: str, version: Any, query_text: str, top_k: int, result: Any, cost_ms: float = 0.0
+    ) -> None:
+        """Store a result computed after get(). A write since then makes it unreachable."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[(user_id, version, query_hash(query_text), top_k)] = (
+                result,
+                time.monotonic(),
+                cost_ms,
+            )
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self, user_id: str, query_text: str, top_k: int, compute: Callable[[], Any]
+    ) -> Any:
+        """Cached result for this search, or compute it (once, even if concurrent)."""
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            key = (user_id, self._current(user_id), query_hash(query_text), top_k)
+            cached = self._entries.get(key)
+            if cached is not None:
+                result, stored_at, cost_ms = cached
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_ms += cost_ms
+                    return result
+                del self._entries[key]
+
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                self.misses += 1
+                pending = Future()
+                self._inflight[key] = pending
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return pending.result()
+
+        started = time.perf_counter()
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(e)
+            raise
+
+        cost_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._entries[key] = (result, time.monotonic(), cost_ms)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        pending.set_result(result)
+        return result
+
+    def _current(self, user_id: str) -> Any:
+        # Caller holds self._lock
+        if self._shared is not None:
+            return (self._floor, self._shared.get(user_id))
+        return self._versions.get(user_id, self._floor)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "saved_ms": round(self.saved_ms, 1),
+            }
@@ -0,0 +1,250 @@
+"""
+Save Journal
+
+Durable write-behind queue for /save. In async mode the endpoint appends
+the request to a local SQLite journal and returns "accepted" immediately;
+a background worker drains the journal in batches (one embed + one upsert
+per batch) and deletes entries once Qdrant has them.
+
+Point IDs are deterministic (_make_fact_uuid), so replaying an entry after
+a crash or a failed batch is an idempotent upsert - at-least-once delivery
+is safe.
+
+Failed entries are retried with exponential backoff. After max_attempts
+they move to a dead-letter table instead of being dropped, so nothing is
+silently lost. A batch that fails with a retry_after error (the Qdrant
+circuit breaker is open) stays queued without using up attempts.
+
+SQLite runs in WAL mode with synchronous=NORMAL: an append survives a
+process crash or container restart (the journal should live on a volume).
+
+Env vars (read by api/memory.py):
+  - SAVE_MODE (default: sync) - "async" journals saves by default
+  - SAVE_JOURNAL_PATH (default: ./save_journal.sqlite3)
+  - SAVE_JOURNAL_BATCH (default: 64 entries per drain)
+  - SAVE_JOURNAL_MAX_ATTEMPTS (default: 10)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Entry = Tuple[int, Dict[str, Any]]
+
+_MAX_BACKOFF = 300.0  # seconds
+
+
+class SaveJournal:
+    """Append-only SQLite journal of pending saves."""
+
+    def __init__(self, path: str | Path, max_attempts: int = 10):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS saves (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_saves (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                failed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS saves_due ON saves (next_attempt_at, id)")
+
+    def append(self, payload: Dict[str, Any]) -> int:
+        """Durably record a save. Returns its journal ID."""
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO saves (created_at, payload) VALUES (?, ?)",
+                (time.time(), json.dumps(payload)),
+            )
+            return int(cur.lastrowid)
+
+    def due(self, limit: int) -> List[Entry]:
+        """Oldest entries that are ready to (re)try."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM saves WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def ack(self, ids: List[int]) -> None:
+        """Remove entries that made it into Qdrant."""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM saves WHERE id = ?", [(i,) for i in ids])
+
+    def fail(self, entry_id: int, error: str) -> bool:
+        """
+        Record a failed attempt and schedule a retry with backoff.
+        Returns True if the entry was moved to the dead-letter table.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM saves WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row[0] + 1
+            if attempts >= self.max_attempts:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO dead_saves
+                        (id, created_at, payload, attempts, last_error, failed_at)
+                    SELECT id, created_at, payload, ?, ?, ? FROM saves WHERE id = ?
+                    """,
+                    (attempts, error, time.time(), entry_id),
+                )
+                self._conn.execute("DELETE FROM saves WHERE id = ?", (entry_id,))
+                self._conn.execute("COMMIT")
+                return True
+            delay = min(_MAX_BACKOFF, 2.0 ** attempts)
+            self._conn.execute(
+                "UPDATE saves SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, error, entry_id),
+            )
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM saves"
+            ).fetchone()
+            retrying = self._conn.execute(
+                "SELECT COUNT(*) FROM saves WHERE attempts > 0"
+            ).fetchone()[0]
+            dead = self._conn.execute("SELECT COUNT(*) FROM dead_saves").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "pending": pending,
+            "retrying": retrying,
+            "dead": dead,
+            "lag_s": round(time.time() - oldest, 3) if oldest else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JournalWorker:
+    """
+    Background thread that drains the journal.
+
+    process(entries) writes a batch and returns the IDs that failed, mapped
+    to an error message. Everything else is acked.
+    """
+
+    def __init__(
+        self,
+        journal: SaveJournal,
+        process: Callable[[List[Entry]], Dict[int, str]],
+        batch_size: int = 64,
+        poll_interval: float = 1.0,
+    ):
+        self.journal = journal
+        self._process = process
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.processed = 0
+        self.failed = 0
+        self.dead = 0
+        self.batches = 0
+        self.deferred = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="save-journal", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def notify(self) -> None:
+        """Wake the worker now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def drain_once(self) -> int:
+        """Process one batch of due entries. Returns how many were handled."""
+        entries = self.journal.due(self.batch_size)
+        if not entries:
+            return 0
+
+        try:
+            failures = self._process(entries)
+        except Exception as e:
+            if getattr(e, "retry_after", None) is not None:
+                # Downstream is unavailable (circuit open) - keep the batch
+                # queued as-is instead of spending its retry attempts
+                self.deferred += 1
+                return 0
+            failures = {entry_id: f"{type(e).__name__}: {e}" for entry_id, _ in entries}
+
+        ok = [entry_id for entry_id, _ in entries if entry_id not in failures]
+        self.journal.ack(ok)
+        for entry_id, error in failures.items():
+            if self.journal.fail(entry_id, error):
+                self.dead += 1
+                print(f"[journal] ✗ Save {entry_id} dead-lettered: {error}")
+
+        self.processed += len(ok)
+        self.failed += len(failures)
+        self.batches += 1
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.journal.stats(),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "processed": self.processed,
+            "failed_attempts": self.failed,
+            "dead_lettered": self.dead,
+            "batches": self.batches,
+            "deferred": self.deferred,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                handled = self.drain_once()
+            except Exception as e:
+                print(f"[journal] Drain error: {e}")
+                handled = 0
+            if handled == 0:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
@@ -0,0 +1,72 @@
+"""
+Service State
+
+Which collections the memory service reads and writes is decided by two
+state files, not just INDEX_NAME:
+  - the shard topology (SHARD_STATE, seeded from MEMORY_SHARDS) - users
+    are routed over several collections / Qdrant endpoints
+  - a switched embedding migration (EMBEDDING_MIGRATION_STATE) - reads
+    and writes moved to the versioned collection of the new model
+
+api/memory.py applies both at startup. The maintenance CLIs (compact,
+snapshot, storage_profiles) call load_routing() before doing any work,
+so they act on the same collections as the running service instead of
+the bare INDEX_NAME.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from services import embedding_migration, sharding
+from services.qdrant_client import set_active_collection, set_router
+from services.sharding import ShardRouter
+
+
+def shard_state_path() -> str:
+    return os.getenv("SHARD_STATE", "shards.json")
+
+
+def migration_state_path() -> str:
+    return os.getenv("EMBEDDING_MIGRATION_STATE", "embedding_migration.json")
+
+
+def load_router() -> Optional[ShardRouter]:
+    """The shard router from SHARD_STATE, else MEMORY_SHARDS; None when unsharded."""
+    state = sharding.load_state(shard_state_path())
+    if state is not None:
+        return ShardRouter.from_state(state)
+    spec = os.getenv("MEMORY_SHARDS", "").strip()
+    if not spec:
+        return None
+    return ShardRouter(sharding.parse_shards(spec), vnodes=int(os.getenv("SHARD_VNODES", "128")))
+
+
+def switched_target() -> Optional[Dict[str, Any]]:
+    """{collection, model, dim} of a switched embedding migration, else None."""
+    state = embedding_migration.load_state(migration_state_path())
+    if state and state["phase"] == embedding_migration.SWITCHED:
+        return state["target"]
+    return None
+
+
+def migration_in_progress() -> bool:
+    """True while an embedding migration is backfilling or waiting to switch."""
+    state = embedding_migration.load_state(migration_state_path())
+    return bool(state) and state["phase"] != embedding_migration.SWITCHED
+
+
+def load_routing() -> Dict[str, Any]:
+    """
+    Route this process like the service: install the shard router, or
+    point reads and writes at a switched migration's collection (the two
+    don't combine). Returns what was applied.
+    """
+    router = load_router()
+    if router is not None:
+        set_router(router)
+        return {"shards": list(router.shards), "rebalancing": router.rebalancing}
+    target = switched_target()
+    if target is not None:
+        set_active_collection(target["collection"], target["dim"])
+        return {"collection": target["collection"], "model": target["model"]}
+    return {}
@@ -0,0 +1,439 @@
+"""
+User Sharding
+
+Spreads users over several shards - separate collections on one Qdrant, or
+separate Qdrant endpoints - so memory can grow past one box. A user's
+points (facts, chunks and digest) all live on one shard, picked by
+consistent hashing of the user_id: every shard owns `vnodes` points on a
+hash ring and a user belongs to the first shard point at or after the
+hash of their id. Adding a shard only moves the users whose ring segment
+it takes over (about 1/N of them), instead of rehashing everyone.
+
+Routing itself lives in services/qdrant_client.py (use_shard / user_shard
+set the shard for the current context; the client and collection follow
+it). This module has the ring, the router and the rebalancer.
+
+Rebalancing after a shard is added runs online:
+  - The router keeps the previous ring. Writes go to the new owner at
+    once; searches for a user whose owner changed read both the old and
+    the new owner and merge by score, so nothing disappears mid-move.
+  - The rebalancer scrolls every old shard, and copies points whose user
+    now belongs elsewhere to the new owner (skipping ids the new owner
+    already has - a newer write landed there), then deletes them from
+    the old shard. Throughput is capped at `rate` points per second.
+  - When a full pass moves nothing (and at least `settle` seconds have
+    passed, so workers that picked up the change late have stopped
+    writing to old owners), the previous ring is dropped.
+
+Shards are only ever added; removing one isn't supported. The topology is
+persisted in a JSON state file, so restarts (and the other workers in the
+pre-fork mode, which poll it) agree on it and an interrupted rebalance
+resumes.
+
+Shard spec (MEMORY_SHARDS), comma-separated `name=[host[:port]][/collection]`:
+    s0=qdrant-0:6333,s1=qdrant-1:6333     separate endpoints, INDEX_NAME each
+    s0=/memories_s0,s1=/memories_s1      collections on QDRANT_HOST
+    s0=:memory:,s1=:memory:              in-process Qdrants (tests, local runs)
+
+Env vars (read by api/memory.py):
+  - MEMORY_SHARDS (default: unset = one unsharded collection)
+  - SHARD_STATE (default: shards.json) - topology and rebalance state
+  - SHARD_VNODES (default: 128) - ring points per shard
+  - SHARD_REBALANCE_RATE (default: 500) - points moved per second (0 = unthrottled)
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from qdrant_client.http import models
+
+from services.qdrant_client import (
+    _collection_name,
+    get_router,
+    set_router,
+    use_shard,
+    with_collection,
+)
+
+
+@dataclass(frozen=True)
+class Shard:
+    name: str
+    host: Optional[str] = None  # None = QDRANT_HOST; ":memory:" = in-process
+    port: int = 6333
+    collection: Optional[str] = None  # None = INDEX_NAME
+
+    @property
+    def endpoint(self) -> str:
+        """Key for the shard's client and breaker (shards on one endpoint share them)."""
+        if self.host is None:
+            return "default"
+        if self.host == ":memory:":
+            return f"memory:{self.name}"
+        return f"{self.host}:{self.port}"
+
+    @property
+    def target(self) -> Tuple[str, str]:
+        """(Qdrant endpoint, collection) the shard resolves to, with defaults filled in."""
+        if self.host == ":memory:":
+            endpoint = f"memory:{self.name}"
+        elif self.host is None:
+            endpoint = f"{os.getenv('QDRANT_HOST', 'localhost').lower()}:{os.getenv('QDRANT_PORT', '6333')}"
+        else:
+            endpoint = f"{self.host.lower()}:{self.port}"
+        return endpoint, self.collection or os.getenv("INDEX_NAME", "user_memory_collection")
+
+
+def check_targets(shards: List[Shard]) -> None:
+    """
+    Raise ValueError if two shards resolve to the same collection on the
+    same Qdrant: the rebalancer would see moved points as already present
+    on the target and then delete them from the (same) source.
+    """
+    seen: Dict[Tuple[str, str], str] = {}
+    for shard in shards:
+        other = seen.setdefault(shard.target, shard.name)
+        if other != shard.name:
+            endpoint, collection = shard.target
+            raise ValueError(
+                f"Shards {other!r} and {shard.name!r} are the same collection ({endpoint}/{collection})"
+            )
+
+
+def parse_shards(spec: str) -> List[Shard]:
+    """Parse a MEMORY_SHARDS spec (see module docstring)."""
+    shards = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, target = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Bad shard spec {item!r} (expected name=[host[:port]][/collection])")
+        host, collection = target, None
+        if target != ":memory:" and "/" in target:
+            host, collection = target.split("/", 1)
+        port = 6333
+        if host and host != ":memory:" and ":" in host:
+            host, port_text = host.rsplit(":", 1)
+            port = int(port_text)
+        shards.append(Shard(name.strip(), host or None, port, collection or None))
+    names = [s.name for s in shards]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate shard names in {spec!r}")
+    check_targets(shards)
+    return shards
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring over shard names with virtual nodes."""
+
+    def __init__(self, names: List[str], vnodes: int = 128):
+        if not names:
+            raise ValueError("HashRing needs at least one shard")
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._keys = [h for h, _ in points]
+        self._names = [name for _, name in points]
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect_left(self._keys, _hash(key)) % len(self._keys)
+        return self._names[i]
+
+
+def point_owner_key(payload: Dict[str, Any]) -> Optional[str]:
+    """The user a stored point belongs to (facts/chunks, or a digest)."""
+    return payload.get("user_id") or payload.get("digest_user_id")
+
+
+class ShardRouter:
+    """Maps user_id -> shard; during a rebalance also knows the previous ring."""
+
+    def __init__(
+        self,
+        shards: List[Shard],
+        previous: Optional[List[str]] = None,
+        vnodes: int = 128,
+        started_at: Optional[float] = None,
+    ):
+        self.shards: Dict[str, Shard] = {s.name: s for s in shards}
+        self.vnodes = vnodes
+        self._ring = HashRing(list(self.shards), vnodes)
+        self.previous = previous
+        self._previous_ring = HashRing(previous, vnodes) if previous else None
+        self.started_at = started_at
+
+    @property
+    def rebalancing(self) -> bool:
+        return self._previous_ring is not None
+
+    def owner(self, user_id: str) -> Shard:
+        return self.shards[self._ring.owner(user_id)]
+
+    def read_shards(self, user_id: str) -> List[Shard]:
+        """Owner first; plus the previous owner while a rebalance may still be moving the user."""
+        owner = self.owner(user_id)
+        if self._previous_ring is None:
+            return [owner]
+        before = self.shards[self._previous_ring.owner(user_id)]
+        return [owner] if before == owner else [owner, before]
+
+    def add(self, new: List[Shard]) -> "ShardRouter":
+        """New router with `new` shards added and the current ring kept as previous."""
+        for shard in new:
+            if shard.name in self.shards:
+                raise ValueError(f"Shard {shard.name!r} already exists")
+        if self.rebalancing:
+            raise ValueError("A rebalance is already running")
+        check_targets([*self.shards.values(), *new])
+        return ShardRouter(
+            [*self.shards.values(), *new], list(self.shards), self.vnodes, time.time()
+        )
+
+    def finished(self) -> "ShardRouter":
+        """New router without the previous ring (rebalance done)."""
+        return ShardRouter(list(self.shards.values()), None, self.vnodes)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "shards": [asdict(s) for s in self.shards.values()],
+            "previous": self.previous,
+            "vnodes": self.vnodes,
+            "started_at": self.started_at,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ShardRouter":
+        return cls(
+            [Shard(**s) for s in state["shards"]],
+            state.get("previous"),
+            state.get("vnodes", 128),
+            state.get("started_at"),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "shards": {s.name: {"endpoint": s.endpoint, "collection": s.collection} for s in self.shards.values()},
+            "rebalancing": self.rebalancing,
+        }
+
+
+def load_state(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, router: ShardRouter) -> None:
+    tmp = f"{path}.tmp"
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(router.to_state(), f, indent=2)
+    os.replace(tmp, path)
+
+
+class Rebalancer:
+    """
+    Keeps this process's router in step with the state file and, in the
+    leader, moves users to their new shard after a shard is added.
+    """
+
+    def __init__(
+        self,
+        state_path: str,
+        on_user_moved: Optional[Callable[[str], None]] = None,
+        batch_size: int = 256,
+        rate: float = 500.0,
+        settle: float = 15.0,
+        poll_interval: float = 5.0,
+        leader: bool = True,
+    ):
+        self.state_path = state_path
+        self._on_user_moved = on_user_moved
+        self.batch_size = batch_size
+        self.rate = rate
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.leader = leader
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._mtime: Optional[float] = None
+
+        self.moved = 0
+        self.passes = 0
+        self.errors = 0
+        self._budget_started = 0.0
+        self._budget_used = 0
+
+    # ------------------------------------------------------------------
+    # Topology changes
+    # ------------------------------------------------------------------
+
+    def add_shards(self, new: List[Shard]) -> ShardRouter:
+        """Add shards, persist the new topology and start moving users."""
+        with self._lock:
+            if get_router() is None:
+                raise ValueError("Sharding isn't enabled (set MEMORY_SHARDS)")
+            router = get_router().add(new)
+            save_state(self.state_path, router)
+            set_router(router)
+        print(f"[shards] Added {[s.name for s in new]}; rebalancing {router.previous} -> {list(router.shards)}")
+        return router
+
+    # ------------------------------------------------------------------
+    # Moving points
+    # ------------------------------------------------------------------
+
+    def run_pass(self) -> int:
+        """Move every point whose user now belongs to another shard. Returns points moved."""
+        router = get_router()
+        moved = 0
+        # The rate budget starts with the pass, not at boot
+        self._budget_started = time.monotonic()
+        self._budget_used = 0
+        for name in router.previous or []:
+            source = router.shards[name]
+            offset = None
+            while True:
+                with use_shard(source):
+                    records, offset = with_collection(
+                        lambda client: client.scroll(
+                            collection_name=_collection_name(),
+                            limit=self.batch_size,
+                            offset=offset,
+                            with_payload=True,
+                            with_vectors=True,
+                        )
+                    )
+                leaving: Dict[str, List[models.Record]] = {}
+                for r in records:
+                    user_id = point_owner_key(r.payload or {})
+                    if user_id is None:
+                        continue
+                    owner = router.owner(user_id)
+                    if owner != source:
+                        leaving.setdefault(owner.name, []).append(r)
+                batch_moved = 0
+                for target, batch in leaving.items():
+                    batch_moved += self._move(source, router.shards[target], batch)
+                moved += batch_moved
+                self._throttle(batch_moved)
+                if offset is None or self._stop.is_set():
+                    break
+        self.passes += 1
+        self.moved += moved
+        return moved
+
+    def _move(self, source: Shard, target: Shard, records: List[models.Record]) -> int:
+        ids = [r.id for r in records]
+        with use_shard(target):
+            present = {
+                r.id
+                for r in with_collection(
+                    lambda client: client.retrieve(
+                        collection_name=_collection_name(), ids=ids, with_payload=False, with_vectors=False
+                    )
+                )
+            }
+            points = [
+                models.PointStruct(id=r.id, vector=r.vector, payload=r.payload)
+                for r in records
+                if r.id not in present
+            ]
+            if points:
+                with_collection(
+                    lambda client: client.upsert(collection_name=_collection_name(), points=points, wait=True)
+                )
+        with use_shard(source):
+            with_collection(
+                lambda client: client.delete(
+                    collection_name=_collection_name(),
+                    points_selector=models.PointIdsList(points=ids),
+                    wait=True,
+                )
+            )
+        if self._on_user_moved is not None:
+            for user_id in {point_owner_key(r.payload or {}) for r in records}:
+                self._on_user_moved(user_id)
+        return len(ids)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-shards", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        router = get_router()
+        return {
+            **(router.stats() if router is not None else {"enabled": False}),
+            "moved": self.moved,
+            "passes": self.passes,
+            "errors": self.errors,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._refresh()
+                router = get_router()
+                if self.leader and router is not None and router.rebalancing:
+                    moved = self.run_pass()
+                    settled = time.time() - (router.started_at or 0) >= self.settle
+                    if moved == 0 and settled and not self._stop.is_set():
+                        with self._lock:
+                            done = router.finished()
+                            save_state(self.state_path, done)
+                            set_router(done)
+                        print(f"[shards] ✓ Rebalance done ({self.moved} points moved)")
+                    if moved:
+                        continue
+            except Exception as e:
+                self.errors += 1
+                print(f"[shards] Pass failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _refresh(self) -> None:
+        """Adopt a topology written by another worker (state file changed)."""
+        try:
+            mtime = os.stat(self.state_path).st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            self._mtime = mtime
+            state = load_state(self.state_path)
+            if state:
+                set_router(ShardRouter.from_state(state))
+
+    def _throttle(self, points: int) -> None:
+        """Sleep until `rate` points per second (moved this pass) is respected."""
+        if self.rate <= 0:
+            return
+        self._budget_used += points
+        ahead = self._budget_used / self.rate - (time.monotonic() - self._budget_started)
+        if ahead > 0:
+            self._stop.wait(ahead)
+
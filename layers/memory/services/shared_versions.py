@@ -0,0 +1,47 @@
+"""
+Shared Versions
+
+Per-user write counters in anonymous shared memory, for the pre-fork
+multi-worker mode (serve.py). The table is created in the master before
+fork, so every worker maps the same pages: a save handled by one worker
+bumps the user's counter and the other workers see it on their next
+lookup - their search-result cache and hot set entries for that user stop
+matching and are recomputed.
+
+Users hash into a fixed number of slots. Two users sharing a slot only
+cost an occasional extra cache miss. Bumps take a process-shared lock so
+concurrent writes from two workers never collapse into one increment.
+
+Single-process runs don't need this; api/memory.py only creates it when
+MEMORY_WORKERS > 1.
+"""
+
+import hashlib
+import mmap
+import multiprocessing
+
+import numpy as np
+
+
+class SharedVersions:
+    """Fixed-size int64 counter table shared across forked workers."""
+
+    def __init__(self, slots: int = 65536):
+        self.slots = slots
+        self._buffer = mmap.mmap(-1, slots * 8)  # anonymous, MAP_SHARED
+        self._counts = np.frombuffer(self._buffer, dtype=np.int64)
+        self._lock = multiprocessing.Lock()
+
+    def _slot(self, user_id: str) -> int:
+        digest = hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.slots
+
+    def get(self, user_id: str) -> int:
+        return int(self._counts[self._slot(user_id)])
+
+    def bump(self, user_id: str) -> int:
+        """Record a write for user_id. Returns the new version."""
+        slot = self._slot(user_id)
+        with self._lock:
+            self._counts[slot] += 1
+            return int(self._counts[slot])
@@ -0,0 +1,434 @@
+"""
+Memory Snapshots
+
+Export / import of memory points without touching Qdrant's storage
+directories - for backups and for moving memories between hosts.
+
+On-disk snapshot (scripts/snapshot.py) is a directory of parts:
+    manifest.json            format, dim, point count, part list
+    vectors-00000.f16        raw little-endian float16, one row per point
+    points-00000.ndjson      {"id": ..., "payload": {...}} per line, same order
+    (or points-00000.parquet with `id` / `payload` JSON string columns)
+
+Vectors are stored as a plain float16 array - half the size of fp32 and
+loaded back with np.memmap, no parsing. Cosine search doesn't notice the
+rounding. Export streams scroll pages straight to disk (memory is one page,
+not the collection); each part holds part_size points.
+
+Import loads parts on a thread pool, upserting batch_size points at a time.
+Finished parts are recorded in import-<collection>.progress.json next to the
+manifest, so a re-run after a crash skips them. Upserts are by point id, so
+replaying a half-done part is harmless.
+
+When sharded, an export reads every shard (or the user's) and an import
+routes each point to the shard that owns its user, so a snapshot moves
+between sharded and unsharded deployments unchanged.
+
+Over HTTP the same data travels as one NDJSON stream (header line, then one
+line per point with the float16 vector base64-encoded): see
+GET /api/memory/export and POST /api/memory/import.
+
+Parquet needs pyarrow, which isn't in requirements.txt - NDJSON is the
+default.
+
+Env vars:
+  - SNAPSHOT_PART_SIZE (default: 65536) - points per part file
+  - SNAPSHOT_BATCH_SIZE (default: 512) - points per scroll page / upsert
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+from qdrant_client.http import models
+
+from services.qdrant_client import (
+    _collection_name,
+    group_by_shard,
+    read_shards,
+    shards,
+    use_shard,
+    user_filter,
+    with_collection,
+)
+from services.sharding import point_owner_key
+
+FORMAT = "memory-snapshot"
+VERSION = 1
+PAYLOAD_FORMATS = ("ndjson", "parquet")
+VECTOR_DTYPE = np.dtype("<f2")
+
+DEFAULT_PART_SIZE = int(os.getenv("SNAPSHOT_PART_SIZE", "65536"))
+DEFAULT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "512"))
+
+
+class SnapshotError(ValueError):
+    """Snapshot is malformed or doesn't match what the reader expects."""
+
+
+def iter_records(
+    user_id: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[List[models.Record]]:
+    """
+    Scroll a user's points (or the whole collection, every shard) page by
+    page. Each page is its own breaker-guarded request, so a long export
+    survives a blip and a generator can be consumed lazily (e.g. by a
+    streaming response). The shard is only set around each request, never
+    across a yield - the consumer may resume the generator in another
+    context.
+    """
+    scroll_filter = user_filter(user_id) if user_id else None
+    for shard in read_shards(user_id) if user_id else shards():
+        offset = None
+        while True:
+            with use_shard(shard):
+                records, offset = with_collection(
+                    lambda client: client.scroll(
+                        collection_name=_collection_name(),
+                        scroll_filter=scroll_filter,
+                        limit=batch_size,
+                        offset=offset,
+                        with_payload=True,
+                        with_vectors=True,
+                    )
+                )
+            records = [r for r in records if r.vector is not None]
+            if records:
+                yield records
+            if offset is None:
+                break
+
+
+def upsert_points(points: List[models.PointStruct]) -> None:
+    """Upsert imported points, each on the shard that owns its user."""
+    owners = [point_owner_key(p.payload or {}) or "" for p in points]
+    for shard, idx in group_by_shard(owners).items():
+        batch = [points[i] for i in idx]
+        with use_shard(shard):
+            with_collection(
+                lambda client: client.upsert(
+                    collection_name=_collection_name(), points=batch, wait=True
+                )
+            )
+
+
+def encode_vector(vector: Iterable[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()).decode("ascii")
+
+
+def decode_vector(data: str) -> List[float]:
+    return np.frombuffer(base64.b64decode(data), dtype=VECTOR_DTYPE).astype(np.float32).tolist()
+
+
+# ============================================================================
+# Directory snapshots
+# ============================================================================
+
+
+class _ParquetPart:
+    """Row-group-at-a-time Parquet writer for one part's ids and payloads."""
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SnapshotError("Parquet snapshots need pyarrow (pip install pyarrow)") from e
+        self._pa = pa
+        self._schema = pa.schema([("id", pa.string()), ("payload", pa.string())])
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+
+    def write(self, records: List[models.Record]) -> None:
+        self._writer.write_table(
+            self._pa.table(
+                {
+                    "id": [json.dumps(r.id) for r in records],
+                    "payload": [json.dumps(r.payload or {}) for r in records],
+                },
+                schema=self._schema,
+            )
+        )
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class _NdjsonPart:
+    def __init__(self, path: Path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, records: List[models.Record]) -> None:
+        self._file.writelines(
+            json.dumps({"id": r.id, "payload": r.payload or {}}) + "\n" for r in records
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _part_files(index: int, payload_format: str) -> Dict[str, str]:
+    ext = "parquet" if payload_format == "parquet" else "ndjson"
+    return {"vectors": f"vectors-{index:05d}.f16", "points": f"points-{index:05d}.{ext}"}
+
+
+def export_snapshot(
+    directory: str,
+    user_id: Optional[str] = None,
+    payload_format: str = "ndjson",
+    part_size: int = DEFAULT_PART_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """Write a user's points (or the whole collection) to a snapshot directory."""
+    if payload_format not in PAYLOAD_FORMATS:
+        raise SnapshotError(f"Unknown payload format '{payload_format}'")
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    if (root / "manifest.json").exists():
+        raise SnapshotError(f"{root} already holds a snapshot")
+
+    started = time.perf_counter()
+    parts: List[Dict[str, Any]] = []
+    dim: Optional[int] = None
+    vectors_file = points_file = None
+
+    def close_part():
+        if vectors_file is not None:
+            vectors_file.close()
+            points_file.close()
+
+    try:
+        for records in iter_records(user_id, batch_size):
+            while records:
+                if not parts or parts[-1]["count"] >= part_size:
+                    close_part()
+                    files = _part_files(len(parts), payload_format)
+                    parts.append({**files, "count": 0})
+                    vectors_file = open(root / files["vectors"], "wb")
+                    part_cls = _ParquetPart if payload_format == "parquet" else _NdjsonPart
+                    points_file = part_cls(root / files["points"])
+
+                take = records[: part_size - parts[-1]["count"]]
+                records = records[len(take):]
+                matrix = np.asarray([r.vector for r in take], dtype=VECTOR_DTYPE)
+                if dim is None:
+                    dim = matrix.shape[1]
+                elif matrix.shape[1] != dim:
+                    raise SnapshotError(f"Mixed vector sizes ({dim} vs {matrix.shape[1]})")
+                vectors_file.write(matrix.tobytes())
+                points_file.write(take)
+                parts[-1]["count"] += len(take)
+    finally:
+        close_part()
+
+    manifest = {
+        "format": FORMAT,
+        "version": VERSION,
+        "collection": _collection_name(),
+        "user_id": user_id,
+        "created_at": time.time(),
+        "dim": dim or 0,
+        "dtype": "float16",
+        "payload_format": payload_format,
+        "count": sum(p["count"] for p in parts),
+        "parts": parts,
+    }
+    # Written last: a directory without a manifest is an unfinished export
+    with open(root / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"[snapshot] Exported {manifest['count']} points in {len(parts)} parts "
+        f"to {root} ({manifest['count'] / max(elapsed, 1e-6):.0f} points/s)"
+    )
+    return manifest
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    path = Path(directory) / "manifest.json"
+    if not path.exists():
+        raise SnapshotError(f"No manifest in {directory} (unfinished export?)")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot {manifest.get('format')} v{manifest.get('version')}"
+        )
+    return manifest
+
+
+def _iter_part_rows(root: Path, manifest: Dict[str, Any], part: Dict[str, Any]) -> Iterator[tuple]:
+    """(id, payload) per point of one part, in vector row order."""
+    if manifest["payload_format"] == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SnapshotError("Parquet snapshots need pyarrow (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(str(root / part["points"])).iter_batches():
+            columns = batch.to_pydict()
+            for point_id, payload in zip(columns["id"], columns["payload"]):
+                yield json.loads(point_id), json.loads(payload)
+    else:
+        with open(root / part["points"], encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                yield row["id"], row["payload"]
+
+
+def iter_part(
+    directory: str, manifest: Dict[str, Any], index: int, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[List[models.PointStruct]]:
+    """Points of one part in batches; vectors are memory-mapped, not loaded."""
+    root = Path(directory)
+    part = manifest["parts"][index]
+    if not part["count"]:
+        return
+    vectors = np.memmap(
+        root / part["vectors"], dtype=VECTOR_DTYPE, mode="r", shape=(part["count"], manifest["dim"])
+    )
+    batch: List[models.PointStruct] = []
+    row = -1
+    for row, (point_id, payload) in enumerate(_iter_part_rows(root, manifest, part)):
+        if row >= part["count"]:
+            raise SnapshotError(f"{part['points']} has more rows than its vectors")
+        batch.append(
+            models.PointStruct(
+                id=point_id, vector=vectors[row].astype(np.float32).tolist(), payload=payload
+            )
+        )
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if row + 1 != part["count"]:
+        raise SnapshotError(f"{part['points']} has {row + 1} rows, expected {part['count']}")
+    if batch:
+        yield batch
+
+
+def import_snapshot(
+    directory: str,
+    workers: int = 4,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    resume: bool = True,
+) -> Dict[str, Any]:
+    """
+    Upsert a snapshot into the live collection, parts in parallel. With
+    resume, parts finished by an earlier run are skipped.
+    """
+    manifest = read_manifest(directory)
+    progress_path = Path(directory) / f"import-{_collection_name()}.progress.json"
+    done: Set[int] = set()
+    if resume and progress_path.exists():
+        with open(progress_path, encoding="utf-8") as f:
+            done = set(json.load(f).get("done_parts", []))
+    todo = [i for i in range(len(manifest["parts"])) if i not in done]
+    skipped = sum(manifest["parts"][i]["count"] for i in done if i < len(manifest["parts"]))
+    if todo:
+        print(f"[snapshot] Importing {len(todo)} parts ({len(done)} already done) from {directory}")
+
+    lock = threading.Lock()
+    imported = [0]
+    started = time.perf_counter()
+
+    def load_part(index: int) -> None:
+        for points in iter_part(directory, manifest, index, batch_size):
+            upsert_points(points)
+            with lock:
+                imported[0] += len(points)
+        with lock:
+            done.add(index)
+            tmp = progress_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"done_parts": sorted(done)}, f)
+            os.replace(tmp, progress_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="snapshot-import") as pool:
+        # list() re-raises the first failure; finished parts stay recorded
+        list(pool.map(load_part, todo))
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"[snapshot] Imported {imported[0]} points "
+        f"({imported[0] / max(elapsed, 1e-6):.0f} points/s, {skipped} skipped as done)"
+    )
+    return {
+        "imported": imported[0],
+        "skipped": skipped,
+        "parts": len(manifest["parts"]),
+        "duration_s": round(elapsed, 2),
+    }
+
+
+# ============================================================================
+# NDJSON streams (HTTP)
+# ============================================================================
+
+
+def stream_ndjson(user_id: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    """Header line, then one point per line with a base64 float16 vector."""
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "collection": _collection_name(),
+        "user_id": user_id,
+        "dtype": "float16",
+    }
+    yield (json.dumps(header) + "\n").encode("utf-8")
+    for records in iter_records(user_id, batch_size):
+        yield "".join(
+            json.dumps({"id": r.id, "payload": r.payload or {}, "vector": encode_vector(r.vector)})
+            + "\n"
+            for r in records
+        ).encode("utf-8")
+
+
+class StreamImporter:
+    """
+    Collects NDJSON lines from an upload and upserts them in batches.
+    add() returns True when a batch is ready for flush(); flush() blocks on
+    Qdrant, so async callers run it in a thread.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.imported = 0
+        self.users: Set[str] = set()
+        self._header: Optional[Dict[str, Any]] = None
+        self._batch: List[models.PointStruct] = []
+
+    def add(self, line: bytes) -> bool:
+        line = line.strip()
+        if not line:
+            return False
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise SnapshotError(f"Bad NDJSON line: {e}") from e
+        if self._header is None:
+            if row.get("format") != FORMAT or row.get("version") != VERSION:
+                raise SnapshotError("Stream doesn't start with a memory-snapshot v1 header")
+            self._header = row
+            return False
+        try:
+            payload = row.get("payload") or {}
+            self._batch.append(
+                models.PointStruct(id=row["id"], vector=decode_vector(row["vector"]), payload=payload)
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"Bad point line: {e}") from e
+        if payload.get("user_id"):
+            self.users.add(payload["user_id"])
+        return len(self._batch) >= self.batch_size
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        points, self._batch = self._batch, []
+        upsert_points(points)
+        self.imported += len(points)
@@ -0,0 +1,112 @@
+"""
+Storage Profiles
+
+Vector storage options for the memory collection, trading RAM for a little
+accuracy:
+
+  - fp32:    plain float32 vectors (baseline, 4 bytes/dim)
+  - float16: half-precision vectors (2 bytes/dim)
+  - int8:    fp32 originals + scalar int8 quantized copy in RAM, rescored
+             against the originals (1 byte/dim in RAM)
+  - binary:  fp32 originals + 1-bit quantized copy in RAM, oversampled and
+             rescored (1 bit/dim in RAM)
+
+Any profile can also keep the original vectors on disk (mmap) instead of
+RAM. With int8/binary that leaves only the quantized copy resident.
+
+New collections use QDRANT_STORAGE_PROFILE / QDRANT_VECTORS_ON_DISK.
+Existing collections keep whatever they were built with - search params
+are derived from the collection's actual config, not the env. To move an
+existing collection, run `python -m scripts.storage_profiles migrate`.
+
+Env vars:
+  - QDRANT_STORAGE_PROFILE (default: fp32)
+  - QDRANT_VECTORS_ON_DISK (default: false)
+  - QDRANT_QUANT_OVERSAMPLING (default: 1.5 for int8, 3.0 for binary)
+"""
+
+import os
+from typing import Dict, Optional
+
+from qdrant_client.http import models
+
+PROFILES = ("fp32", "float16", "int8", "binary")
+DEFAULT_PROFILE = "fp32"
+
+_DEFAULT_OVERSAMPLING = {"int8": 1.5, "binary": 3.0}
+
+
+def env_profile() -> str:
+    """Profile for newly created collections."""
+    profile = os.getenv("QDRANT_STORAGE_PROFILE", DEFAULT_PROFILE).strip().lower()
+    if profile not in PROFILES:
+        print(f"[qdrant] Unknown QDRANT_STORAGE_PROFILE '{profile}', using {DEFAULT_PROFILE}")
+        return DEFAULT_PROFILE
+    return profile
+
+
+def env_on_disk() -> bool:
+    return os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() in ("1", "true", "yes")
+
+
+def vectors_config(profile: str, size: int = 768, on_disk: bool = False) -> models.VectorParams:
+    """VectorParams for a profile (COSINE distance throughout)."""
+    return models.VectorParams(
+        size=size,
+        distance=models.Distance.COSINE,
+        on_disk=on_disk,
+        datatype=models.Datatype.FLOAT16 if profile == "float16" else None,
+    )
+
+
+def quantization_config(profile: str) -> Optional[models.QuantizationConfig]:
+    """Quantized in-RAM copy for int8/binary profiles, None otherwise."""
+    if profile == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            )
+        )
+    if profile == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
+
+def profile_of(quant_config) -> str:
+    """Map a collection's quantization config back to its profile name (ignores float16)."""
+    if isinstance(quant_config, models.ScalarQuantization):
+        return "int8"
+    if isinstance(quant_config, models.BinaryQuantization):
+        return "binary"
+    return DEFAULT_PROFILE
+
+
+def search_params(profile: str) -> Optional[models.SearchParams]:
+    """Rescoring/oversampling for quantized profiles so recall stays close to fp32."""
+    if profile not in _DEFAULT_OVERSAMPLING:
+        return None
+    oversampling = float(
+        os.getenv("QDRANT_QUANT_OVERSAMPLING", str(_DEFAULT_OVERSAMPLING[profile]))
+    )
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            ignore=False,
+            rescore=True,
+            oversampling=oversampling,
+        )
+    )
+
+
+def estimated_bytes_per_vector(profile: str, dim: int = 768, on_disk: bool = False) -> Dict[str, float]:
+    """
+    Rough per-vector footprint split into RAM and disk (vector data only -
+    ignores HNSW links and payload, which are the same for every profile).
+    """
+    original = dim * (2 if profile == "float16" else 4)
+    quantized = {"int8": dim, "binary": dim / 8}.get(profile, 0)
+    ram = quantized + (0 if on_disk else original)
+    return {"ram": ram, "disk": original}
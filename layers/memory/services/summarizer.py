@@ -5,15 +5,20 @@ Generates summaries of stored memories. Tries local transformers first (no
 network), then HuggingFace Inference API if I have HF_TOKEN, then falls back
 to just grabbing the first couple sentences.
 
+summarize_batch() runs many texts through the local pipeline in one call
+(padded batches on the GPU) - the digest worker uses it so a backlog of
+users costs a few forward passes, not one per user.
+
 Env vars:
   - SUMMARY_MODEL (default: sshleifer/distilbart-cnn-12-6)
   - SUMMARY_DEVICE ("cpu" or GPU index)
+  - SUMMARY_BATCH_SIZE (default: 8) - pipeline batch size for summarize_batch()
   - HF_TOKEN (optional, for HF Inference API)
 """
 
 import os
 import re
-from typing import Optional
+from typing import List, Optional
 
 _hf_client = None
 _pipeline = None
@@ -121,3 +126,40 @@ def summarize(text: str, max_words: int = 60) -> str:
         else f"[summarizer] Heuristic summary: {summary}"
     )
     return summary
+
+
+def summarize_batch(texts: List[str], max_words: int = 60) -> List[str]:
+    """
+    Summarize many texts at once. Uses one batched local pipeline call when
+    the pipeline is available; otherwise summarizes each text with
+    summarize() (HF API / heuristic). Output order matches input order.
+    """
+    texts = [(t or "").strip() for t in texts]
+    if not texts:
+        return []
+
+    _init_backends()
+
+    if _pipeline is not None:
+        todo = [i for i, t in enumerate(texts) if t]
+        max_tokens = max(32, min(128, int(max_words * 1.6)))
+        try:
+            results = _pipeline(
+                [texts[i] for i in todo],
+                max_new_tokens=max_tokens,
+                do_sample=False,
+                truncation=True,
+                batch_size=int(os.getenv("SUMMARY_BATCH_SIZE", "8")),
+            )
+            summaries = [""] * len(texts)
+            for i, result in zip(todo, results):
+                if isinstance(result, list):  # some versions nest per input
+                    result = result[0] if result else {}
+                summaries[i] = (result.get("summary_text") or "").strip()
+            print(f"[summarizer] Batch of {len(todo)} summarized by local pipeline")
+            # Anything the pipeline returned empty falls back individually
+            return [s or (summarize(t, max_words) if t else "") for s, t in zip(summaries, texts)]
+        except Exception as e:
+            print(f"[summarizer] Batched summarization failed: {e}")
+
+    return [summarize(t, max_words) if t else "" for t in texts]
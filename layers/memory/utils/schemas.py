@@ -39,6 +39,37 @@ class SaveRequest(BaseModel):
     source_name: Optional[str] = Field(
         None, description="Source name: filename, URL, or text preview"
     )
+    wait: bool = Field(
+        True,
+        description="Wait for Qdrant to apply the upsert before responding",
+    )
+    async_write: Optional[bool] = Field(
+        None,
+        description="Journal the save and return 'accepted' (default: SAVE_MODE)",
+    )
+
+
+class BatchItem(BaseModel):
+    """One item in a batch save: a document chunk (text) or a fact ({type, value})."""
+
+    text: Optional[str] = Field(None, description="Chunk text to store verbatim")
+    fact: Optional[dict] = Field(None, description="Pre-extracted fact {type, value}")
+    source_type: Optional[str] = Field(None, description="Overrides the batch source_type")
+    source_name: Optional[str] = Field(None, description="Overrides the batch source_name")
+    metadata: Optional[dict] = Field(None, description="Extra payload fields (e.g. chunk_index)")
+
+
+class SaveBatchRequest(BaseModel):
+    """Many chunks/facts for one user, embedded and upserted in bulk."""
+
+    user_id: str = Field(..., description="Unique identifier for the user")
+    items: List[BatchItem] = Field(..., max_length=2000, description="Chunks or facts to store")
+    source_type: Optional[str] = Field(None, description="Default source type for items")
+    source_name: Optional[str] = Field(None, description="Default source name for items")
+    wait: bool = Field(
+        True,
+        description="Wait for Qdrant to apply each upsert before responding",
+    )
 
 
 class SearchRequest(BaseModel):
@@ -49,6 +80,23 @@ class SearchRequest(BaseModel):
     top_k: int = Field(5, ge=1, le=20, description="Number of memories to return")
 
 
+class SearchBatchRequest(BaseModel):
+    """Several queries for one user, embedded together and searched in one round-trip."""
+
+    user_id: str = Field(..., description="User ID to scope the searches")
+    queries: List[str] = Field(..., min_length=1, max_length=32, description="Natural language queries")
+    top_k: int = Field(5, ge=1, le=20, description="Number of memories to return per query")
+
+
+class AddShardRequest(BaseModel):
+    """A shard to add to a sharded memory service (users are rebalanced onto it online)."""
+
+    name: str = Field(..., min_length=1, description="Unique shard name")
+    host: Optional[str] = Field(None, description="Qdrant host (default: QDRANT_HOST; ':memory:' for in-process)")
+    port: int = Field(6333, description="Qdrant REST port")
+    collection: Optional[str] = Field(None, description="Collection name (default: INDEX_NAME)")
+
+
 class MemoryResult(BaseModel):
     """A single search result with the stored text, score, and source info."""
 
@@ -60,3 +108,10 @@ class MemoryResult(BaseModel):
     score: float = Field(..., description="Similarity score (0-1)")
     source_type: Optional[str] = Field(None, description="Source type")
     source_name: Optional[str] = Field(None, description="Source name")
+
+
+class QueryResults(BaseModel):
+    """Results for one query of a batch search."""
+
+    query: str
+    results: List[MemoryResult]
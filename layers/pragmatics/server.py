@@ -7,6 +7,7 @@ LLM-based memory summarization for what's worth remembering.
 
 Endpoints:
   POST /api/pragmatics/classify - Full 4-class classification (recommended)
+  POST /api/pragmatics/classify-batch - Same, for many messages in one call
   POST /api/pragmatics/entities - Named entity extraction (names, orgs, dates, emails)
   POST /api/pragmatics/extract-facts-storage - Memory summarization (what to remember)
   POST /api/pragmatic - Binary save detection (backward compatible)
@@ -19,7 +20,7 @@ Models:
 
 import logging
 import time
-from typing import Dict, Any, Optional, List
+from typing import Annotated, Dict, Any, Optional, List
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
@@ -27,6 +28,7 @@ from pydantic import BaseModel, Field
 from services.classifier import (
     classify_intent,
     classify_intent_multiclass,
+    classify_intents_batch,
     classify_with_context,
 )
 from services.entity_extractor import extract_entities_dict, extract_user_info
@@ -69,6 +71,14 @@ class ClassifyRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000)
 
 
+class ClassifyBatchRequest(BaseModel):
+    """Request to classify several user texts in one forward pass per batch."""
+
+    texts: List[Annotated[str, Field(min_length=1, max_length=5000)]] = Field(
+        ..., min_length=1, max_length=256
+    )
+
+
 class ClassifyResponse(BaseModel):
     """Binary classification result (backward compatible)."""
 
@@ -127,6 +137,37 @@ async def classify_multiclass(request: ClassifyRequest) -> IntentResponse:
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+@app.post("/api/pragmatics/classify-batch", response_model=List[IntentResponse])
+async def classify_multiclass_batch(request: ClassifyBatchRequest) -> List[IntentResponse]:
+    """
+    Classify many messages at once.
+
+    Messages are sorted by token length and padded only to the longest
+    message in each batch, so short chat messages don't pay for 128 tokens.
+    Returns one result per text, in request order.
+    """
+    start_time = time.time()
+
+    try:
+        results = classify_intents_batch(request.texts)
+        duration_ms = int((time.time() - start_time) * 1000)
+
+        logger.info(f"[classify-batch] count={len(results)} ms={duration_ms}")
+
+        return [
+            IntentResponse(
+                intent=result["intent"],
+                confidence=round(result["confidence"], 4),
+                all_probs={k: round(v, 4) for k, v in result["all_probs"].items()},
+            )
+            for result in results
+        ]
+
+    except Exception as exc:
+        logger.error(f"[classify-batch] Error: {exc} | count: {len(request.texts)}")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
 @app.post("/api/pragmatic", response_model=ClassifyResponse)
 async def classify_binary(request: ClassifyRequest) -> ClassifyResponse:
     """
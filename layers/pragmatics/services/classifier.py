@@ -22,7 +22,7 @@ import json
 import logging
 import os
 from pathlib import Path
-from typing import Dict, Tuple, Any
+from typing import Any, Dict, List, Sequence, Tuple
 
 import torch
 import torch.nn.functional as F
@@ -106,12 +106,85 @@ except Exception as e:
 CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.50"))
 logger.info(f"[classifier] Confidence threshold: {CONFIDENCE_THRESHOLD}")
 
+MAX_LENGTH = 128  # tokens; longer messages are truncated
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "32"))
+
+
+# ============================================================================
+# Batched Inference
+# ============================================================================
+#
+# Messages are tokenized once without padding, sorted by token length and
+# run in batches of CLASSIFY_BATCH_SIZE, each padded only to its own longest
+# item. A "hi" no longer costs a 128-token forward pass, and similar lengths
+# share a batch so little compute goes to padding. Single-message calls use
+# the same path (a batch of one, unpadded).
+
+
+def _pad_batch(
+    encoded: Dict[str, List[List[int]]], indices: Sequence[int]
+) -> Dict[str, torch.Tensor]:
+    """Right-pad the given items to the longest of them."""
+    width = max(len(encoded["input_ids"][i]) for i in indices)
+    pad_id = tokenizer.pad_token_id or 0
+    batch = {}
+    for key, rows in encoded.items():
+        fill = pad_id if key == "input_ids" else 0
+        batch[key] = torch.tensor(
+            [rows[i] + [fill] * (width - len(rows[i])) for i in indices], dtype=torch.long
+        )
+    return batch
+
+
+def _class_probabilities(texts: Sequence[str]) -> List[List[float]]:
+    """Softmax class probabilities per text, in input order."""
+    if not texts:
+        return []
+    encoded = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+    encoded = {
+        k: encoded[k] for k in ("input_ids", "attention_mask", "token_type_ids") if k in encoded
+    }
+
+    order = sorted(range(len(texts)), key=lambda i: len(encoded["input_ids"][i]))
+    probs: List[List[float]] = [[] for _ in texts]
+    for start in range(0, len(order), CLASSIFY_BATCH_SIZE):
+        indices = order[start : start + CLASSIFY_BATCH_SIZE]
+        inputs = {k: v.to(DEVICE) for k, v in _pad_batch(encoded, indices).items()}
+        with torch.no_grad():
+            logits = model(**inputs).logits
+            batch_probs = F.softmax(logits, dim=-1).cpu().tolist()
+        for i, row in zip(indices, batch_probs):
+            probs[i] = row
+    return probs
+
+
+def _intent_result(probs: List[float]) -> Dict[str, Any]:
+    best_idx = probs.index(max(probs))
+    return {
+        "intent": INTENT_LABELS.get(best_idx, "casual"),
+        "confidence": probs[best_idx],
+        "all_probs": {INTENT_LABELS.get(i, f"class_{i}"): p for i, p in enumerate(probs)},
+    }
+
 
 # ============================================================================
 # Public API - Multi-class
 # ============================================================================
 
 
+def classify_intents_batch(texts: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Classify many messages at once (length-sorted, dynamically padded).
+
+    Args:
+        texts: User message texts
+
+    Returns:
+        One classify_intent_multiclass() result per text, in input order.
+    """
+    return [_intent_result(probs) for probs in _class_probabilities(texts)]
+
+
 def classify_intent_multiclass(text: str) -> Dict[str, Any]:
     """
     Classify user intent into one of 4 categories.
@@ -129,38 +202,12 @@ def classify_intent_multiclass(text: str) -> Dict[str, Any]:
     text_preview = text if len(text) <= 200 else text[:197] + "..."
     logger.debug(f"[classify] Input: {text_preview}")
 
-    # Tokenize
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=128,
-        padding="max_length",
-    )
-    inputs = {k: v.to(DEVICE) for k, v in inputs.items()}
-
-    # Inference
-    with torch.no_grad():
-        logits = model(**inputs).logits
-        probs = F.softmax(logits, dim=-1).cpu().tolist()[0]
-
-    # Find best class
-    best_idx = probs.index(max(probs))
-    best_intent = INTENT_LABELS.get(best_idx, "casual")
-    best_confidence = probs[best_idx]
-
-    # Build probability dict
-    all_probs = {INTENT_LABELS.get(i, f"class_{i}"): p for i, p in enumerate(probs)}
+    result = classify_intents_batch([text])[0]
 
     logger.debug(
-        f"[classify] Result: {best_intent} ({best_confidence:.2f}) | {all_probs}"
+        f"[classify] Result: {result['intent']} ({result['confidence']:.2f}) | {result['all_probs']}"
     )
-
-    return {
-        "intent": best_intent,
-        "confidence": best_confidence,
-        "all_probs": all_probs,
-    }
+    return result
 
 
 # ============================================================================
@@ -214,19 +261,7 @@ def classify_intent(text: str) -> Tuple[bool, float]:
         return is_save, save_conf
     else:
         # Binary model path
-        inputs = tokenizer(
-            text,
-            return_tensors="pt",
-            truncation=True,
-            max_length=128,
-            padding="max_length",
-        )
-        inputs = {k: v.to(DEVICE) for k, v in inputs.items()}
-
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            probs = F.softmax(logits, dim=-1).cpu().tolist()[0]
-
+        probs = _class_probabilities([text])[0]
         save_confidence = probs[1]
         is_save = save_confidence >= CONFIDENCE_THRESHOLD
 
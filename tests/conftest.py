@@ -1,5 +1,6 @@
 """Shared pytest configuration and fixtures."""
 
+import importlib
 import os
 import sys
 import socket
@@ -11,6 +12,97 @@ sys.path.insert(
     0, os.path.join(os.path.dirname(__file__), "..", "layers", "pragmatics")
 )
 
+# Memory layer root. Memory and pragmatics both have top-level `services`,
+# `api` and `utils` packages, so memory modules are imported in isolation.
+MEMORY_LAYER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "layers", "memory")
+)
+_LAYER_PACKAGES = ("services", "api", "utils", "scripts")
+
+
+def load_memory_module(dotted_name: str, *more: str):
+    """
+    Import a memory layer module (e.g. "services.qdrant_client") without
+    clobbering whichever layer's packages are already in sys.modules.
+
+    Pass several names to get a tuple of modules imported together (so
+    they share dependencies, e.g. services.digest and the
+    services.qdrant_client it uses).
+    """
+
+    def _layer_modules():
+        return [k for k in sys.modules if k.split(".")[0] in _LAYER_PACKAGES]
+
+    saved = {k: sys.modules.pop(k) for k in _layer_modules()}
+    sys.path.insert(0, MEMORY_LAYER)
+    try:
+        modules = [importlib.import_module(name) for name in (dotted_name, *more)]
+    finally:
+        sys.path.remove(MEMORY_LAYER)
+        for k in _layer_modules():
+            del sys.modules[k]
+        sys.modules.update(saved)
+    return modules[0] if not more else tuple(modules)
+
+
+# Environment api.memory is imported under by the memory_api fixture: the
+# stub embedder (no model) and no journal / shard / migration state on disk
+_MEMORY_API_ENV = {
+    "EMBEDDING_PROVIDER": "stub",
+    "QDRANT_HOST": ":memory:",
+    "INDEX_NAME": "api_test_collection",
+    "SAVE_MODE": "sync",
+}
+_MEMORY_API_UNSET = (
+    "MEMORY_WORKERS",
+    "MEMORY_SHARDS",
+    "EMBEDDING_MIGRATION_TARGET",
+    "EMBED_CACHE_DIR",
+    "HOT_SET_ENABLED",
+    "SAVE_DEDUP_THRESHOLD",
+)
+
+
+@pytest.fixture(scope="session")
+def memory_api(tmp_path_factory):
+    """
+    (api.memory, services.qdrant_client) imported once on the stub embedder.
+    Use memory_client for a fresh in-process Qdrant per test.
+    """
+    pytest.importorskip("numpy")
+    pytest.importorskip("fastapi")
+    pytest.importorskip("qdrant_client")
+    workdir = tmp_path_factory.mktemp("memory_api")
+    patch = pytest.MonkeyPatch()
+    for name, value in _MEMORY_API_ENV.items():
+        patch.setenv(name, value)
+    for name in _MEMORY_API_UNSET:
+        patch.delenv(name, raising=False)
+    patch.setenv("BLOB_STORE_DIR", str(workdir / "blobs"))
+    patch.setenv("SAVE_JOURNAL_PATH", str(workdir / "save_journal.sqlite3"))
+    patch.setenv("SHARD_STATE", str(workdir / "shards.json"))
+    patch.setenv("EMBEDDING_MIGRATION_STATE", str(workdir / "embedding_migration.json"))
+    try:
+        return load_memory_module("api.memory", "services.qdrant_client")
+    finally:
+        patch.undo()
+
+
+@pytest.fixture
+def memory_client(memory_api, monkeypatch):
+    """A fresh QdrantClient(":memory:") behind memory_api's collection."""
+    from qdrant_client import QdrantClient
+
+    _, qdrant = memory_api
+    client = QdrantClient(":memory:")
+    monkeypatch.setenv("INDEX_NAME", _MEMORY_API_ENV["INDEX_NAME"])
+    monkeypatch.setattr(qdrant, "_client_instance", client)
+    monkeypatch.setattr(qdrant, "_ready_collections", {})
+    monkeypatch.setattr(qdrant, "_ensure_payload_indexes", lambda *a: None)
+    qdrant._ensure_collection()
+    return client
+
+
 # Orchestrator URL — override with ORCHESTRATOR_URL env var for WSL, remote, etc.
 ORCHESTRATOR_HOST = os.environ.get("ORCHESTRATOR_HOST", "localhost")
 ORCHESTRATOR_PORT = int(os.environ.get("ORCHESTRATOR_PORT", "8004"))
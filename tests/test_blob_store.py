@@ -0,0 +1,108 @@
+"""
+Unit tests for the content-addressed blob store that holds image / binary
+parts of saved messages (dedup by SHA-256, base64 size accounting).
+"""
+
+import base64
+import hashlib
+import os
+import importlib.util
+
+import pytest
+
+_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "blob_store.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_blob_store", _path)
+_blob_store = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_blob_store)
+
+BlobStore = _blob_store.BlobStore
+
+
+class TestBase64Size:
+    @pytest.mark.parametrize("n", [0, 1, 2, 3, 4, 5, 1000, 1001, 1002])
+    def test_matches_decoded_length(self, n):
+        data = base64.b64encode(os.urandom(n)).decode("ascii")
+        assert _blob_store.base64_size(data) == n
+
+    def test_parse_data_url(self):
+        assert _blob_store.parse_data_url("data:image/png;base64,AAAA") == ("image/png", "AAAA")
+        assert _blob_store.parse_data_url("https://example.com/a.png") is None
+        assert _blob_store.parse_data_url("data:text/plain,hello") is None
+
+
+class TestBlobStore:
+    def test_same_content_is_stored_once(self, tmp_path):
+        store = BlobStore(tmp_path)
+        png = os.urandom(4096)
+        data = base64.b64encode(png).decode("ascii")
+
+        digests = {store.put_base64(data)[0] for _ in range(10)}
+
+        assert digests == {hashlib.sha256(png).hexdigest()}
+        assert store.get(digests.pop()) == png
+        assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 1
+        assert store.stats()["writes"] == 1
+        assert store.stats()["dedup_hits"] == 9
+
+    def test_ref_prefix_and_bad_digests(self, tmp_path):
+        store = BlobStore(tmp_path)
+        digest = store.put(b"hello")
+        assert store.exists(f"sha256:{digest}")
+        assert store.get("0" * 64) is None
+        with pytest.raises(ValueError):
+            store.path("../../etc/passwd")
+
+
+@pytest.fixture
+def api(memory_api, memory_client, monkeypatch, tmp_path):
+    api, _ = memory_api
+    monkeypatch.setattr(api, "_blob_store", BlobStore(tmp_path))
+    return api
+
+
+def _save_with_image(api, png, facts):
+    data = base64.b64encode(png).decode("ascii")
+    content = [
+        {"type": "text", "text": "here's my screenshot"},
+        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{data}"}},
+    ]
+    req = api.SaveRequest(
+        user_id="u", messages=[{"role": "user", "content": content}], facts=facts
+    )
+    return api.save_memory(req)
+
+
+class TestSaveAttachments:
+    def test_skipped_save_writes_no_blobs(self, api, tmp_path):
+        response = _save_with_image(api, os.urandom(512), [])
+
+        assert response["status"] == "skipped"
+        assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+    def test_saved_fact_references_stored_blob(self, api, memory_client):
+        png = os.urandom(512)
+        response = _save_with_image(api, png, [{"type": "likes", "value": "screenshots"}])
+
+        [point] = memory_client.retrieve("api_test_collection", [response["point_id"]])
+        [ref] = point.payload["attachments"]
+        assert ref == {
+            "blob": f"sha256:{hashlib.sha256(png).hexdigest()}",
+            "media_type": "image/png",
+            "bytes": 512,
+        }
+        assert api._blob_store.get(ref["blob"]) == png
+
+    def test_blob_is_served_as_opaque_bytes(self, api):
+        digest = api._blob_store.put(b"<script>alert(1)</script>")
+
+        response = api.get_blob(digest)
+
+        assert response.media_type == "application/octet-stream"
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
@@ -0,0 +1,149 @@
+"""
+Unit tests for the memory layer's circuit breaker (state transitions,
+fail-fast while open, and sync/async retry helpers).
+"""
+
+import asyncio
+import os
+import time
+import importlib.util
+
+import pytest
+
+# Load circuit_breaker module directly from memory layer
+_breaker_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "circuit_breaker.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_circuit_breaker", _breaker_path)
+_circuit = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_circuit)
+
+CircuitBreaker = _circuit.CircuitBreaker
+CircuitOpenError = _circuit.CircuitOpenError
+
+
+def _transient(e):
+    return isinstance(e, ConnectionError)
+
+
+class _Flaky:
+    """Fails with the given errors, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class TestStates:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("q", failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(_Flaky(ConnectionError("refused")), _transient)
+        assert breaker.state == _circuit.OPEN
+
+        func = _Flaky()
+        with pytest.raises(CircuitOpenError) as exc:
+            breaker.call(func, _transient)
+        assert func.calls == 0
+        assert 0 < exc.value.retry_after <= 60
+        assert breaker.stats()["rejected"] == 1
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker("q", failure_threshold=2)
+        with pytest.raises(ConnectionError):
+            breaker.call(_Flaky(ConnectionError()), _transient)
+        breaker.call(_Flaky(), _transient)
+        with pytest.raises(ConnectionError):
+            breaker.call(_Flaky(ConnectionError()), _transient)
+        assert breaker.state == _circuit.CLOSED
+
+    def test_non_transient_errors_do_not_count(self):
+        breaker = CircuitBreaker("q", failure_threshold=1)
+        with pytest.raises(ValueError):
+            breaker.call(_Flaky(ValueError("bad request")), _transient)
+        assert breaker.state == _circuit.CLOSED
+
+    def test_half_open_success_closes(self):
+        breaker = CircuitBreaker("q", failure_threshold=1, reset_timeout=0.05)
+        with pytest.raises(ConnectionError):
+            breaker.call(_Flaky(ConnectionError()), _transient)
+        time.sleep(0.06)
+        assert breaker.state == _circuit.HALF_OPEN
+        assert breaker.call(_Flaky(), _transient) == "ok"
+        assert breaker.state == _circuit.CLOSED
+
+    def test_half_open_failure_reopens(self):
+        breaker = CircuitBreaker("q", failure_threshold=3, reset_timeout=0.05)
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(_Flaky(ConnectionError()), _transient)
+        time.sleep(0.06)
+        # One trial call only - a single failure re-opens
+        with pytest.raises(ConnectionError):
+            breaker.call(_Flaky(ConnectionError()), _transient)
+        assert breaker.state == _circuit.OPEN
+        assert breaker.stats()["trips"] == 2
+
+    def test_half_open_limits_trial_calls(self):
+        breaker = CircuitBreaker("q", failure_threshold=1, reset_timeout=0.05)
+        with pytest.raises(ConnectionError):
+            breaker.call(_Flaky(ConnectionError()), _transient)
+        time.sleep(0.06)
+        breaker.allow()  # trial in flight
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+
+class TestRetry:
+    def test_retries_transient_then_succeeds(self):
+        breaker = CircuitBreaker("q", failure_threshold=5)
+        func = _Flaky(ConnectionError())
+        assert _circuit.call_with_retry(func, breaker, _transient, attempts=2, base_delay=0) == "ok"
+        assert func.calls == 2
+
+    def test_does_not_retry_non_transient(self):
+        breaker = CircuitBreaker("q")
+        func = _Flaky(ValueError("bad"))
+        with pytest.raises(ValueError):
+            _circuit.call_with_retry(func, breaker, _transient, attempts=3, base_delay=0)
+        assert func.calls == 1
+
+    def test_stops_retrying_once_open(self):
+        breaker = CircuitBreaker("q", failure_threshold=1, reset_timeout=60)
+        func = _Flaky(ConnectionError(), ConnectionError())
+        with pytest.raises(ConnectionError):
+            _circuit.call_with_retry(func, breaker, _transient, attempts=5, base_delay=0)
+        assert func.calls == 1
+
+    def test_async_retry_does_not_block_loop(self):
+        breaker = CircuitBreaker("q", failure_threshold=5)
+        func = _Flaky(ConnectionError(), ConnectionError())
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            result, _ = await asyncio.gather(
+                _circuit.call_with_retry_async(func, breaker, _transient, attempts=3, base_delay=0.05),
+                ticker(),
+            )
+            return result
+
+        assert asyncio.run(main()) == "ok"
+        assert func.calls == 3
+        assert len(ticks) == 5
@@ -224,5 +224,84 @@ class TestArchitecturePrinciples:
         assert True  # Documentation test
 
 
+class _FakeTokenizer:
+    """One token per word plus [CLS]/[SEP]; records nothing, pads nothing."""
+
+    pad_token_id = 0
+
+    def __call__(self, texts, truncation=True, max_length=128):
+        ids = [[101] + [7] * len(t.split()) for t in texts]
+        ids = [row[: max_length - 1] + [102] for row in ids]
+        return {"input_ids": ids, "attention_mask": [[1] * len(row) for row in ids]}
+
+
+class _FakeModel:
+    """Predicts class (real token count % 4) and records each batch's shape."""
+
+    def __init__(self):
+        self.config = MagicMock(num_labels=4, id2label=dict(INTENT_LABELS))
+        self.shapes = []
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids, attention_mask):
+        self.shapes.append(tuple(input_ids.shape))
+        lengths = attention_mask.sum(dim=1)
+        logits = torch.zeros(input_ids.shape[0], 4)
+        logits[torch.arange(input_ids.shape[0]), lengths % 4] = 5.0
+        return MagicMock(logits=logits)
+
+
+@pytest.fixture
+def classifier():
+    """The real classifier module, loaded with a fake tokenizer / model."""
+    import importlib.util
+    import os
+
+    pytest.importorskip("transformers")
+    path = os.path.join(
+        os.path.dirname(__file__), "..", "layers", "pragmatics", "services", "classifier.py"
+    )
+    fake_model = _FakeModel()
+    with patch("transformers.AutoTokenizer.from_pretrained", return_value=_FakeTokenizer()), \
+            patch("transformers.AutoModelForSequenceClassification.from_pretrained", return_value=fake_model):
+        spec = importlib.util.spec_from_file_location("pragmatics_classifier", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+class TestDynamicPaddingBatch:
+    """Batched inference pads to the longest item per length-sorted batch."""
+
+    def test_results_in_input_order(self, classifier):
+        texts = ["one two three four five", "hi", "what is my name", "ok"]
+        results = classifier.classify_intents_batch(texts)
+        # Fake model: intent index = (words + 2) % 4
+        expected = [INTENT_LABELS[(len(t.split()) + 2) % 4] for t in texts]
+        assert [r["intent"] for r in results] == expected
+        assert all(set(r["all_probs"]) == set(INTENT_LABELS.values()) for r in results)
+
+    def test_sorted_batches_padded_to_their_longest(self, classifier, monkeypatch):
+        monkeypatch.setattr(classifier, "CLASSIFY_BATCH_SIZE", 2)
+        classifier.model.shapes.clear()
+        classifier.classify_intents_batch(["one two three four five", "hi", "what is my name", "ok"])
+        # Two 1-word messages share a batch; the 4- and 5-word ones share the other
+        assert classifier.model.shapes == [(2, 3), (2, 7)]
+
+    def test_single_message_is_not_padded_to_max_length(self, classifier):
+        classifier.model.shapes.clear()
+        result = classifier.classify_intent_multiclass("hello there")
+        assert classifier.model.shapes == [(1, 4)]
+        assert result["intent"] == INTENT_LABELS[0]
+
+    def test_empty_batch(self, classifier):
+        assert classifier.classify_intents_batch([]) == []
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
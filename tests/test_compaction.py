@@ -0,0 +1,183 @@
+"""
+Unit tests for memory compaction (near-duplicate clustering, age retention,
+per-user caps and the batched apply against an in-memory Qdrant).
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_compaction, _qdrant, _sharding = load_memory_module(
+    "services.compaction", "services.qdrant_client", "services.sharding"
+)
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+DIM = 768
+DAY = 86400
+NOW = 1_000_000_000.0
+MERGE = 0.92
+
+Settings = _compaction.CompactionSettings
+plan_user = _compaction.plan_user
+
+
+def _vec(i, wobble=0.0):
+    v = [0.0] * DIM
+    v[i % DIM] = 1.0
+    v[(i + 1) % DIM] = wobble
+    return v
+
+
+class TestCluster:
+    def test_groups_by_first_unassigned_leader(self):
+        vectors = [[1.0, 0.0], [0.0, 1.0], [0.99, 0.05], [0.02, 1.0]]
+        assert _compaction.cluster(vectors, 0.95) == [[0, 2], [1, 3]]
+
+    def test_empty(self):
+        assert _compaction.cluster([], 0.9) == []
+
+
+class TestPlanUser:
+    def test_newest_duplicate_kept_with_variants(self):
+        plan = plan_user(
+            ["old", "new", "other"],
+            [_vec(0), _vec(0, 0.05), _vec(5)],
+            [
+                {"facts": "wife: Sarah", "saved_at": NOW - 10},
+                {"facts": "spouse: Sarah", "saved_at": NOW},
+                {"facts": "job: dev", "saved_at": NOW},
+            ],
+            Settings(threshold=MERGE),
+            now=NOW,
+        )
+        assert plan.merged == ["old"]
+        assert plan.overwrite["new"]["facts"] == "spouse: Sarah"
+        assert plan.overwrite["new"]["variants"] == ["wife: Sarah", "spouse: Sarah"]
+        assert plan.delete == ["old"]
+
+    def test_merging_is_off_by_default(self, monkeypatch):
+        monkeypatch.delenv("COMPACTION_MERGE_THRESHOLD", raising=False)
+        plan = plan_user(
+            [1, 2], [_vec(0), _vec(0)],
+            [{"facts": "wife: Sarah"}, {"facts": "spouse: Sarah"}],
+            Settings.from_env(), now=NOW,
+        )
+        assert plan.delete == [] and plan.overwrite == {}
+
+    def test_chunks_never_merged(self):
+        plan = plan_user(
+            [1, 2], [_vec(0), _vec(0)],
+            [{"user_text": "chunk"}, {"user_text": "chunk"}],
+            Settings(threshold=MERGE), now=NOW,
+        )
+        assert plan.delete == []
+
+    def test_age_retention_skips_untimestamped(self):
+        plan = plan_user(
+            [1, 2, 3], [_vec(0), _vec(1), _vec(2)],
+            [
+                {"facts": "a", "saved_at": NOW - 40 * DAY},
+                {"facts": "b", "saved_at": NOW - DAY},
+                {"facts": "legacy"},
+            ],
+            Settings(max_age_days=30), now=NOW,
+        )
+        assert plan.expired == [1]
+
+    def test_cap_drops_oldest_and_legacy_first(self):
+        plan = plan_user(
+            [1, 2, 3, 4], [_vec(0), _vec(1), _vec(2), _vec(3)],
+            [
+                {"facts": "a", "saved_at": NOW - 5},
+                {"facts": "legacy"},
+                {"facts": "c", "saved_at": NOW},
+                {"facts": "d", "saved_at": NOW - 1},
+            ],
+            Settings(max_points=2), now=NOW,
+        )
+        assert plan.capped == [2, 1]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "test_collection")
+    fake = QdrantClient(":memory:")
+    monkeypatch.setattr(_qdrant, "_client_instance", fake)
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+    _qdrant._ensure_collection()
+    fake.upsert(
+        collection_name="test_collection",
+        points=[
+            models.PointStruct(id=1, vector=_vec(0), payload={"user_id": "u", "facts": "wife: Sarah", "saved_at": 1.0}),
+            models.PointStruct(id=2, vector=_vec(0, 0.05), payload={"user_id": "u", "facts": "spouse: Sarah", "saved_at": 2.0}),
+            models.PointStruct(id=3, vector=_vec(9), payload={"user_id": "u", "facts": "job: dev", "saved_at": 2.0}),
+            models.PointStruct(id=4, vector=_vec(0), payload={"user_id": "v", "facts": "wife: Sarah", "saved_at": 1.0}),
+        ],
+    )
+    return fake
+
+
+class TestCompactor:
+    def test_run_merges_and_reports(self, client):
+        changed = []
+        report = _compaction.Compactor(Settings(threshold=MERGE, rate=0), on_user_changed=changed.append).run()
+
+        assert report["users"] == 2
+        assert report["scanned"] == 4
+        assert report["reclaimed"] == report["merged"] == 1
+        assert changed == ["u"]
+
+        remaining = {r.id: r.payload for r in client.scroll("test_collection", limit=10)[0]}
+        assert sorted(remaining) == [2, 3, 4]
+        assert remaining[2]["variants"] == ["wife: Sarah", "spouse: Sarah"]
+
+    def test_dry_run_changes_nothing(self, client):
+        report = _compaction.Compactor(Settings(threshold=MERGE, rate=0, dry_run=True)).run(["u"])
+        assert report["reclaimed"] == 1
+        assert client.count("test_collection").count == 4
+
+    def test_stops_when_breaker_open(self, client, monkeypatch):
+        monkeypatch.setattr(_qdrant.breaker, "_state", "open")
+        monkeypatch.setattr(_qdrant.breaker, "_opened_at", float("inf"))
+        report = _compaction.Compactor(Settings(rate=0)).run(["u", "v"])
+        assert report["stopped_early"] and report["users"] == 0
+
+    def test_skips_only_the_shard_whose_breaker_is_open(self, monkeypatch):
+        monkeypatch.setenv("INDEX_NAME", "test_collection")
+        monkeypatch.setattr(_qdrant, "_ready_collections", {})
+        monkeypatch.setattr(_qdrant, "_shard_clients", {})
+        monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+        router = _sharding.ShardRouter(
+            [_sharding.Shard("a", ":memory:"), _sharding.Shard("b", ":memory:")], vnodes=32
+        )
+        monkeypatch.setattr(_qdrant, "_router", router)
+        users = [f"user-{i}" for i in range(20)]
+        for i, user_id in enumerate(users):
+            with _qdrant.user_shard(user_id):
+                _qdrant.with_collection(
+                    lambda c: c.upsert(
+                        "test_collection",
+                        points=[
+                            models.PointStruct(id=2 * i, vector=_vec(i), payload={"user_id": user_id, "facts": "a"}),
+                            models.PointStruct(id=2 * i + 1, vector=_vec(i), payload={"user_id": user_id, "facts": "b"}),
+                        ],
+                    )
+                )
+
+        down = _qdrant.CircuitBreaker("qdrant:memory:a")
+        monkeypatch.setattr(down, "_state", "open")
+        monkeypatch.setattr(down, "_opened_at", float("inf"))
+        monkeypatch.setattr(_qdrant, "_shard_breakers", {"memory:a": down})
+
+        report = _compaction.Compactor(Settings(threshold=MERGE, rate=0)).run(users)
+
+        on_b = [u for u in users if router.owner(u).name == "b"]
+        assert report["stopped_early"]
+        assert report["users"] == report["users_changed"] == len(on_b)
+        assert 0 < len(on_b) < len(users)
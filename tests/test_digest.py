@@ -0,0 +1,209 @@
+"""
+Unit tests for the memory digest worker (dirty tracking, incremental vs
+full rebuilds, reconcile scan, digest isolation from user searches, and
+the inbox the other workers hand dirty users to the leader through).
+
+Runs against QdrantClient(":memory:") with a fake summarizer - no models.
+"""
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_digest, _qdrant = load_memory_module("services.digest", "services.qdrant_client")
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+DIM = 768
+
+
+def _vec(i):
+    return [1.0 if j == i % DIM else 0.0 for j in range(DIM)]
+
+
+class _Summarizer:
+    """Records each batch; the "summary" is the input text itself."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts, max_words):
+        self.batches.append(list(texts))
+        return [f"S[{t}]" for t in texts]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "test_collection")
+    fake = QdrantClient(":memory:")
+    monkeypatch.setattr(_qdrant, "_client_instance", fake)
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+    _qdrant._ensure_collection()
+    return fake
+
+
+@pytest.fixture
+def worker():
+    summarizer = _Summarizer()
+    w = _digest.DigestWorker(summarizer, lambda texts: [_vec(0) for _ in texts], batch_size=2)
+    w.summarizer = summarizer
+    return w
+
+
+def _save_facts(client, user_id, facts, start=0):
+    client.upsert(
+        collection_name="test_collection",
+        points=[
+            models.PointStruct(
+                id=start + i, vector=_vec(start + i), payload={"user_id": user_id, "facts": f}
+            )
+            for i, f in enumerate(facts)
+        ],
+    )
+
+
+class TestDigestInput:
+    def test_new_user_is_full(self):
+        assert _digest.digest_input(None, {1: "a", 2: "b"}) == ("a. b", "full")
+
+    def test_unchanged_is_skipped(self):
+        previous = {"summary": "S", "fact_ids": [1, 2]}
+        assert _digest.digest_input(previous, {1: "a", 2: "b"}) is None
+
+    def test_added_facts_are_incremental(self):
+        previous = {"summary": "S", "fact_ids": [1]}
+        assert _digest.digest_input(previous, {1: "a", 2: "b"}) == ("S\nb", "incremental")
+
+    def test_removed_facts_rebuild(self):
+        previous = {"summary": "S", "fact_ids": [1, 2]}
+        assert _digest.digest_input(previous, {1: "a"}) == ("a", "full")
+
+
+class TestWorker:
+    def test_builds_digest_for_dirty_user(self, client, worker):
+        _save_facts(client, "u", ["name: Ian", "job: dev"])
+        worker.mark_dirty("u")
+        assert worker.run_once() == 1
+
+        digest = _digest.load_digest("u")
+        assert digest["summary"] == "S[name: Ian. job: dev]"
+        assert digest["fact_count"] == 2
+        assert digest["mode"] == "full"
+
+    def test_incremental_update(self, client, worker):
+        _save_facts(client, "u", ["name: Ian"])
+        worker.mark_dirty("u")
+        worker.run_once()
+
+        _save_facts(client, "u", ["job: dev"], start=10)
+        worker.mark_dirty("u")
+        worker.run_once()
+
+        digest = _digest.load_digest("u")
+        assert digest["summary"] == "S[S[name: Ian]\njob: dev]"
+        assert digest["mode"] == "incremental"
+
+    def test_users_summarized_in_batches(self, client, worker):
+        for n, user in enumerate(["a", "b", "c"]):
+            _save_facts(client, user, [f"fact {user}"], start=n * 10)
+            worker.mark_dirty(user)
+        worker.run_once()
+        assert [len(b) for b in worker.summarizer.batches] == [2, 1]
+
+    def test_digest_hidden_from_user_search(self, client, worker):
+        _save_facts(client, "u", ["name: Ian"])
+        worker.mark_dirty("u")
+        worker.run_once()
+
+        hits = _qdrant.search_user_points("u", _vec(0), 10)
+        assert [h.id for h in hits] == [0]
+
+    def test_digest_removed_when_facts_gone(self, client, worker):
+        _save_facts(client, "u", ["name: Ian"])
+        worker.mark_dirty("u")
+        worker.run_once()
+
+        client.delete(
+            collection_name="test_collection",
+            points_selector=models.PointIdsList(points=[0]),
+        )
+        worker.mark_dirty("u")
+        worker.run_once()
+        assert _digest.load_digest("u") is None
+
+    def test_reconcile_finds_stale_users(self, client, worker):
+        _save_facts(client, "u", ["name: Ian"])
+        _save_facts(client, "v", ["name: Bo"], start=10)
+        assert worker.reconcile() == 2
+        worker.run_once()
+
+        # Up to date now; a write from elsewhere makes only "v" stale
+        assert worker.reconcile() == 0
+        _save_facts(client, "v", ["job: dev"], start=20)
+        assert worker.reconcile() == 1
+
+    def test_failed_batch_is_retried(self, client):
+        def broken(texts, max_words):
+            raise RuntimeError("pipeline OOM")
+
+        w = _digest.DigestWorker(broken, lambda texts: [])
+        _save_facts(client, "u", ["name: Ian"])
+        w.mark_dirty("u")
+        w.run_once()
+        assert w.stats()["dirty_users"] == 1
+        assert w.stats()["errors"] == 1
+
+
+class TestInbox:
+    def test_users_queued_once_and_taken_once(self, tmp_path):
+        inbox = _digest.DigestInbox(tmp_path / "journal.sqlite3")
+        inbox.add(["u", "v"])
+        inbox.add(["u"])
+        assert inbox.count() == 2
+        assert sorted(inbox.take()) == ["u", "v"]
+        assert inbox.take() == []
+
+    def test_leader_builds_digests_queued_by_other_workers(self, client, tmp_path):
+        path = tmp_path / "journal.sqlite3"
+        _digest.DigestInbox(path).add(["u"])  # another worker's save
+
+        summarizer = _Summarizer()
+        leader = _digest.DigestWorker(
+            summarizer, lambda texts: [_vec(0) for _ in texts], inbox=_digest.DigestInbox(path)
+        )
+        _save_facts(client, "u", ["name: Ian"])
+        assert leader.run_once() == 1
+        assert _digest.load_digest("u")["summary"] == "S[name: Ian]"
+
+
+class TestStartDigests:
+    @pytest.fixture
+    def api(self, memory_api, memory_client, monkeypatch, tmp_path):
+        api, _ = memory_api
+        monkeypatch.setenv("DIGEST_ENABLED", "true")
+        monkeypatch.setenv("SAVE_JOURNAL_PATH", str(tmp_path / "journal.sqlite3"))
+        monkeypatch.setattr(api, "_workers", 2)
+        yield api
+        api.stop_digests()
+
+    def test_only_the_leader_runs_a_worker(self, api, monkeypatch, tmp_path):
+        monkeypatch.setenv("MEMORY_WORKER_INDEX", "1")
+        api.start_digests()
+        assert api._digest_worker is None
+        api._mark_digests_dirty(["u"])
+        assert api.memory_stats()["digests"] == {
+            "enabled": True,
+            "leader": False,
+            "queued_users": 1,
+        }
+        api.stop_digests()
+
+        monkeypatch.setenv("MEMORY_WORKER_INDEX", "0")
+        monkeypatch.setenv("DIGEST_INTERVAL", "3600")
+        api.start_digests()
+        assert api._digest_worker is not None
+        assert api._digest_worker.inbox.take() == ["u"]
@@ -0,0 +1,118 @@
+"""
+Unit tests for the memory embedding scheduler (cross-request micro-batching).
+
+Uses a fake encode function so no model is needed.
+"""
+
+import os
+import threading
+import importlib.util
+
+import pytest
+
+# Load embed_scheduler module directly from memory layer
+_scheduler_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "embed_scheduler.py",
+)
+_spec = importlib.util.spec_from_file_location(
+    "memory_embed_scheduler", _scheduler_path
+)
+_embed_scheduler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_embed_scheduler)
+
+EmbeddingScheduler = _embed_scheduler.EmbeddingScheduler
+
+
+def _fake_encode(calls):
+    """Encode each text as [len(text), batch_size] and record batch sizes."""
+
+    def encode(texts):
+        calls.append(len(texts))
+        return [[float(len(t)), float(len(texts))] for t in texts]
+
+    return encode
+
+
+class TestSubmit:
+    """Tests for EmbeddingScheduler.submit."""
+
+    def test_returns_vectors_in_order(self):
+        """Each text gets its own vector, in input order."""
+        calls = []
+        scheduler = EmbeddingScheduler(_fake_encode(calls), max_wait_ms=0)
+        result = scheduler.submit(["a", "bbb", "cc"])
+        assert [v[0] for v in result] == [1.0, 3.0, 2.0]
+
+    def test_empty_input(self):
+        """Empty submissions never reach the model."""
+        calls = []
+        scheduler = EmbeddingScheduler(_fake_encode(calls))
+        assert scheduler.submit([]) == []
+        assert calls == []
+
+    def test_errors_propagate_to_caller(self):
+        """An encode failure is raised in the submitting thread."""
+
+        def broken(texts):
+            raise RuntimeError("model exploded")
+
+        scheduler = EmbeddingScheduler(broken, max_wait_ms=0)
+        with pytest.raises(RuntimeError, match="model exploded"):
+            scheduler.submit(["x"])
+
+
+class TestBatching:
+    """Concurrent callers share batches."""
+
+    def test_concurrent_calls_are_batched(self):
+        """Requests that arrive within the wait window share one encode call."""
+        calls = []
+        scheduler = EmbeddingScheduler(
+            _fake_encode(calls), max_batch_size=64, max_wait_ms=200
+        )
+        results = {}
+        barrier = threading.Barrier(8)
+
+        def worker(i):
+            barrier.wait()
+            results[i] = scheduler.submit(["x" * (i + 1)])[0]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert sum(calls) == 8
+        assert len(calls) < 8
+        # Every caller got back the vector for its own text
+        for i, vec in results.items():
+            assert vec[0] == float(i + 1)
+
+    def test_max_batch_size_flushes_early(self):
+        """A full batch is flushed without waiting for the timeout."""
+        calls = []
+        scheduler = EmbeddingScheduler(
+            _fake_encode(calls), max_batch_size=2, max_wait_ms=10_000
+        )
+        scheduler.submit(["a", "b"])
+        assert calls == [2]
+
+    def test_stats(self):
+        """Stats report batch counts and the size histogram."""
+        calls = []
+        scheduler = EmbeddingScheduler(_fake_encode(calls), max_wait_ms=0)
+        scheduler.submit(["a"])
+        scheduler.submit(["a", "b", "c"])
+        stats = scheduler.stats()
+        assert stats["batches"] == 2
+        assert stats["texts"] == 4
+        assert stats["avg_batch_size"] == 2.0
+        assert stats["max_observed_batch"] == 3
+        assert stats["batch_size_histogram"]["<=1"] == 1
+        assert stats["batch_size_histogram"]["<=4"] == 1
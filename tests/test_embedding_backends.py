@@ -0,0 +1,89 @@
+"""
+Unit tests for the model-free stub embedding backend used by load tests
+(deterministic, normalized, word overlap -> similarity), and for
+load_backend's provider selection and fallback.
+"""
+
+import os
+import importlib.util
+
+import numpy as np
+import pytest
+
+_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "embedding_backends.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_embedding_backends", _path)
+_backends = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_backends)
+
+
+class TestStubBackend:
+    def test_registered_and_loaded_without_a_model(self):
+        backend = _backends.load_backend("stub", "all-mpnet-base-v2")
+        assert isinstance(backend, _backends.StubBackend)
+        assert backend.loaded and backend.dim == 768
+
+    def test_deterministic_unit_vectors(self):
+        backend = _backends.StubBackend("m")
+        vecs = backend.encode(["likes coffee", "likes coffee", ""])
+        assert vecs.shape == (3, 768) and vecs.dtype == np.float32
+        np.testing.assert_allclose(np.linalg.norm(vecs, axis=1), 1.0, rtol=1e-6)
+        np.testing.assert_array_equal(vecs[0], vecs[1])
+
+    def test_shared_words_are_closer(self):
+        a, b, c = _backends.StubBackend("m").encode(
+            ["drinks black coffee", "black coffee every morning", "golden retriever named max"]
+        )
+        assert a @ b > a @ c
+
+
+class _Reference(_backends.StubBackend):
+    """Stands in for SentenceTransformerBackend (no model download)."""
+
+    provider = "sentence_transformers"
+
+
+class _Broken(_backends.EmbeddingBackend):
+    provider = "onnx_int8"
+
+    def __init__(self, model_name):
+        raise ImportError("onnxruntime is not installed")
+
+
+class TestLoadBackend:
+    @pytest.fixture(autouse=True)
+    def reference(self, monkeypatch):
+        monkeypatch.setattr(_backends, "SentenceTransformerBackend", _Reference)
+        monkeypatch.setitem(_backends.BACKENDS, "sentence_transformers", _Reference)
+
+    def test_provider_name_is_normalized(self):
+        backend = _backends.load_backend("  STUB ", "m")
+        assert isinstance(backend, _backends.StubBackend)
+        assert not isinstance(backend, _Reference)
+
+    def test_unknown_provider_falls_back_to_sentence_transformers(self):
+        assert isinstance(_backends.load_backend("tensorrt", "m"), _Reference)
+
+    def test_failing_backend_falls_back_to_sentence_transformers(self, monkeypatch):
+        monkeypatch.setitem(_backends.BACKENDS, "onnx_int8", _Broken)
+        backend = _backends.load_backend("onnx_int8", "m")
+        assert isinstance(backend, _Reference)
+        assert backend.provider == "sentence_transformers"
+
+    def test_failing_sentence_transformers_is_raised(self, monkeypatch):
+        class Missing(_Broken):
+            provider = "sentence_transformers"
+
+        monkeypatch.setattr(_backends, "SentenceTransformerBackend", Missing)
+        monkeypatch.setitem(_backends.BACKENDS, "sentence_transformers", Missing)
+        with pytest.raises(ImportError):
+            _backends.load_backend("sentence_transformers", "m")
+        # An unknown provider lands on the same backend, so it raises too
+        with pytest.raises(ImportError):
+            _backends.load_backend("tensorrt", "m")
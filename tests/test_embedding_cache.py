@@ -0,0 +1,135 @@
+"""
+Unit tests for the memory embedding cache (LRU + memory-mapped disk tier).
+"""
+
+import os
+import importlib.util
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Load embedding_cache module directly from memory layer
+_cache_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "embedding_cache.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_embedding_cache", _cache_path)
+_embedding_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_embedding_cache)
+
+EmbeddingCache = _embedding_cache.EmbeddingCache
+cache_key = _embedding_cache.cache_key
+
+
+def _vec(seed: float, dim: int = 4) -> list:
+    return [seed] * dim
+
+
+class TestCacheKey:
+    """Tests for cache_key."""
+
+    def test_whitespace_is_normalized(self):
+        """Extra whitespace does not change the key."""
+        assert cache_key("m", "name:  Ian ") == cache_key("m", "name: Ian")
+
+    def test_case_is_preserved(self):
+        """The model is case-sensitive, so the key is too."""
+        assert cache_key("m", "Sarah") != cache_key("m", "sarah")
+
+    def test_model_is_part_of_key(self):
+        """Different models never share entries."""
+        assert cache_key("a", "text") != cache_key("b", "text")
+
+
+class TestMemoryTier:
+    """Tests for the in-memory LRU."""
+
+    def test_miss_then_hit(self):
+        """A stored vector is returned on the next lookup."""
+        cache = EmbeddingCache("m", max_entries=10, dim=4)
+        assert cache.get_many(["a"]) == [None]
+        cache.put_many(["a"], [_vec(1.0)])
+        assert cache.get_many(["a"]) == [_vec(1.0)]
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = EmbeddingCache("m", max_entries=2, dim=4)
+        cache.put_many(["a", "b"], [_vec(1.0), _vec(2.0)])
+        cache.get_many(["a"])  # touch a, so b is oldest
+        cache.put_many(["c"], [_vec(3.0)])
+        assert cache.get_many(["a", "b", "c"]) == [_vec(1.0), None, _vec(3.0)]
+
+    def test_disabled_when_size_zero(self):
+        """max_entries=0 turns the cache off."""
+        assert not EmbeddingCache("m", max_entries=0).enabled
+
+
+class TestDiskTier:
+    """Tests for the memory-mapped disk tier."""
+
+    def test_survives_restart(self, tmp_path):
+        """Vectors written by one cache instance are read by the next."""
+        first = EmbeddingCache("m", max_entries=10, dim=4, disk_path=tmp_path, disk_capacity=8)
+        first.put_many(["persist me"], [_vec(0.5)])
+        first.flush()
+
+        second = EmbeddingCache("m", max_entries=10, dim=4, disk_path=tmp_path, disk_capacity=8)
+        assert second.get_many(["persist me"]) == [_vec(0.5)]
+        assert second.stats()["disk_hits"] == 1
+
+    def test_ring_reuses_slots(self, tmp_path):
+        """Once full, the oldest disk slot is overwritten."""
+        cache = EmbeddingCache("m", max_entries=1, dim=4, disk_path=tmp_path, disk_capacity=2)
+        cache.put_many(["a", "b", "c"], [_vec(1.0), _vec(2.0), _vec(3.0)])
+        assert cache.stats()["disk_size"] == 2
+        assert cache.get_many(["a"]) == [None]
+        assert cache.get_many(["b"]) == [_vec(2.0)]
+
+    def test_layout_change_resets(self, tmp_path):
+        """A different vector dimension starts a fresh disk tier."""
+        first = EmbeddingCache("m", dim=4, disk_path=tmp_path, disk_capacity=8)
+        first.put_many(["a"], [_vec(1.0)])
+        first.flush()
+        second = EmbeddingCache("m", dim=8, disk_path=tmp_path, disk_capacity=8)
+        assert second.stats()["disk_size"] == 0
+
+    @pytest.mark.parametrize("damage", ["missing", "truncated"])
+    def test_damaged_vectors_file_resets(self, tmp_path, damage):
+        """keys.bin without a full vectors.f32 starts fresh instead of raising."""
+        first = EmbeddingCache("m", dim=4, disk_path=tmp_path, disk_capacity=8)
+        first.put_many(["a"], [_vec(1.0)])
+        first.flush()
+        vectors = tmp_path / "vectors.f32"
+        if damage == "missing":
+            vectors.unlink()
+        else:
+            vectors.write_bytes(vectors.read_bytes()[:10])
+
+        second = EmbeddingCache("m", dim=4, disk_path=tmp_path, disk_capacity=8)
+        assert second.stats()["disk_size"] == 0
+        assert vectors.stat().st_size == 8 * 4 * 4
+        second.put_many(["b"], [_vec(2.0)])
+        assert second.get_many(["b"]) == [_vec(2.0)]
+
+    def test_unusable_directory_falls_back_to_memory(self, tmp_path):
+        """A disk tier that can't be opened leaves a memory-only cache."""
+        blocker = tmp_path / "not-a-dir"
+        blocker.write_text("")
+        cache = EmbeddingCache("m", dim=4, disk_path=blocker, disk_capacity=8)
+        cache.put_many(["a"], [_vec(1.0)])
+        assert cache.get_many(["a"]) == [_vec(1.0)]
+        assert cache.stats()["disk_size"] is None
+
+    def test_no_disk_tier_when_disabled(self, tmp_path):
+        """EMBED_CACHE_SIZE=0 never creates the ring files."""
+        EmbeddingCache("m", max_entries=0, dim=4, disk_path=tmp_path / "cache", disk_capacity=8)
+        assert not (tmp_path / "cache").exists()
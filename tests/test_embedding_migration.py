@@ -0,0 +1,290 @@
+"""
+Unit tests for the online embedding migration (throttled backfill from
+stored text, catch-up of racing / failed dual-writes, resume from the state file, catch-up
+and switch).
+
+Runs against QdrantClient(":memory:") with a fake 4-dim "new model".
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_migration, _qdrant = load_memory_module("services.embedding_migration", "services.qdrant_client")
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+DIM = 768
+TARGET = "memories__new_model"
+
+
+def _vec(i):
+    return [1.0 if j == i % DIM else 0.0 for j in range(DIM)]
+
+
+class _Encoder:
+    """Fake target model: 4-dim vectors; can run a hook mid-batch."""
+
+    def __init__(self):
+        self.calls = []
+        self.hook = None
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.hook is not None:
+            hook, self.hook = self.hook, None
+            hook()
+        return [[float(len(t)), 1.0, 0.0, 0.0] for t in texts]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "memories")
+    fake = QdrantClient(":memory:")
+    monkeypatch.setattr(_qdrant, "_client_instance", fake)
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+    _qdrant._ensure_collection()
+    fake.upsert(
+        collection_name="memories",
+        points=[
+            models.PointStruct(id=1, vector=_vec(1), payload={"user_id": "u", "facts": "name: Ian"}),
+            models.PointStruct(id=2, vector=_vec(2), payload={"user_id": "u", "user_text": "chunk"}),
+            models.PointStruct(id=3, vector=_vec(3), payload={"digest_user_id": "u", "summary": "S"}),
+            models.PointStruct(id=4, vector=_vec(4), payload={"user_id": "u"}),
+        ],
+    )
+    return fake
+
+
+def _make(tmp_path, encoder, switched=None, **kwargs):
+    state = _migration.new_state("memories", "old-model", "New/Model", 4)
+    return _migration.EmbeddingMigration(
+        state,
+        str(tmp_path / "state.json"),
+        encode=encoder,
+        on_switch=switched.append if switched is not None else (lambda target: None),
+        batch_size=kwargs.pop("batch_size", 2),
+        rate=0,
+        **kwargs,
+    )
+
+
+def _backfill(m):
+    m.prepare()
+    while m.backfill_batch():
+        pass
+
+
+class TestHelpers:
+    def test_versioned_collection(self):
+        assert _migration.versioned_collection("memories", "sentence-transformers/all-MiniLM-L6-v2") == (
+            "memories__sentence_transformers_all_minilm_l6_v2"
+        )
+
+    def test_second_migration_keeps_base_name(self):
+        state = _migration.new_state(TARGET, "New/Model", "other", 8)
+        assert state["target"]["collection"] == "memories__other"
+
+    def test_embedding_text(self):
+        assert _migration.embedding_text({"facts": "a", "user_text": "b"}) == "a"
+        assert _migration.embedding_text({"summary": "s"}) == "s"
+        assert _migration.embedding_text({"user_id": "u"}) is None
+
+
+class TestBackfill:
+    def test_reembeds_from_stored_text(self, client, tmp_path):
+        m = _make(tmp_path, _Encoder())
+        _backfill(m)
+
+        assert client.get_collection(TARGET).config.params.vectors.size == 4
+        copied = {p.id: p for p in client.scroll(TARGET, with_vectors=True)[0]}
+        assert sorted(copied) == [1, 2, 3]
+        assert copied[2].payload == {"user_id": "u", "user_text": "chunk"}
+        assert m.progress()["done"] == 4 and m.progress()["skipped"] == 1
+
+    def test_resumes_from_saved_cursor(self, client, tmp_path):
+        encoder = _Encoder()
+        m = _make(tmp_path, encoder)
+        m.prepare()
+        m.backfill_batch()
+
+        state = _migration.load_state(str(tmp_path / "state.json"))
+        resumed = _migration.EmbeddingMigration(
+            state, str(tmp_path / "state.json"), encode=encoder, on_switch=lambda t: None, rate=0
+        )
+        assert resumed.backfill_batch() is False
+        assert client.count(TARGET).count == 3
+        assert sum(len(c) for c in encoder.calls) == 3  # nothing embedded twice
+
+    def test_catch_up_repairs_stale_backfill_copy(self, client, tmp_path):
+        encoder = _Encoder()
+        m = _make(tmp_path, encoder, batch_size=10)
+        m.prepare()
+
+        # A save lands (possibly in another worker) while the batch is embedded
+        newer = models.PointStruct(
+            id=1,
+            vector=_vec(1),
+            payload={"user_id": "u", "facts": "name: Ian Smith", "saved_at": m.state["started_at"] + 1},
+        )
+
+        def save():
+            client.upsert("memories", points=[newer])
+            m.dual_write([newer])
+
+        encoder.hook = save
+        m.backfill_batch()
+        assert client.retrieve(TARGET, ids=[1])[0].payload["facts"] == "name: Ian"
+
+        assert m.catch_up()["recopied"] == 1
+        assert client.retrieve(TARGET, ids=[1])[0].payload["facts"] == "name: Ian Smith"
+
+    def test_failed_dual_write_is_recopied(self, client, tmp_path):
+        m = _make(tmp_path, _Encoder())
+        _backfill(m)
+        point = models.PointStruct(
+            id=5, vector=_vec(5), payload={"user_id": "u", "facts": "x", "saved_at": m.state["started_at"]}
+        )
+        client.upsert("memories", points=[point])  # dual-write never happened
+
+        assert m.catch_up()["recopied"] == 1
+        assert client.retrieve(TARGET, ids=[5])
+
+
+class TestSwitch:
+    def test_switch_requires_finished_backfill(self, client, tmp_path):
+        m = _make(tmp_path, _Encoder())
+        with pytest.raises(RuntimeError):
+            m.switch()
+
+    def test_catch_up_then_switch(self, client, tmp_path):
+        switched = []
+        m = _make(tmp_path, _Encoder(), switched)
+        _backfill(m)
+        client.delete("memories", points_selector=models.PointIdsList(points=[2]))
+        m.state["phase"] = _migration.READY
+
+        m.switch()
+        assert sorted(p.id for p in client.scroll(TARGET)[0]) == [1, 3]
+        assert switched == [m.state["target"]]
+        assert _migration.load_state(str(tmp_path / "state.json"))["phase"] == _migration.SWITCHED
+
+    def test_worker_runs_to_switch(self, client, tmp_path):
+        switched = []
+        m = _make(tmp_path, _Encoder(), switched, settle=0)
+        m.start()
+        m._thread.join(timeout=10)
+        assert m.phase == _migration.SWITCHED
+        assert m.finished and m.state["settled"]
+        assert len(switched) == 1
+
+    def test_switch_waits_for_saves_in_flight(self, client, tmp_path):
+        switched = []
+        m = _make(tmp_path, _Encoder(), switched)
+        _backfill(m)
+        m.state["phase"] = _migration.READY
+        saving = threading.Event()
+        release = threading.Event()
+        point = models.PointStruct(
+            id=6, vector=_vec(6), payload={"user_id": "u", "facts": "late", "saved_at": time.time()}
+        )
+
+        def save():
+            with m.writes.writing():
+                saving.set()
+                release.wait(5)
+                client.upsert("memories", points=[point])
+                m.dual_write([point])
+
+        writer = threading.Thread(target=save)
+        writer.start()
+        saving.wait(5)
+        switcher = threading.Thread(target=m.switch)
+        switcher.start()
+        time.sleep(0.2)
+        assert switched == []  # held back by the save in flight
+
+        release.set()
+        writer.join(5)
+        switcher.join(5)
+        assert switched == [m.state["target"]]
+        assert client.retrieve(TARGET, ids=[6])  # dual-written before the switch
+
+    def test_leader_recopies_source_saves_after_switch(self, client, tmp_path):
+        m = _make(tmp_path, _Encoder(), settle=0)
+        _backfill(m)
+        m.state["phase"] = _migration.READY
+        m.switch()
+        assert not m.finished
+
+        # Another worker still on the source; its dual-write failed
+        straggler = models.PointStruct(
+            id=7, vector=_vec(7), payload={"user_id": "u", "facts": "straggler", "saved_at": time.time()}
+        )
+        client.upsert("memories", points=[straggler])
+        # A save that went straight to the target after the switch
+        client.upsert(TARGET, points=[models.PointStruct(id=8, vector=[1.0, 0, 0, 0], payload={"facts": "new"})])
+
+        m.start()
+        m._thread.join(timeout=10)
+        assert m.finished
+        assert sorted(p.id for p in client.scroll(TARGET)[0]) == [1, 2, 3, 7, 8]
+        assert _migration.load_state(str(tmp_path / "state.json"))["settled"]
+
+    def test_follower_applies_switch_from_state_file(self, client, tmp_path):
+        leader = _make(tmp_path, _Encoder())
+        _backfill(leader)
+        switched = []
+        follower = _make(tmp_path, _Encoder(), switched, leader=False)
+        leader.state["phase"] = _migration.READY
+        leader.switch()
+
+        follower.switch()  # picks up the leader's switch instead of redoing it
+        assert follower.phase == _migration.SWITCHED
+        assert switched == [leader.state["target"]]
+
+
+class TestPreload:
+    """preload_models() runs in the serve.py master, so workers share its models."""
+
+    @pytest.fixture
+    def api(self, memory_api, tmp_path, monkeypatch):
+        api, _ = memory_api
+        monkeypatch.setenv("EMBEDDING_PROVIDER", "stub")
+        monkeypatch.setenv("EMBEDDING_MIGRATION_STATE", str(tmp_path / "migration.json"))
+        monkeypatch.setenv("SHARD_STATE", str(tmp_path / "shards.json"))
+        monkeypatch.setattr(api, "_preloaded", {})
+        loads = []
+        real = api.load_model
+        monkeypatch.setattr(api, "load_model", lambda name: loads.append(name) or real(name))
+        api.loads = loads
+        return api
+
+    def _state(self, tmp_path, api, phase):
+        state = _migration.new_state("memories", api.current_model(), "other-model", 768)
+        state["phase"] = phase
+        _migration.save_state(str(tmp_path / "migration.json"), state)
+
+    def test_unfinished_migration_target_is_loaded_once(self, api, tmp_path):
+        self._state(tmp_path, api, _migration.BACKFILL)
+        api.preload_models()
+
+        assert api.loads == ["other-model"]
+        assert api._load_model("other-model") is api._preloaded["other-model"]
+        assert api.loads == ["other-model"]  # the worker reuses the master's copy
+
+    def test_switched_model_replaces_startup_model(self, api, tmp_path, monkeypatch):
+        used = []
+        monkeypatch.setattr(api, "use_backend", used.append)
+        self._state(tmp_path, api, _migration.SWITCHED)
+        api.preload_models()
+
+        assert api.loads == ["other-model"]
+        assert [b.model_name for b in used] == ["other-model"]
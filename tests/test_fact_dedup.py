@@ -0,0 +1,157 @@
+"""
+Unit tests for write-time semantic fact dedup (in-batch collapse and
+payload merging), and end to end through /save and /save-batch on the stub
+embedder (hashed bag of words: the same words in another order are a
+paraphrase) with QdrantClient(":memory:").
+"""
+
+import os
+import importlib.util
+
+import pytest
+
+pytest.importorskip("numpy")
+
+# Load fact_dedup module directly from memory layer
+_dedup_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "fact_dedup.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_fact_dedup", _dedup_path)
+_dedup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_dedup)
+
+collapse_batch = _dedup.collapse_batch
+merge_payload = _dedup.merge_payload
+
+
+class TestCollapseBatch:
+    def test_paraphrase_folds_into_first(self):
+        vectors = [[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]]
+        into = collapse_batch(["u", "u", "u"], vectors, [True, True, True], 0.9)
+        assert into == {1: 0}
+
+    def test_threshold_respected(self):
+        vectors = [[1.0, 0.0], [0.7, 0.7]]
+        assert collapse_batch(["u", "u"], vectors, [True, True], 0.9) == {}
+
+    def test_different_users_never_merge(self):
+        vectors = [[1.0, 0.0], [1.0, 0.0]]
+        assert collapse_batch(["u", "v"], vectors, [True, True], 0.9) == {}
+
+    def test_chunks_are_ignored(self):
+        vectors = [[1.0, 0.0], [1.0, 0.0]]
+        assert collapse_batch(["u", "u"], vectors, [True, False], 0.9) == {}
+
+    def test_unnormalized_vectors(self):
+        vectors = [[2.0, 0.0], [5.0, 0.1]]
+        assert collapse_batch(["u", "u"], vectors, [True, True], 0.95) == {1: 0}
+
+
+class TestMergePayload:
+    def test_newest_phrasing_wins_and_variants_kept(self):
+        merged = merge_payload(
+            {"user_id": "u", "facts": "wife: Sarah"},
+            {"user_id": "u", "facts": "spouse: Sarah", "source_type": "prompt"},
+        )
+        assert merged["facts"] == "spouse: Sarah"
+        assert merged["variants"] == ["wife: Sarah", "spouse: Sarah"]
+        assert merged["merged"] == 1
+        assert merged["source_type"] == "prompt"
+
+    def test_variants_capped_and_unique(self):
+        payload = {"facts": "a"}
+        for text in ["b", "a", "c", "d", "e", "f", "g"]:
+            payload = merge_payload(payload, {"facts": text})
+        assert len(payload["variants"]) == _dedup.MAX_VARIANTS
+        assert len(set(payload["variants"])) == len(payload["variants"])
+        assert payload["variants"][-1] == "g"
+        assert payload["merged"] == 7
+
+
+@pytest.fixture
+def api(memory_api, memory_client, monkeypatch):
+    api, _ = memory_api
+    monkeypatch.setattr(api, "_dedup_threshold", 0.9)
+    return api
+
+
+def _save(api, user_id, *values):
+    req = api.SaveRequest(
+        user_id=user_id,
+        messages=[{"role": "user", "content": "..."}],
+        facts=[{"type": "likes", "value": v} for v in values],
+    )
+    return api.save_memory(req)
+
+
+def _user_filter(user_id):
+    from qdrant_client.http import models
+
+    return models.Filter(
+        must=[models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id))]
+    )
+
+
+def _stored(client, user_id):
+    records, _ = client.scroll(
+        "api_test_collection",
+        scroll_filter=_user_filter(user_id),
+        with_payload=True,
+        limit=100,
+    )
+    return records
+
+
+class TestSaveDedup:
+    def test_paraphrase_merges_into_stored_fact(self, api, memory_client):
+        first = _save(api, "u1", "coffee and tea")
+        second = _save(api, "u1", "tea and coffee")
+
+        assert second["facts_saved"] == 0
+        assert second["facts_deduped"] == 1
+        assert second["point_id"] == first["point_id"]
+        [point] = _stored(memory_client, "u1")
+        assert point.payload["facts"] == "likes: tea and coffee"
+        assert point.payload["variants"] == ["likes: coffee and tea", "likes: tea and coffee"]
+        assert point.payload["merged"] == 1
+
+    def test_distinct_value_of_same_type_is_kept(self, api, memory_client):
+        _save(api, "u2", "coffee")
+        response = _save(api, "u2", "green tea")
+
+        assert response["facts_saved"] == 1
+        assert response["facts_deduped"] == 0
+        assert sorted(p.payload["facts"] for p in _stored(memory_client, "u2")) == [
+            "likes: coffee", "likes: green tea",
+        ]
+
+    def test_in_batch_duplicate_of_stored_fact_resolves_to_it(self, api, memory_client):
+        stored = _save(api, "u3", "coffee and tea")
+        response = api.save_batch(
+            api.SaveBatchRequest(
+                user_id="u3",
+                items=[
+                    {"fact": {"type": "likes", "value": "tea and coffee"}},
+                    {"fact": {"type": "likes", "value": "and tea coffee"}},
+                    {"fact": {"type": "likes", "value": "hiking"}},
+                ],
+            )
+        )
+
+        statuses = [(item["status"], item["point_id"]) for item in response["items"]]
+        assert statuses[:2] == [("merged", stored["point_id"])] * 2
+        assert statuses[2][0] == "saved"
+        assert response["deduped"] == 2
+        assert len(_stored(memory_client, "u3")) == 2
+
+    def test_off_by_default(self, memory_api, memory_client):
+        api, _ = memory_api
+        assert api._dedup_threshold == 0
+        _save(api, "u4", "coffee and tea")
+        assert _save(api, "u4", "tea and coffee")["facts_deduped"] == 0
+        assert len(_stored(memory_client, "u4")) == 2
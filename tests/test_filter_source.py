@@ -0,0 +1,94 @@
+"""
+Unit tests for the in-memory filter source cache behind /api/agent
+(reload on change, fallback path, ETag / Last-Modified validation, and
+Accept-Encoding q-values).
+"""
+
+import gzip
+import hashlib
+import os
+import importlib.util
+
+import pytest
+
+_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "filter_source.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_filter_source", _path)
+_filter_source = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_filter_source)
+
+FilterSource = _filter_source.FilterSource
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / "aj.filter.py"
+    path.write_text("class Filter:\n    pass\n", encoding="utf-8")
+    return path
+
+
+class TestFilterSource:
+    def test_cached_until_file_changes(self, source_file):
+        source = FilterSource([source_file])
+        first = source.get()
+        assert source.get() is first
+        assert source.reloads == 1
+        assert gzip.decompress(first.gzipped) == first.body
+        assert first.sha256 == hashlib.sha256(first.body).hexdigest()
+
+        source_file.write_text("class Filter:\n    version = 2\n", encoding="utf-8")
+        os.utime(source_file, ns=(first.stat_key[0] + 10**9,) * 2)
+        second = source.get()
+        assert second.body.endswith(b"version = 2\n")
+        assert second.etag != first.etag
+
+    def test_falls_back_and_keeps_last_good_version(self, tmp_path, source_file):
+        source = FilterSource([tmp_path / "missing.py", source_file])
+        version = source.get()
+        assert version.path == str(source_file)
+
+        source_file.unlink()
+        assert source.get() is version
+        with pytest.raises(FileNotFoundError):
+            FilterSource([tmp_path / "missing.py"]).get()
+
+    def test_conditional_matching(self, source_file):
+        version = FilterSource([source_file]).get()
+        assert version.matches(version.etag, None)
+        assert version.matches(f'"other", W/{version.etag}', None)
+        assert version.matches("*", None)
+        assert not version.matches('"other"', None)
+        assert version.matches(None, version.last_modified)
+        assert not version.matches(None, "Thu, 01 Jan 1970 00:00:00 GMT")
+        # If-None-Match takes precedence over If-Modified-Since
+        assert not version.matches('"other"', version.last_modified)
+
+    def test_gzip_body_has_its_own_etag(self, source_file):
+        version = FilterSource([source_file]).get()
+        assert version.gzip_etag != version.etag
+        assert version.gzip_etag.endswith('-gz"')
+        assert version.matches(version.gzip_etag, None, version.gzip_etag)
+        assert not version.matches(version.etag, None, version.gzip_etag)
+        assert not version.matches(version.gzip_etag, None)
+
+
+class TestAcceptsGzip:
+    @pytest.mark.parametrize(
+        "header",
+        ["gzip", "GZIP", "br, gzip;q=0.5", "deflate, x-gzip", "*", "identity, *;q=0.1", "gzip;q=1, *;q=0"],
+    )
+    def test_accepted(self, header):
+        assert _filter_source.accepts_gzip(header)
+
+    @pytest.mark.parametrize(
+        "header",
+        [None, "", "identity", "br", "gzip;q=0", "gzip; q=0.0, br", "*;q=0", "gzip;q=0, *", "gzip;q=x"],
+    )
+    def test_refused(self, header):
+        assert not _filter_source.accepts_gzip(header)
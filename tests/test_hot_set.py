@@ -0,0 +1,190 @@
+"""
+Unit tests for the memory service's in-process user hot set
+(NumPy brute-force top-k with LRU eviction).
+"""
+
+import os
+import importlib.util
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# Load hot_set module directly from memory layer
+_hot_set_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "hot_set.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_hot_set", _hot_set_path)
+_hot_set = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_hot_set)
+
+UserHotSet = _hot_set.UserHotSet
+
+
+def _unit(i: int, dim: int = 8) -> list:
+    """One-hot unit vector - makes expected rankings obvious."""
+    v = [0.0] * dim
+    v[i] = 1.0
+    return v
+
+
+class _Loader:
+    """Fake Qdrant loader that counts calls."""
+
+    def __init__(self, users):
+        self.users = users
+        self.calls = 0
+
+    def __call__(self, user_id, max_points):
+        self.calls += 1
+        points = self.users.get(user_id, [])
+        if len(points) > max_points:
+            return None
+        ids = [p[0] for p in points]
+        vectors = [p[1] for p in points]
+        payloads = [{"facts": f"fact {p[0]}"} for p in points]
+        return ids, vectors, payloads
+
+
+@pytest.fixture
+def loader():
+    return _Loader({"alice": [(i, _unit(i)) for i in range(5)]})
+
+
+class TestSearch:
+    """Top-k search over a user's matrix."""
+
+    def test_top_k_order(self, loader):
+        """Results come back best-first with cosine scores."""
+        hot = UserHotSet()
+        query = [0.0, 0.9, 0.1, 0.0, 0.0, 0.0, 0.0, 0.0]
+        hits = hot.search("alice", query, 2, loader)
+        assert [h[0] for h in hits] == [1, 2]
+        assert hits[0][1] == pytest.approx(0.9, abs=1e-5)
+        assert hits[0][2] == {"facts": "fact 1"}
+
+    def test_loads_once(self, loader):
+        """Second search is served from memory."""
+        hot = UserHotSet()
+        hot.search("alice", _unit(0), 3, loader)
+        hot.search("alice", _unit(1), 3, loader)
+        assert loader.calls == 1
+        assert hot.stats()["hits"] == 1
+
+    def test_k_larger_than_user(self, loader):
+        hot = UserHotSet()
+        assert len(hot.search("alice", _unit(0), 50, loader)) == 5
+
+    def test_large_user_falls_through(self, loader):
+        """Users over the point cap return None (search Qdrant instead)."""
+        hot = UserHotSet(max_user_points=3)
+        assert hot.search("alice", _unit(0), 3, loader) is None
+        # Remembered as too large - no second count
+        assert hot.search("alice", _unit(0), 3, loader) is None
+        assert loader.calls == 1
+
+    def test_float16(self, loader):
+        hot = UserHotSet(dtype="float16")
+        hits = hot.search("alice", _unit(3), 1, loader)
+        assert hits[0][0] == 3
+
+
+class TestWrites:
+    """Saves keep loaded users in sync."""
+
+    def test_apply_upsert_adds_and_replaces(self, loader):
+        hot = UserHotSet()
+        hot.search("alice", _unit(0), 1, loader)
+        hot.apply_upsert(
+            "alice",
+            [0, 7],
+            [_unit(7), _unit(6)],
+            [{"facts": "moved"}, {"facts": "new"}],
+        )
+        hits = hot.search("alice", _unit(7), 1, loader)
+        assert hits[0][0] == 0
+        assert hits[0][2] == {"facts": "moved"}
+        hits = hot.search("alice", _unit(6), 1, loader)
+        assert hits[0][0] == 7
+        assert loader.calls == 1
+
+    def test_upsert_for_unloaded_user_is_noop(self, loader):
+        hot = UserHotSet()
+        hot.apply_upsert("bob", [1], [_unit(1)], [{}])
+        assert hot.stats()["users"] == 0
+
+    def test_invalidate_reloads(self, loader):
+        hot = UserHotSet()
+        hot.search("alice", _unit(0), 1, loader)
+        hot.invalidate("alice")
+        hot.search("alice", _unit(0), 1, loader)
+        assert loader.calls == 2
+
+    def test_racing_write_not_cached(self):
+        """A save during a load means the loaded snapshot isn't kept."""
+        hot = UserHotSet()
+
+        def racing_loader(user_id, max_points):
+            hot.apply_upsert(user_id, [9], [_unit(0)], [{}])
+            return [1], [_unit(1)], [{}]
+
+        hot.search("carol", _unit(1), 1, racing_loader)
+        assert hot.stats()["users"] == 0
+
+
+class TestSharedVersions:
+    """Pre-fork workers: writes seen through a shared version table."""
+
+    class _Table:
+        def __init__(self):
+            self.versions = {}
+
+        def get(self, user_id):
+            return self.versions.get(user_id, 0)
+
+        def bump(self, user_id):
+            self.versions[user_id] = self.get(user_id) + 1
+            return self.versions[user_id]
+
+    def test_write_in_other_worker_reloads(self, loader):
+        table = self._Table()
+        worker_a, worker_b = UserHotSet(shared=table), UserHotSet(shared=table)
+        worker_a.search("alice", _unit(0), 1, loader)
+
+        worker_b.apply_upsert("alice", [9], [_unit(0)], [{}])
+        worker_a.search("alice", _unit(0), 1, loader)
+        assert loader.calls == 2
+
+    def test_own_write_patches_in_place(self, loader):
+        hot = UserHotSet(shared=self._Table())
+        hot.search("alice", _unit(0), 1, loader)
+        hot.apply_upsert("alice", [7], [_unit(6)], [{"facts": "new"}])
+        assert hot.search("alice", _unit(6), 1, loader)[0][0] == 7
+        assert loader.calls == 1
+
+
+class TestEviction:
+    """Memory budget enforcement."""
+
+    def test_lru_eviction(self):
+        users = {name: [(i, _unit(i)) for i in range(4)] for name in "abc"}
+        loader = _Loader(users)
+        hot = UserHotSet()
+        hot.search("a", _unit(0), 1, loader)
+        one_user = hot.stats()["bytes"]
+        hot.max_bytes = one_user * 2
+
+        hot.search("b", _unit(0), 1, loader)
+        hot.search("a", _unit(0), 1, loader)  # a is now most recent
+        hot.search("c", _unit(0), 1, loader)  # evicts b
+
+        stats = hot.stats()
+        assert stats["users"] == 2
+        assert stats["evictions"] == 1
+        hot.search("a", _unit(0), 1, loader)
+        assert loader.calls == 3
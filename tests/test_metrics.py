@@ -0,0 +1,122 @@
+"""
+Unit tests for the /metrics registry (histogram buckets, label rendering,
+scrape-time gauges) in the Prometheus text format, and the cross-worker
+snapshots serve.py workers render /metrics from.
+"""
+
+import json
+import os
+import importlib.util
+
+_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "metrics.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_metrics", _path)
+_metrics = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_metrics)
+
+
+def _lines(registry):
+    return registry.render().splitlines()
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative(self):
+        registry = _metrics.Registry()
+        hist = registry.histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            hist.observe(value, "/search")
+
+        lines = _lines(registry)
+        assert "# TYPE t_seconds histogram" in lines
+        assert 't_seconds_bucket{route="/search",le="0.1"} 2' in lines
+        assert 't_seconds_bucket{route="/search",le="1"} 3' in lines
+        assert 't_seconds_bucket{route="/search",le="+Inf"} 4' in lines
+        assert 't_seconds_count{route="/search"} 4' in lines
+        assert 't_seconds_sum{route="/search"} 5.650000' in lines
+
+    def test_timer_and_label_escaping(self):
+        registry = _metrics.Registry()
+        hist = registry.histogram("t_seconds", "test", ("op",))
+        with hist.time('say "hi"'):
+            pass
+        assert 't_seconds_count{op="say \\"hi\\""} 1' in _lines(registry)
+
+
+class TestGauge:
+    def test_scalar_labelled_and_skipped_gauges(self):
+        registry = _metrics.Registry()
+        registry.gauge("t_loaded", "test", lambda: {"mpnet": 1}, label="model")
+        registry.gauge("t_size", "test", lambda: 42)
+        registry.gauge("t_disabled", "test", lambda: None)
+        registry.gauge("t_broken", "test", lambda: 1 / 0)
+
+        lines = _lines(registry)
+        assert 't_loaded{worker="0",model="mpnet"} 1' in lines
+        assert 't_size{worker="0"} 42' in lines
+        assert not any(line.startswith(("t_disabled", "t_broken")) for line in lines)
+
+
+class TestCrossWorker:
+    def _worker(self, monkeypatch, index, observations):
+        monkeypatch.setenv("MEMORY_WORKER_INDEX", str(index))
+        registry = _metrics.Registry()
+        hist = registry.histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+        for value in observations:
+            hist.observe(value, "/search")
+        registry.gauge("t_size", "test", lambda: 10 + index)
+        return registry
+
+    def test_histograms_summed_gauges_per_worker(self, monkeypatch):
+        other = self._worker(monkeypatch, 1, (0.5, 5.0)).snapshot()
+        other = json.loads(json.dumps(other))  # as read back from METRICS_DIR
+        local = self._worker(monkeypatch, 0, (0.05,))
+
+        lines = local.render([other]).splitlines()
+        assert 't_seconds_bucket{route="/search",le="0.1"} 1' in lines
+        assert 't_seconds_bucket{route="/search",le="1"} 2' in lines
+        assert 't_seconds_count{route="/search"} 3' in lines
+        assert 't_seconds_sum{route="/search"} 5.550000' in lines
+        assert 't_size{worker="0"} 10' in lines
+        assert 't_size{worker="1"} 11' in lines
+        assert lines.count("# TYPE t_seconds histogram") == 1
+
+    def test_dead_worker_keeps_counts_but_not_gauges(self, monkeypatch, tmp_path):
+        dead = self._worker(monkeypatch, 1, (0.5,)).snapshot()
+        dead["pid"] = 2**22 + 1  # above pid_max on default kernels
+        (tmp_path / "worker-1-dead.json").write_text(json.dumps(dead))
+        (tmp_path / "worker-2-broken.json").write_text("{")
+        local = self._worker(monkeypatch, 0, ())
+        _metrics.write_snapshot(str(tmp_path), local)
+
+        peers = _metrics.read_snapshots(str(tmp_path), exclude_pid=os.getpid())
+        assert [p["alive"] for p in peers] == [False]
+        lines = local.render(peers).splitlines()
+        assert 't_seconds_count{route="/search"} 1' in lines
+        assert 't_size{worker="1"} 11' not in lines
+        assert 't_size{worker="0"} 10' in lines
+
+    def test_scrape_renders_from_snapshot_files_only(self, monkeypatch, tmp_path):
+        peer = self._worker(monkeypatch, 1, (0.5, 5.0))
+        _metrics.write_snapshot(str(tmp_path), peer)
+        peer.histogram("t_seconds", "test").observe(0.5, "/search")  # not shared yet
+        local = self._worker(monkeypatch, 0, (0.05,))
+        monkeypatch.setattr(_metrics, "REGISTRY", local)
+        monkeypatch.setattr(_metrics, "_share_dir", str(tmp_path))
+
+        lines = _metrics.render().splitlines()
+        assert 't_seconds_count{route="/search"} 3' in lines
+        assert 't_size{worker="0"} 10' in lines and 't_size{worker="1"} 11' in lines
+        assert sum(line.startswith("t_size{") for line in lines) == 2
+
+        # What this scrape counted for worker 0 is now on disk, so a scrape
+        # answered by worker 1 next can't report less
+        local.histogram("t_seconds", "test").observe(0.05, "/search")
+        assert 't_seconds_count{route="/search"} 4' in _metrics.render().splitlines()
+        peers = _metrics.read_snapshots(str(tmp_path), exclude_pid=None)
+        assert sum(p["histograms"]["t_seconds"][0][3] for p in peers) == 4
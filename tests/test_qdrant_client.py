@@ -0,0 +1,284 @@
+"""
+Unit tests for the memory Qdrant client helpers (collection state caching,
+payload indexes, not-found detection, error classification and the circuit
+breaker).
+
+Runs against QdrantClient(":memory:") - no server needed.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_qdrant = load_memory_module("services.qdrant_client")
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http.exceptions import (  # noqa: E402
+    ResponseHandlingException,
+    UnexpectedResponse,
+)
+
+
+class _CountingClient:
+    """Wraps an in-memory client and counts get_collection round-trips."""
+
+    def __init__(self):
+        self.inner = QdrantClient(":memory:")
+        self.get_calls = 0
+        self.indexed = []
+
+    def get_collection(self, **kwargs):
+        self.get_calls += 1
+        return self.inner.get_collection(**kwargs)
+
+    def create_payload_index(self, **kwargs):
+        # Local mode ignores payload indexes (and warns) - just record the call
+        self.indexed.append(kwargs["field_name"])
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "test_collection")
+    fake = _CountingClient()
+    monkeypatch.setattr(_qdrant, "_client_instance", fake)
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "breaker", _qdrant.CircuitBreaker("qdrant", failure_threshold=2))
+    monkeypatch.setattr(_qdrant, "RETRY_DELAY", 0.0)
+    return fake
+
+
+class TestEnsureCollection:
+    """Tests for _ensure_collection caching."""
+
+    def test_creates_with_payload_indexes(self, client):
+        """A missing collection is created with the filter indexes."""
+        _qdrant._ensure_collection()
+        assert client.inner.collection_exists("test_collection")
+        assert set(client.indexed) == set(_qdrant.PAYLOAD_INDEXES)
+
+    def test_verified_only_once(self, client):
+        """Repeated calls don't go back to Qdrant."""
+        _qdrant._ensure_collection()
+        first = client.get_calls
+        for _ in range(5):
+            _qdrant._ensure_collection()
+        assert client.get_calls == first
+
+    def test_async_startup_check(self, client):
+        """ensure_collection_async() (app startup) creates and caches like the sync path."""
+        asyncio.run(_qdrant.ensure_collection_async())
+        assert client.inner.collection_exists("test_collection")
+        first = client.get_calls
+        _qdrant._ensure_collection()
+        assert client.get_calls == first
+
+    def test_invalidate_forces_recheck(self, client):
+        """invalidate_collection() makes the next call verify again."""
+        _qdrant._ensure_collection()
+        first = client.get_calls
+        _qdrant.invalidate_collection()
+        _qdrant._ensure_collection()
+        assert client.get_calls == first + 1
+
+    def test_with_collection_recreates_on_not_found(self, client):
+        """An operation that hits a deleted collection recreates it and retries."""
+        _qdrant._ensure_collection()
+        client.inner.delete_collection("test_collection")
+
+        result = _qdrant.with_collection(
+            lambda c: c.get_collection(collection_name="test_collection")
+        )
+        assert result is not None
+        assert client.inner.collection_exists("test_collection")
+
+    def test_not_found_text_on_existing_collection_is_raised(self, client):
+        """Only a missing collection triggers a re-create, not the error's wording."""
+        _qdrant._ensure_collection()
+        first = client.get_calls
+
+        def fail(c):
+            raise ValueError("Point 7 not found")
+
+        with pytest.raises(ValueError):
+            _qdrant.with_collection(fail)
+        assert client.get_calls == first
+
+    def test_create_tolerates_concurrent_create(self, client, monkeypatch):
+        """A 409 from create_collection means another worker got there first."""
+        def conflict(**kwargs):
+            raise UnexpectedResponse(409, "Conflict", b"", None)
+
+        monkeypatch.setattr(client.inner, "create_collection", conflict)
+        _qdrant._create_collection(client, "raced")
+
+
+class TestIsNotFound:
+    """Tests for is_not_found error classification."""
+
+    def test_http_404(self):
+        err = UnexpectedResponse(404, "Not Found", b"", None)
+        assert _qdrant.is_not_found(err)
+
+    def test_http_500(self):
+        err = UnexpectedResponse(500, "Internal", b"", None)
+        assert not _qdrant.is_not_found(err)
+
+    def test_message_text_is_not_classified(self):
+        assert not _qdrant.is_not_found(ValueError("Collection test not found"))
+
+    def test_other_errors(self):
+        assert not _qdrant.is_not_found(ConnectionError("refused"))
+
+    def test_conflict(self):
+        assert _qdrant.is_conflict(UnexpectedResponse(409, "Conflict", b"", None))
+        assert not _qdrant.is_conflict(ValueError("Collection test already exists"))
+
+
+class TestBatchSearch:
+    """search_user_points_batch() runs several user-scoped searches at once."""
+
+    def test_results_per_search_in_order(self, client):
+        _qdrant._ensure_collection()
+        client.upsert(
+            collection_name="test_collection",
+            points=[
+                _qdrant.models.PointStruct(
+                    id=i, vector=[1.0 if j == i else 0.0 for j in range(768)],
+                    payload={"user_id": "a" if i < 2 else "b"},
+                )
+                for i in range(4)
+            ],
+        )
+        axis = lambda i: [1.0 if j == i else 0.0 for j in range(768)]  # noqa: E731
+        results = _qdrant.search_user_points_batch(
+            [("a", axis(1), 1), ("b", axis(3), 2), ("a", axis(3), 5)]
+        )
+        assert [p.id for p in results[0]] == [1]
+        assert results[1][0].id == 3 and len(results[1]) == 2
+        # User scoping holds even when the vector matches another user's point
+        assert {p.id for p in results[2]} == {0, 1}
+
+    def test_empty(self, client):
+        assert _qdrant.search_user_points_batch([]) == []
+
+
+class TestIsTransient:
+    """Errors are classified by type, not by message text."""
+
+    @pytest.mark.parametrize("status", [429, 502, 503, 504])
+    def test_retryable_status(self, status):
+        assert _qdrant.is_transient(UnexpectedResponse(status, "x", b"", None))
+
+    @pytest.mark.parametrize("status", [400, 404, 422])
+    def test_client_errors(self, status):
+        assert not _qdrant.is_transient(UnexpectedResponse(status, "x", b"", None))
+
+    def test_transport_errors(self):
+        assert _qdrant.is_transient(httpx.ConnectError("refused"))
+        assert _qdrant.is_transient(httpx.ReadTimeout("slow"))
+        assert _qdrant.is_transient(ConnectionRefusedError())
+        assert _qdrant.is_transient(ResponseHandlingException(httpx.ConnectError("refused")))
+
+    def test_message_text_is_ignored(self):
+        assert not _qdrant.is_transient(ValueError("connection timeout"))
+
+
+class TestBreaker:
+    """with_collection() goes through the Qdrant circuit breaker."""
+
+    def test_fails_fast_once_open(self, client):
+        _qdrant._ensure_collection()
+        calls = []
+
+        def down(c):
+            calls.append(1)
+            raise httpx.ConnectError("refused")
+
+        with pytest.raises(httpx.ConnectError):
+            _qdrant.with_collection(down)
+        assert _qdrant.breaker_stats()["state"] == "open"
+
+        with pytest.raises(_qdrant.CircuitOpenError):
+            _qdrant.with_collection(down)
+        assert len(calls) == 2
+
+
+class TestStorageProfiles:
+    """New collections follow QDRANT_STORAGE_PROFILE."""
+
+    @pytest.mark.parametrize(
+        "profile,datatype,quant",
+        [
+            ("fp32", None, None),
+            ("float16", "float16", None),
+            ("int8", None, "ScalarQuantization"),
+            ("binary", None, "BinaryQuantization"),
+        ],
+    )
+    def test_profile_is_applied(self, client, monkeypatch, profile, datatype, quant):
+        created = {}
+        monkeypatch.setattr(client, "create_collection", lambda **kw: created.update(kw), raising=False)
+        monkeypatch.setenv("QDRANT_STORAGE_PROFILE", profile)
+        monkeypatch.setenv("QDRANT_VECTORS_ON_DISK", "true")
+
+        _qdrant._create_collection(client, "profiled")
+
+        vectors = created["vectors_config"]
+        assert vectors.on_disk is True
+        assert (vectors.datatype.value if vectors.datatype else None) == datatype
+        assert type(created["quantization_config"]).__name__ == (quant or "NoneType")
+
+    def test_quantized_search_rescores(self, client, monkeypatch):
+        """Quantized collections search with rescoring and oversampling."""
+        monkeypatch.setitem(_qdrant._ready_collections, "test_collection", "binary")
+        params = _qdrant._search_params()
+        assert params.quantization.rescore is True
+        assert params.quantization.oversampling == 3.0
+
+    def test_fp32_has_no_search_params(self, client):
+        _qdrant._ensure_collection()
+        assert _qdrant._search_params() is None
+
+
+class TestLocalMode:
+    """QDRANT_HOST=":memory:" / "path:<dir>" run Qdrant in process, serialized."""
+
+    def test_concurrent_upserts_and_searches(self, monkeypatch):
+        import threading
+
+        monkeypatch.setenv("INDEX_NAME", "local_collection")
+        monkeypatch.setattr(_qdrant, "_client_instance", _qdrant._connect(":memory:", 6333))
+        monkeypatch.setattr(_qdrant, "_ready_collections", {})
+        monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+        _qdrant._ensure_collection()
+        axis = lambda i: [1.0 if j == i % 768 else 0.0 for j in range(768)]  # noqa: E731
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(offset, offset + 20):
+                    _qdrant.with_collection(
+                        lambda client: client.upsert(
+                            collection_name="local_collection",
+                            points=[_qdrant.models.PointStruct(id=i, vector=axis(i), payload={"user_id": "u"})],
+                        )
+                    )
+                    _qdrant.search_user_points("u", axis(i), 3)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors
+        assert _qdrant.with_collection(lambda client: client.count("local_collection").count) == 80
@@ -0,0 +1,216 @@
+"""
+Unit tests for the memory search-result cache (per-user versioning and
+single-flight coalescing), and /search-batch end to end on the stub
+embedder with QdrantClient(":memory:").
+"""
+
+import os
+import threading
+import time
+import importlib.util
+
+import pytest
+
+# Load result_cache module directly from memory layer
+_cache_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "result_cache.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_result_cache", _cache_path)
+_result_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_result_cache)
+
+SearchResultCache = _result_cache.SearchResultCache
+
+
+class _Compute:
+    def __init__(self, result="hits", delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.result
+
+
+class TestCaching:
+    def test_repeat_query_hits(self):
+        cache = SearchResultCache()
+        compute = _Compute()
+        assert cache.get_or_compute("u", "my wife", 5, compute) == "hits"
+        assert cache.get_or_compute("u", "my  wife ", 5, compute) == "hits"
+        assert compute.calls == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_key_includes_top_k_and_user(self):
+        cache = SearchResultCache()
+        compute = _Compute()
+        cache.get_or_compute("u", "q", 5, compute)
+        cache.get_or_compute("u", "q", 3, compute)
+        cache.get_or_compute("v", "q", 5, compute)
+        assert compute.calls == 3
+
+    def test_bump_invalidates_user_only(self):
+        """A save for one user doesn't evict other users' results."""
+        cache = SearchResultCache()
+        compute = _Compute()
+        cache.get_or_compute("u", "q", 5, compute)
+        cache.get_or_compute("v", "q", 5, compute)
+        cache.bump("u")
+        cache.get_or_compute("u", "q", 5, compute)
+        cache.get_or_compute("v", "q", 5, compute)
+        assert compute.calls == 3
+
+    def test_ttl_expiry(self):
+        cache = SearchResultCache(ttl=0.0)
+        compute = _Compute()
+        cache.get_or_compute("u", "q", 5, compute)
+        time.sleep(0.01)
+        cache.get_or_compute("u", "q", 5, compute)
+        assert compute.calls == 2
+
+    def test_errors_not_cached(self):
+        cache = SearchResultCache()
+
+        def broken():
+            raise RuntimeError("qdrant down")
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute("u", "q", 5, broken)
+        compute = _Compute()
+        cache.get_or_compute("u", "q", 5, compute)
+        assert compute.calls == 1
+
+    def test_disabled(self):
+        cache = SearchResultCache(max_entries=0)
+        compute = _Compute()
+        cache.get_or_compute("u", "q", 5, compute)
+        cache.get_or_compute("u", "q", 5, compute)
+        assert compute.calls == 2
+
+
+class TestGetPut:
+    """Explicit get/put, used by batch search."""
+
+    def test_put_then_get(self):
+        cache = SearchResultCache()
+        cached, version = cache.get("u", "q", 5)
+        assert cached is None
+        cache.put("u", version, "q", 5, ["hit"])
+        assert cache.get("u", "q", 5)[0] == ["hit"]
+        assert cache.stats()["hits"] == 1
+
+    def test_put_after_write_is_not_served(self):
+        """A result computed before a save must not be cached past it."""
+        cache = SearchResultCache()
+        _, version = cache.get("u", "q", 5)
+        cache.bump("u")
+        cache.put("u", version, "q", 5, ["stale"])
+        assert cache.get("u", "q", 5)[0] is None
+
+    def test_shared_with_get_or_compute(self):
+        cache = SearchResultCache()
+        _, version = cache.get("u", "q", 5)
+        cache.put("u", version, "q", 5, "hits")
+        compute = _Compute()
+        assert cache.get_or_compute("u", "q", 5, compute) == "hits"
+        assert compute.calls == 0
+
+
+    def test_write_in_other_worker_invalidates(self):
+        """Pre-fork workers share per-user versions through one table."""
+
+        class Table(dict):
+            def get(self, user_id):
+                return super().get(user_id, 0)
+
+            def bump(self, user_id):
+                self[user_id] = self.get(user_id) + 1
+                return self[user_id]
+
+        table = Table()
+        worker_a, worker_b = SearchResultCache(shared=table), SearchResultCache(shared=table)
+        worker_a.get_or_compute("u", "q", 5, _Compute())
+        worker_b.bump("u")
+        compute = _Compute("fresh")
+        assert worker_a.get_or_compute("u", "q", 5, compute) == "fresh"
+        assert compute.calls == 1
+
+
+class TestCoalescing:
+    def test_concurrent_identical_searches_share_one_call(self):
+        cache = SearchResultCache()
+        compute = _Compute(delay=0.2)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute("u", "q", 5, compute))
+            )
+            for _ in range(6)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert compute.calls == 1
+        assert results == ["hits"] * 6
+        assert cache.stats()["coalesced"] == 5
+
+    def test_clear_drops_everything_including_inflight_puts(self):
+        cache = SearchResultCache()
+        cache.get_or_compute("u", "q", 5, _Compute())
+        _, version = cache.get("v", "q", 5)
+        cache.clear()
+        cache.put("v", version, "q", 5, ["old model"])
+        assert cache.get("u", "q", 5)[0] is None
+        assert cache.get("v", "q", 5)[0] is None
+
+
+@pytest.fixture
+def api(memory_api, memory_client, monkeypatch):
+    api, _ = memory_api
+    monkeypatch.setattr(api, "_result_cache", api.SearchResultCache())
+    api.save_memory(
+        api.SaveRequest(
+            user_id="u1",
+            messages=[{"role": "user", "content": "..."}],
+            facts=[
+                {"type": "spouse", "value": "wife Sarah"},
+                {"type": "pet", "value": "dog named Rex"},
+            ],
+        )
+    )
+    return api
+
+
+class TestSearchBatchEndpoint:
+    def test_results_follow_query_order_across_hits_and_misses(self, api, monkeypatch):
+        api.search_memory_batch(api.SearchBatchRequest(user_id="u1", queries=["wife Sarah"]))
+
+        embedded = []
+        embed_batch = api.embed_batch
+
+        def spy(texts):
+            embedded.append(list(texts))
+            return embed_batch(texts)
+
+        monkeypatch.setattr(api, "embed_batch", spy)
+        queries = ["dog named Rex", "wife Sarah", "dog named Rex"]
+        response = api.search_memory_batch(api.SearchBatchRequest(user_id="u1", queries=queries))
+
+        assert [entry.query for entry in response] == queries
+        assert "Sarah" in response[1].results[0].facts
+        assert "Rex" in response[0].results[0].facts
+        assert response[2].results == response[0].results
+        # Only the miss is embedded, once for both of its positions
+        assert embedded == [["dog named Rex"]]
+        stats = api._result_cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 3
@@ -0,0 +1,149 @@
+"""
+Unit tests for /save writing all of a request's facts in one encode and
+one upsert, /save-batch per-item statuses (duplicates sharing a point,
+skipped items, a failing group among good ones, stopping once the Qdrant
+breaker opens, and 503 only when nothing was saved), and for the journal
+drain's per-entry retry stopping the same way.
+
+Runs api.memory on the stub embedder against QdrantClient(":memory:").
+"""
+
+import pytest
+
+
+@pytest.fixture
+def api(memory_api, memory_client, monkeypatch):
+    api, qdrant = memory_api
+    monkeypatch.setenv("SAVE_BATCH_GROUP", "2")
+    monkeypatch.setattr(qdrant, "RETRY_DELAY", 0)
+    monkeypatch.setattr(
+        qdrant, "breaker", qdrant.CircuitBreaker("qdrant", failure_threshold=1, reset_timeout=60)
+    )
+    return api
+
+
+@pytest.fixture
+def failing_upserts(memory_client, monkeypatch):
+    """upsert() raises `error` on the calls listed in `fail_on` (1-based)."""
+    calls = {"n": 0, "fail_on": set(), "error": ValueError("bad point")}
+    upsert = memory_client.upsert
+
+    def flaky(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] in calls["fail_on"]:
+            raise calls["error"]
+        return upsert(*args, **kwargs)
+
+    monkeypatch.setattr(memory_client, "upsert", flaky)
+    return calls
+
+
+def _batch(api, *values):
+    items = [{"fact": {"type": "likes", "value": v}} if v else {"text": "   "} for v in values]
+    return api.save_batch(api.SaveBatchRequest(user_id="u", items=items))
+
+
+def _count(client):
+    return client.count("api_test_collection", exact=True).count
+
+
+class TestSave:
+    def test_facts_embedded_and_upserted_once(self, api, memory_client, monkeypatch):
+        backend = api.current_backend()
+        encoded, upserts = [], []
+        encode, upsert = backend.encode, memory_client.upsert
+
+        def counting_encode(texts):
+            encoded.append(list(texts))
+            return encode(texts)
+
+        def counting_upsert(*args, **kwargs):
+            upserts.append(kwargs["points"])
+            return upsert(*args, **kwargs)
+
+        monkeypatch.setattr(backend, "encode", counting_encode)
+        monkeypatch.setattr(memory_client, "upsert", counting_upsert)
+
+        # Values no other test embeds, so none is served from the embedding cache
+        values = [f"one-encode fact {i}" for i in range(5)]
+        response = api.save_memory(
+            api.SaveRequest(
+                user_id="u",
+                messages=[{"role": "user", "content": "..."}],
+                facts=[{"type": "likes", "value": v} for v in values],
+            )
+        )
+
+        assert len(encoded) == 1 and len(encoded[0]) == 5
+        assert [len(points) for points in upserts] == [5]
+        assert (response["status"], response["facts_saved"], response["facts_deduped"]) == ("saved", 5, 0)
+        assert set(response["timing_ms"]) == {"embed", "dedup", "upsert"}
+        assert all(ms >= 0 for ms in response["timing_ms"].values())
+        assert _count(memory_client) == 5
+
+
+class TestSaveBatch:
+    def test_duplicates_share_a_point_and_blank_items_are_skipped(self, api, memory_client):
+        response = _batch(api, "The coffee", "coffee", "", "tea")
+
+        statuses = [item["status"] for item in response["items"]]
+        assert statuses == ["saved", "saved", "skipped", "saved"]
+        assert response["items"][0]["point_id"] == response["items"][1]["point_id"]
+        assert (response["saved"], response["skipped"], response["points"]) == (3, 1, 2)
+        assert response["status"] == "saved"
+        assert _count(memory_client) == 2
+
+    def test_failed_group_does_not_fail_the_others(self, api, memory_client, failing_upserts):
+        failing_upserts["fail_on"] = {2}
+        response = _batch(api, "a1", "a2", "b1", "b2", "c1")
+
+        statuses = [item["status"] for item in response["items"]]
+        assert statuses == ["saved", "saved", "failed", "failed", "saved"]
+        assert "ValueError: bad point" in response["items"][2]["reason"]
+        assert (response["status"], response["saved"], response["failed"]) == ("partial", 3, 2)
+        assert _count(memory_client) == 3
+
+    def test_open_breaker_stops_remaining_groups(self, api, memory_client, failing_upserts):
+        failing_upserts["fail_on"] = {2, 3}
+        failing_upserts["error"] = ConnectionError("qdrant down")
+        response = _batch(api, "a1", "a2", "b1", "b2", "c1")
+
+        statuses = [item["status"] for item in response["items"]]
+        assert statuses == ["saved", "saved", "failed", "failed", "failed"]
+        assert "circuit open" in response["items"][4]["reason"]
+        assert failing_upserts["n"] == 2  # group c never reached Qdrant
+        assert response["status"] == "partial"
+
+    def test_unavailable_when_nothing_saved(self, api, failing_upserts):
+        from fastapi import HTTPException
+
+        failing_upserts["fail_on"] = {1, 2, 3}
+        failing_upserts["error"] = ConnectionError("qdrant down")
+        with pytest.raises(HTTPException) as raised:
+            _batch(api, "a1", "a2", "b1")
+        assert raised.value.status_code == 503
+        assert "Retry-After" in raised.value.headers
+
+
+class TestDrainJournal:
+    @staticmethod
+    def _entry(value):
+        return {
+            "user_id": "u",
+            "messages": [{"role": "user", "content": "..."}],
+            "facts": [{"type": "likes", "value": value}],
+        }
+
+    def test_bad_entry_fails_alone(self, api, memory_client, failing_upserts):
+        failing_upserts["fail_on"] = {1, 2}  # the batch, then entry 1 on its own
+        failures = api._drain_journal([(1, self._entry("tea")), (2, self._entry("coffee"))])
+        assert list(failures) == [1] and "ValueError" in failures[1]
+        assert _count(memory_client) == 1
+
+    def test_open_breaker_stops_the_per_entry_retry(self, api, failing_upserts):
+        failing_upserts["fail_on"] = {1, 2, 3}
+        failing_upserts["error"] = ConnectionError("qdrant down")
+        entries = [(i, self._entry(v)) for i, v in enumerate(["tea", "coffee", "milk"])]
+        with pytest.raises(api.CircuitOpenError):
+            api._drain_journal(entries)
+        assert failing_upserts["n"] == 1  # the batch opened the breaker; no entry went out
@@ -0,0 +1,142 @@
+"""
+Unit tests for the memory write-behind save journal (durability, retry
+backoff, dead-lettering and the drain worker).
+"""
+
+import os
+import time
+import importlib.util
+
+import pytest
+
+# Load save_journal module directly from memory layer
+_journal_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "save_journal.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_save_journal", _journal_path)
+_save_journal = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_save_journal)
+
+SaveJournal = _save_journal.SaveJournal
+JournalWorker = _save_journal.JournalWorker
+
+
+@pytest.fixture
+def journal(tmp_path):
+    j = SaveJournal(tmp_path / "journal.sqlite3", max_attempts=3)
+    yield j
+    j.close()
+
+
+class TestJournal:
+    def test_append_due_ack(self, journal):
+        a = journal.append({"user_id": "u", "n": 1})
+        b = journal.append({"user_id": "u", "n": 2})
+        assert journal.due(10) == [(a, {"user_id": "u", "n": 1}), (b, {"user_id": "u", "n": 2})]
+
+        journal.ack([a])
+        assert [entry_id for entry_id, _ in journal.due(10)] == [b]
+        assert journal.stats()["pending"] == 1
+
+    def test_due_respects_limit_and_order(self, journal):
+        ids = [journal.append({"n": i}) for i in range(5)]
+        assert [entry_id for entry_id, _ in journal.due(2)] == ids[:2]
+
+    def test_survives_reopen(self, tmp_path):
+        path = tmp_path / "journal.sqlite3"
+        j = SaveJournal(path)
+        j.append({"user_id": "u"})
+        j.close()
+
+        reopened = SaveJournal(path)
+        assert [payload for _, payload in reopened.due(10)] == [{"user_id": "u"}]
+        reopened.close()
+
+    def test_fail_backs_off(self, journal):
+        entry_id = journal.append({"user_id": "u"})
+        assert journal.fail(entry_id, "qdrant down") is False
+        # Not due again until the backoff passes
+        assert journal.due(10) == []
+        stats = journal.stats()
+        assert stats["pending"] == 1
+        assert stats["retrying"] == 1
+
+    def test_dead_letter_after_max_attempts(self, journal):
+        entry_id = journal.append({"user_id": "u"})
+        assert journal.fail(entry_id, "e1") is False
+        assert journal.fail(entry_id, "e2") is False
+        assert journal.fail(entry_id, "e3") is True
+        stats = journal.stats()
+        assert stats["pending"] == 0
+        assert stats["dead"] == 1
+
+    def test_lag_reports_oldest_entry(self, journal):
+        assert journal.stats()["lag_s"] == 0.0
+        journal.append({"user_id": "u"})
+        time.sleep(0.02)
+        assert journal.stats()["lag_s"] > 0
+
+
+class TestWorker:
+    def test_drain_acks_successes(self, journal):
+        batches = []
+
+        def process(entries):
+            batches.append(entries)
+            return {}
+
+        for i in range(3):
+            journal.append({"n": i})
+        worker = JournalWorker(journal, process, batch_size=2)
+
+        assert worker.drain_once() == 2
+        assert worker.drain_once() == 1
+        assert worker.drain_once() == 0
+        assert [len(b) for b in batches] == [2, 1]
+        assert worker.stats()["processed"] == 3
+        assert journal.stats()["pending"] == 0
+
+    def test_partial_failure_keeps_failed_entries(self, journal):
+        good = journal.append({"n": 1})
+        bad = journal.append({"n": 2})
+        worker = JournalWorker(journal, lambda entries: {bad: "boom"})
+
+        worker.drain_once()
+        stats = worker.stats()
+        assert stats["processed"] == 1
+        assert stats["failed_attempts"] == 1
+        assert stats["pending"] == 1
+        assert good not in [entry_id for entry_id, _ in journal.due(10)]
+
+    def test_process_exception_fails_whole_batch(self, journal):
+        journal.append({"n": 1})
+        journal.append({"n": 2})
+
+        def broken(entries):
+            raise ConnectionError("qdrant down")
+
+        worker = JournalWorker(journal, broken)
+        worker.drain_once()
+        assert worker.stats()["failed_attempts"] == 2
+        assert journal.stats()["retrying"] == 2
+
+    def test_background_thread_drains(self, journal):
+        seen = []
+        worker = JournalWorker(journal, lambda entries: seen.extend(entries) or {}, poll_interval=5)
+        worker.start()
+        try:
+            journal.append({"user_id": "u"})
+            worker.notify()
+            deadline = time.time() + 5
+            while journal.stats()["pending"] and time.time() < deadline:
+                time.sleep(0.01)
+            assert journal.stats()["pending"] == 0
+            assert len(seen) == 1
+        finally:
+            worker.stop()
+        assert worker.stats()["running"] is False
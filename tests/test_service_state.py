@@ -0,0 +1,64 @@
+"""
+Unit tests for loading the service's routing (shard topology, switched
+embedding migration) outside the app, as the maintenance CLIs do.
+"""
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_state, _sharding, _migration, _qdrant = load_memory_module(
+    "services.service_state",
+    "services.sharding",
+    "services.embedding_migration",
+    "services.qdrant_client",
+)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARD_STATE", str(tmp_path / "shards.json"))
+    monkeypatch.setenv("EMBEDDING_MIGRATION_STATE", str(tmp_path / "migration.json"))
+    monkeypatch.delenv("MEMORY_SHARDS", raising=False)
+    monkeypatch.setattr(_qdrant, "_router", None)
+    monkeypatch.setattr(_qdrant, "_active_collection", None)
+    monkeypatch.setenv("INDEX_NAME", "memories")
+    return tmp_path
+
+
+class TestLoadRouting:
+    def test_unconfigured_service_uses_index_name(self, env):
+        assert not _state.migration_in_progress()
+        assert _state.load_routing() == {}
+        assert _qdrant.get_router() is None
+        assert _qdrant._collection_name() == "memories"
+
+    def test_shard_state_file_wins_over_spec(self, env, monkeypatch):
+        router = _sharding.ShardRouter([_sharding.Shard("a", "qdrant-a"), _sharding.Shard("b", "qdrant-b")])
+        _sharding.save_state(str(env / "shards.json"), router.add([_sharding.Shard("c", "qdrant-c")]))
+        monkeypatch.setenv("MEMORY_SHARDS", "a=qdrant-a,b=qdrant-b")
+
+        assert _state.load_routing() == {"shards": ["a", "b", "c"], "rebalancing": True}
+        assert list(_qdrant.get_router().shards) == ["a", "b", "c"]
+
+    def test_spec_without_state_file(self, env, monkeypatch):
+        monkeypatch.setenv("MEMORY_SHARDS", "a=/m_a,b=/m_b")
+        assert _state.load_routing()["shards"] == ["a", "b"]
+
+    def test_switched_migration_moves_the_collection(self, env):
+        state = _migration.new_state("memories", "old", "New/Model", 384)
+        state["phase"] = _migration.SWITCHED
+        _migration.save_state(str(env / "migration.json"), state)
+
+        assert _state.load_routing() == {"collection": "memories__new_model", "model": "New/Model"}
+        assert _qdrant._collection_name() == "memories__new_model"
+
+    def test_unfinished_migration_keeps_the_source(self, env):
+        _migration.save_state(
+            str(env / "migration.json"), _migration.new_state("memories", "old", "New/Model", 384)
+        )
+        assert _state.load_routing() == {}
+        assert _qdrant._collection_name() == "memories"
+        assert _state.migration_in_progress()
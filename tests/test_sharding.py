@@ -0,0 +1,208 @@
+"""
+Unit tests for user sharding (consistent-hash ring, shard spec parsing,
+routed reads/writes, and online rebalancing after a shard is added).
+
+Each shard is its own QdrantClient(":memory:").
+"""
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_sharding, _qdrant, _snapshot = load_memory_module(
+    "services.sharding", "services.qdrant_client", "services.snapshot"
+)
+
+from qdrant_client.http import models  # noqa: E402
+
+DIM = 768
+USERS = [f"user-{i}" for i in range(40)]
+
+
+def _vec(i):
+    return [1.0 if j == i % DIM else 0.0 for j in range(DIM)]
+
+
+def _memory_shards(*names):
+    return [_sharding.Shard(name, ":memory:") for name in names]
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "memories")
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "_shard_clients", {})
+    monkeypatch.setattr(_qdrant, "_shard_breakers", {})
+    monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+    router = _sharding.ShardRouter(_memory_shards("a", "b"), vnodes=32)
+    monkeypatch.setattr(_qdrant, "_router", router)
+    return router
+
+
+def _save(user_ids):
+    points = [
+        models.PointStruct(id=i, vector=_vec(i), payload={"user_id": u, "facts": f"fact {i}"})
+        for i, u in enumerate(user_ids)
+    ]
+    _snapshot.upsert_points(points)
+
+
+def _count(shard):
+    with _qdrant.use_shard(shard):
+        return _qdrant.with_collection(lambda client: client.count("memories").count)
+
+
+class TestRing:
+    def test_owner_is_stable(self):
+        ring = _sharding.HashRing(["a", "b", "c"])
+        assert [ring.owner(u) for u in USERS] == [ring.owner(u) for u in USERS]
+        assert {ring.owner(u) for u in USERS} == {"a", "b", "c"}
+
+    def test_adding_a_shard_only_moves_users_onto_it(self):
+        before = _sharding.HashRing(["a", "b", "c"])
+        after = _sharding.HashRing(["a", "b", "c", "d"])
+        users = [f"u{i}" for i in range(2000)]
+        moved = [u for u in users if before.owner(u) != after.owner(u)]
+        assert all(after.owner(u) == "d" for u in moved)
+        assert 0.15 < len(moved) / len(users) < 0.35  # about 1/4
+
+    def test_parse_spec(self):
+        shards = _sharding.parse_shards("s0=qdrant-0:6400,s1=/memories_s1, s2=:memory:")
+        assert shards[0] == _sharding.Shard("s0", "qdrant-0", 6400, None)
+        assert shards[1] == _sharding.Shard("s1", None, 6333, "memories_s1")
+        assert shards[2].endpoint == "memory:s2"
+        with pytest.raises(ValueError):
+            _sharding.parse_shards("s0=a,s0=b")
+
+    @pytest.mark.parametrize(
+        "spec",
+        [
+            "s0=qdrant:6333,s1=qdrant:6333",
+            "s0=qdrant,s1=QDRANT:6333",
+            "s0=/memories,s1=localhost/memories",
+            "s0=,s1=localhost:6333/user_memory_collection",
+        ],
+    )
+    def test_parse_rejects_shards_on_the_same_collection(self, spec, monkeypatch):
+        monkeypatch.delenv("QDRANT_HOST", raising=False)
+        monkeypatch.delenv("QDRANT_PORT", raising=False)
+        monkeypatch.delenv("INDEX_NAME", raising=False)
+        with pytest.raises(ValueError, match="same collection"):
+            _sharding.parse_shards(spec)
+        assert len(_sharding.parse_shards("s0=qdrant/a,s1=qdrant/b,s2=:memory:,s3=:memory:")) == 4
+
+
+class TestRouting:
+    def test_writes_land_on_owner_and_searches_find_them(self, sharded):
+        _save(USERS)
+        assert _count(sharded.shards["a"]) + _count(sharded.shards["b"]) == len(USERS)
+        assert _count(sharded.shards["a"]) > 0 and _count(sharded.shards["b"]) > 0
+
+        hits = _qdrant.search_user_points("user-7", _vec(7), 5)
+        assert [h.id for h in hits] == [7]
+        batch = _qdrant.search_user_points_batch([("user-3", _vec(3), 5), ("user-8", _vec(8), 5)])
+        assert [[h.id for h in hits] for hits in batch] == [[3], [8]]
+
+    def test_export_reads_every_shard(self, sharded):
+        _save(USERS)
+        assert sum(len(page) for page in _snapshot.iter_records()) == len(USERS)
+        assert sum(len(page) for page in _snapshot.iter_records("user-5")) == 1
+
+
+class TestRebalance:
+    def test_add_shard_moves_users_online(self, sharded, tmp_path, monkeypatch):
+        _save(USERS)
+        moved_users = []
+        rebalancer = _sharding.Rebalancer(
+            str(tmp_path / "shards.json"), on_user_moved=moved_users.append, rate=0
+        )
+        router = rebalancer.add_shards(_memory_shards("c"))
+        assert router.rebalancing
+        movers = [u for u in USERS if router.owner(u).name == "c"]
+        assert movers
+
+        # Mid-rebalance a moving user is still found (old shard is read too)
+        user = movers[0]
+        assert [h.id for h in _qdrant.search_user_points(user, _vec(USERS.index(user)), 5)]
+
+        assert rebalancer.run_pass() == len(movers)
+        assert rebalancer.run_pass() == 0
+        assert _count(router.shards["c"]) == len(movers)
+        assert sorted(moved_users) == sorted(movers)
+
+        monkeypatch.setattr(_qdrant, "_router", router.finished())
+        for i, u in enumerate(USERS):
+            assert [h.id for h in _qdrant.search_user_points(u, _vec(i), 5)] == [i]
+
+    def test_rate_applies_to_a_rebalance_started_long_after_boot(self, sharded, tmp_path, monkeypatch):
+        _save(USERS)
+        rebalancer = _sharding.Rebalancer(str(tmp_path / "shards.json"), rate=10)
+        rebalancer._budget_started -= 3600  # booted an hour ago
+        waits = []
+        monkeypatch.setattr(rebalancer._stop, "wait", waits.append)
+        router = rebalancer.add_shards(_memory_shards("c"))
+        movers = [u for u in USERS if router.owner(u).name == "c"]
+
+        assert rebalancer.run_pass() == len(movers)
+        # Throttled by points moved, from the start of the pass
+        assert len(movers) / 10 - 1 < max(waits) <= len(movers) / 10
+
+    def test_newer_copy_on_new_owner_is_kept(self, sharded, tmp_path):
+        _save(USERS)
+        rebalancer = _sharding.Rebalancer(str(tmp_path / "shards.json"), rate=0)
+        router = rebalancer.add_shards(_memory_shards("c"))
+        user = next(u for u in USERS if router.owner(u).name == "c")
+        i = USERS.index(user)
+
+        # A save after the add goes straight to the new owner
+        newer = models.PointStruct(id=i, vector=_vec(i), payload={"user_id": user, "facts": "newer"})
+        _snapshot.upsert_points([newer])
+        rebalancer.run_pass()
+
+        with _qdrant.use_shard(router.shards["c"]):
+            point = _qdrant.with_collection(lambda client: client.retrieve("memories", ids=[i]))[0]
+        assert point.payload["facts"] == "newer"
+
+    def test_add_shard_on_an_existing_collection_is_rejected(self):
+        router = _sharding.ShardRouter([_sharding.Shard("a", "qdrant-0", 6333, "m")], vnodes=32)
+        with pytest.raises(ValueError, match="same collection"):
+            router.add([_sharding.Shard("b", "QDRANT-0", 6333, "m")])
+        assert router.add([_sharding.Shard("b", "qdrant-0", 6333, "m2")]).rebalancing
+
+    def test_state_round_trip(self, sharded, tmp_path):
+        path = str(tmp_path / "shards.json")
+        router = sharded.add(_memory_shards("c"))
+        _sharding.save_state(path, router)
+        loaded = _sharding.ShardRouter.from_state(_sharding.load_state(path))
+        assert loaded.rebalancing and loaded.previous == ["a", "b"]
+        assert all(loaded.owner(u) == router.owner(u) for u in USERS)
+
+
+class TestAddShardEndpoint:
+    @pytest.fixture
+    def api(self, memory_api, sharded, tmp_path, monkeypatch):
+        api, _ = memory_api
+        monkeypatch.setattr(api.sharding, "get_router", lambda: sharded)
+        monkeypatch.setattr(api, "_rebalancer", _sharding.Rebalancer(str(tmp_path / "s.json")))
+        return api
+
+    def _add(self, api, **shard):
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException) as exc:
+            api.add_shard(api.AddShardRequest(**shard))
+        return exc.value
+
+    def test_in_process_shard_is_rejected(self, api):
+        assert self._add(api, name="c", host=":memory:").status_code == 400
+
+    def test_shard_on_an_existing_collection_is_rejected(self, api, monkeypatch):
+        monkeypatch.setattr(
+            api.sharding, "get_router",
+            lambda: _sharding.ShardRouter([_sharding.Shard("a", "qdrant-0", 6333, "m")]),
+        )
+        error = self._add(api, name="b", host="qdrant-0", collection="m")
+        assert error.status_code == 400
+        assert "same collection" in error.detail
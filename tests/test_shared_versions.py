@@ -0,0 +1,58 @@
+"""
+Unit tests for the shared per-user version table used by the pre-fork
+multi-worker mode (counters, and visibility across a real fork).
+"""
+
+import os
+import importlib.util
+
+import pytest
+
+_path = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "layers",
+    "memory",
+    "services",
+    "shared_versions.py",
+)
+_spec = importlib.util.spec_from_file_location("memory_shared_versions", _path)
+_shared_versions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_shared_versions)
+
+SharedVersions = _shared_versions.SharedVersions
+
+
+class TestCounters:
+    def test_bump_returns_new_version(self):
+        table = SharedVersions(slots=64)
+        assert table.get("alice") == 0
+        assert table.bump("alice") == 1
+        assert table.bump("alice") == 2
+        assert table.get("alice") == 2
+
+    def test_users_are_independent(self):
+        table = SharedVersions()
+        table.bump("alice")
+        assert table.get("bob") == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+class TestAcrossFork:
+    def test_child_bumps_are_visible_to_parent(self):
+        table = SharedVersions(slots=64)
+        table.bump("alice")
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for _ in range(100):
+                    table.bump("alice")
+            finally:
+                os._exit(0)
+        for _ in range(100):
+            table.bump("alice")
+        os.waitpid(pid, 0)
+
+        # No increments lost to the concurrent writer
+        assert table.get("alice") == 201
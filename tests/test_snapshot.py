@@ -0,0 +1,117 @@
+"""
+Unit tests for memory snapshots (directory export/import with float16
+vectors, resumable parallel import, and the NDJSON HTTP stream format).
+
+Runs against QdrantClient(":memory:") - exports from one collection and
+imports into another by switching INDEX_NAME.
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_snapshot, _qdrant = load_memory_module("services.snapshot", "services.qdrant_client")
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+DIM = 768
+
+
+def _vec(i):
+    return [1.0 if j == i % DIM else 0.25 for j in range(DIM)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "source")
+    fake = QdrantClient(":memory:")
+    monkeypatch.setattr(_qdrant, "_client_instance", fake)
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+    _qdrant._ensure_collection()
+    fake.upsert(
+        collection_name="source",
+        points=[
+            models.PointStruct(
+                id=i, vector=_vec(i), payload={"user_id": "u" if i < 5 else "v", "facts": f"fact {i}"}
+            )
+            for i in range(8)
+        ],
+    )
+    return fake
+
+
+def _use_target(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "target")
+    _qdrant._ensure_collection()
+
+
+class TestDirectorySnapshot:
+    def test_round_trip_in_parts(self, client, tmp_path, monkeypatch):
+        manifest = _snapshot.export_snapshot(str(tmp_path), part_size=3, batch_size=2)
+        assert manifest["count"] == 8
+        assert [p["count"] for p in manifest["parts"]] == [3, 3, 2]
+        assert (tmp_path / "vectors-00000.f16").stat().st_size == 3 * DIM * 2
+
+        _use_target(monkeypatch)
+        report = _snapshot.import_snapshot(str(tmp_path), workers=2, batch_size=2)
+        assert report["imported"] == 8
+
+        point = client.retrieve("target", ids=[6], with_vectors=True)[0]
+        assert point.payload == {"user_id": "v", "facts": "fact 6"}
+        source = client.retrieve("source", ids=[6], with_vectors=True)[0]
+        assert point.vector == pytest.approx(source.vector, abs=1e-3)
+
+    def test_user_export(self, client, tmp_path):
+        manifest = _snapshot.export_snapshot(str(tmp_path), user_id="v")
+        assert manifest["count"] == 3
+
+    def test_import_resumes_after_finished_parts(self, client, tmp_path, monkeypatch):
+        _snapshot.export_snapshot(str(tmp_path), part_size=3)
+        _use_target(monkeypatch)
+        (tmp_path / "import-target.progress.json").write_text(json.dumps({"done_parts": [0, 1]}))
+
+        report = _snapshot.import_snapshot(str(tmp_path))
+        assert (report["imported"], report["skipped"]) == (2, 6)
+        assert client.count("target").count == 2
+
+    def test_unfinished_export_rejected(self, tmp_path):
+        with pytest.raises(_snapshot.SnapshotError):
+            _snapshot.import_snapshot(str(tmp_path))
+
+    def test_existing_snapshot_not_overwritten(self, client, tmp_path):
+        _snapshot.export_snapshot(str(tmp_path))
+        with pytest.raises(_snapshot.SnapshotError):
+            _snapshot.export_snapshot(str(tmp_path))
+
+
+class TestNdjsonStream:
+    def test_round_trip(self, client, monkeypatch):
+        body = b"".join(_snapshot.stream_ndjson("u", batch_size=2))
+        _use_target(monkeypatch)
+
+        importer = _snapshot.StreamImporter(batch_size=2)
+        for line in body.split(b"\n"):
+            if importer.add(line):
+                importer.flush()
+        importer.flush()
+
+        assert importer.imported == 5
+        assert importer.users == {"u"}
+        assert client.count("target").count == 5
+
+    def test_requires_header(self):
+        importer = _snapshot.StreamImporter()
+        line = json.dumps({"id": 1, "payload": {}, "vector": _snapshot.encode_vector([1.0])})
+        with pytest.raises(_snapshot.SnapshotError):
+            importer.add(line.encode())
+
+    def test_vector_encoding_is_float16(self):
+        encoded = _snapshot.encode_vector([0.1, 0.5, -1.0])
+        assert _snapshot.decode_vector(encoded) == pytest.approx([0.1, 0.5, -1.0], abs=1e-3)
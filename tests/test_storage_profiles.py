@@ -0,0 +1,130 @@
+"""
+Unit tests for the storage profile migration script (copy, catch-up of
+writes that land during the copy, alias swap, and the offline guard for
+real collections).
+
+Runs against QdrantClient(":memory:").
+"""
+
+import argparse
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("qdrant_client")
+
+from conftest import load_memory_module  # noqa: E402
+
+_storage, _qdrant = load_memory_module("scripts.storage_profiles", "services.qdrant_client")
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+DIM = 768
+
+
+def _point(i, saved_at, text=None):
+    vector = [1.0 if j == i % DIM else 0.25 for j in range(DIM)]
+    payload = {"user_id": "u", "facts": text or f"fact {i}", "saved_at": saved_at}
+    return models.PointStruct(id=i, vector=vector, payload=payload)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("INDEX_NAME", "memories")
+    fake = QdrantClient(":memory:")
+    monkeypatch.setattr(_qdrant, "_client_instance", fake)
+    monkeypatch.setattr(_qdrant, "_ready_collections", {})
+    monkeypatch.setattr(_qdrant, "_ensure_payload_indexes", lambda *a: None)
+    monkeypatch.setattr(_storage, "CATCH_UP_SLACK_S", 0)
+    _qdrant._ensure_collection()
+    old = time.time() - 3600
+    fake.upsert(collection_name="memories", points=[_point(i, old) for i in range(10, 20)])
+    return fake
+
+
+@pytest.fixture
+def write_during_copy(client, monkeypatch):
+    """After the first page of the full copy, the 'service' saves and updates points."""
+    iter_points = _storage.iter_points
+
+    def iter_with_writes(collection_name, scroll_filter=None, **kwargs):
+        for n, records in enumerate(iter_points(collection_name, scroll_filter=scroll_filter, **kwargs)):
+            yield records
+            if n == 0 and scroll_filter is None:
+                # Both behind the scroll cursor, so the full copy misses them
+                now = time.time()
+                client.upsert(
+                    collection_name="memories",
+                    points=[_point(1, now), _point(11, now, text="fact 11, updated")],
+                )
+
+    monkeypatch.setattr(_storage, "iter_points", iter_with_writes)
+
+
+def _args(**overrides):
+    args = dict(
+        profile="int8", on_disk=False, target=None, batch_size=4,
+        swap=False, yes=False, offline=False,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+class TestMigrate:
+    def test_writes_during_copy_are_caught_up(self, client, write_during_copy):
+        assert _storage.migrate(_args()) == 0
+        assert client.count("memories__int8", exact=True).count == 11
+        assert client.retrieve("memories__int8", ids=[1])
+        updated = client.retrieve("memories__int8", ids=[11])[0]
+        assert updated.payload["facts"] == "fact 11, updated"
+
+    def test_alias_swap_keeps_old_collection(self, client, write_during_copy):
+        # Move the data behind an alias: memories -> memories_v1
+        _qdrant._create_collection(client, "memories_v1")
+        for records in _qdrant.iter_points("memories", client=client):
+            client.upsert(
+                "memories_v1",
+                points=[models.PointStruct(id=r.id, vector=r.vector, payload=r.payload) for r in records],
+            )
+        client.delete_collection("memories")
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                models.CreateAliasOperation(
+                    create_alias=models.CreateAlias(collection_name="memories_v1", alias_name="memories")
+                )
+            ]
+        )
+
+        assert _storage.migrate(_args(swap=True)) == 0
+        assert _storage._resolve_alias(client, "memories") == "memories__int8"
+        assert client.count("memories", exact=True).count == 11
+        assert client.collection_exists("memories_v1")
+
+    def test_real_collection_swap_needs_offline(self, client):
+        assert _storage.migrate(_args(swap=True, yes=True)) == 1
+        assert not client.collection_exists("memories__int8")
+
+        assert _storage.migrate(_args(swap=True, yes=True, offline=True)) == 0
+        assert _storage._resolve_alias(client, "memories") == "memories__int8"
+        assert client.count("memories", exact=True).count == 10
+
+    def test_target_takes_the_source_vector_size(self, client):
+        # A migrated model's collection (see services/embedding_migration.py)
+        client.create_collection(
+            "memories__small_model",
+            vectors_config=models.VectorParams(size=4, distance=models.Distance.COSINE),
+        )
+        client.upsert(
+            "memories__small_model",
+            points=[models.PointStruct(id=1, vector=[1.0, 0, 0, 0], payload={"user_id": "u"})],
+        )
+        _qdrant.set_active_collection("memories__small_model")  # default size stays 768
+        try:
+            assert _storage.migrate(_args()) == 0
+        finally:
+            _qdrant.set_active_collection(None)
+        target = client.get_collection("memories__small_model__int8")
+        assert target.config.params.vectors.size == 4
+        assert client.count("memories__small_model__int8").count == 1